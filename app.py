@@ -22,7 +22,11 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 def setup_temp_dirs():
-    """Configura diretórios temporários para uploads e outputs na Vercel"""
+    """Configura diretórios temporários para uploads e outputs na Vercel.
+
+    Os certificados do Banco Inter não são gravados aqui: config.ensure_certificates
+    os materializa na primeira vez que o mTLS for usado.
+    """
     temp_dir = Path(tempfile.gettempdir())
     uploads_dir = temp_dir / "cnab_uploads"
     outputs_dir = temp_dir / "cnab_outputs"
@@ -32,34 +36,8 @@ def setup_temp_dirs():
     outputs_dir.mkdir(exist_ok=True)
     certs_dir.mkdir(exist_ok=True)
     
-    # Configurar certificados se fornecidos via variáveis de ambiente
-    setup_certificates(certs_dir)
-    
     return uploads_dir, outputs_dir, certs_dir
 
-def setup_certificates(certs_dir):
-    """Configura certificados do Banco Inter a partir de variáveis de ambiente"""
-    import base64
-    
-    cert_content = os.getenv('BANCO_INTER_CERT_CONTENT')
-    key_content = os.getenv('BANCO_INTER_KEY_CONTENT')
-    
-    if cert_content:
-        try:
-            cert_data = base64.b64decode(cert_content)
-            with open(certs_dir / 'inter.crt', 'wb') as f:
-                f.write(cert_data)
-        except Exception as e:
-            print(f"Erro ao configurar certificado: {e}")
-    
-    if key_content:
-        try:
-            key_data = base64.b64decode(key_content)
-            with open(certs_dir / 'inter.key', 'wb') as f:
-                f.write(key_data)
-        except Exception as e:
-            print(f"Erro ao configurar chave privada: {e}")
-
 # Configurar diretórios temporários
 uploads_dir, outputs_dir, certs_dir = setup_temp_dirs()
 
@@ -76,8 +54,10 @@ CORS(app)
 
 # Importar rotas
 sys.path.append('src')
-from routes.pix_routes import pix_bp
+from routes.pix_routes import pix_bp, backfill_catalog
 app.register_blueprint(pix_bp, url_prefix='/api/pix')
+# Arquivos enviados/gerados antes do catálogo existir entram uma única vez
+backfill_catalog()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -0,0 +1,93 @@
+"""Leitor CNAB240 (mmap): abertura/indexação, conferência completa e acesso aleatório por lote/segmento.
+
+Monta um arquivo com vários lotes (49.999 pagamentos por lote, o máximo que o
+sequencial de 5 dígitos comporta) até perto de 1 milhão de registros, o teto
+do contador de 6 dígitos do trailer de arquivo.
+
+Uso: python benchmarks/bench_cnab_reader.py [registros]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from cnab_generator import Company
+from cnab_layouts import compile_layouts
+from cnab_reader import CNABFile
+
+logging.disable(logging.CRITICAL)
+
+PAIRS_PER_LOTE = 49_999
+COMPANY = Company(bank_code="077", agency="0001", agency_dv="", account="44810271", account_dv="4",
+                  name="EMPRESA BENCHMARK LTDA", cnpj="60413854000121")
+
+
+def write_multi_lote(path: str, records: int) -> int:
+    """Grava um .rem válido com até `records` registros; devolve o total de pagamentos."""
+    t = compile_layouts(COMPANY)
+    rnd = random.Random(42)
+    day = date.today().strftime("%d%m%Y")
+    budget = min(records, 999_999) - 2
+    lote, payments, written = 0, 0, 2
+    with open(path, "w", encoding="ascii") as fh:
+        fh.write(t["header_arquivo"].render(day, "120000", 1))
+        while budget - 4 >= 0:
+            pairs = min(PAIRS_PER_LOTE, (budget - 2) // 2)
+            if pairs <= 0: break
+            lote += 1
+            fh.write("\n" + t["header_lote_pix"].render(lote, ""))
+            total = 0
+            for i in range(pairs):
+                cents = rnd.randrange(100, 500_000); total += cents
+                doc = f"{rnd.randrange(10**10, 10**11):011d}"
+                fh.write("\n" + t["segmento_a_pix"].render(lote, 2 * i + 1, f"FAVORECIDO {i}", day, cents, day, cents))
+                fh.write("\n" + t["segmento_b_pix"].render(lote, 2 * i + 2, "1", doc, doc))
+            fh.write("\n" + t["trailer_lote"].render(lote, 2 * pairs + 2, total))
+            payments += pairs; written += 2 * pairs + 2; budget -= 2 * pairs + 2
+        fh.write("\n" + t["trailer_arquivo"].render(lote, written))
+    return payments
+
+
+def main(records: int = 999_999):
+    path = os.path.join(tempfile.mkdtemp(prefix="cnab_reader_"), "bench.rem")
+    t0 = time.perf_counter()
+    payments = write_multi_lote(path, records)
+    print(f"arquivo: {os.path.getsize(path) / 1e6:.0f} MB, {payments:,} pagamentos (gerado em {time.perf_counter() - t0:.1f}s)")
+
+    try:
+        t0 = time.perf_counter()
+        cnab = CNABFile(path)
+        t_open = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ok, errors = cnab.validate()
+        t_validate = time.perf_counter() - t0
+        assert ok, errors
+
+        lotes = cnab.lotes
+        rnd = random.Random(1)
+        lookups = [(l, rnd.randint(1, cnab.segment_count(l))) for l in (rnd.choice(lotes) for _ in range(100_000))]
+        t0 = time.perf_counter()
+        for lote, m in lookups:
+            a, b = cnab.pair(lote, m)
+            a["valor_pagamento"]; b["chave_pix"]
+        t_random = time.perf_counter() - t0
+
+        summary = cnab.summary()
+        cnab.close()
+        print(f"{summary['records']:,} registros em {summary['lotes']} lotes, total R$ {summary['total_cents'] / 100:,.2f}")
+        print(f"abertura + índice: {t_open * 1000:8.1f} ms")
+        print(f"conferência:       {t_validate * 1000:8.1f} ms ({summary['records'] / t_validate:,.0f} registros/s)")
+        print(f"acesso aleatório:  {t_random / len(lookups) * 1e6:8.2f} µs por par A/B lido (100k consultas)")
+    finally:
+        os.unlink(path)
+        os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,85 @@
+"""Cold start do app.py: tempo de importação (-X importtime) e da primeira requisição.
+
+Cada rodada é um processo Python novo. Mostra a mediana do import do app, as
+importações mais caras e confere que módulos pesados (pandas, NumPy,
+openpyxl) ficam fora da subida; com --max-ms o script falha se o import
+passar do limite, para pegar regressões.
+
+Uso: python benchmarks/bench_cold_start.py [rodadas] [--max-ms N]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+# Roda no processo filho: importa o app e faz a primeira requisição (página inicial)
+_CHILD = """
+import os, sys, time, json
+os.chdir({root!r}); sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+response = app.app.test_client().get('/')
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000, "status": response.status_code,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules], "modules": len(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """Linhas do -X importtime -> [(cumulativo_us, self_us, módulo)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            rows.append((int(parts[1]), int(parts[0]), parts[2].strip()))
+        except ValueError:
+            continue  # cabeçalho
+    return rows
+
+
+def run_once():
+    code = _CHILD.format(root=ROOT, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def main(rounds: int = 5, max_ms: float = None) -> int:
+    results = [run_once() for _ in range(rounds)]
+    imports = [r["import_ms"] for r, _ in results]
+    first = [r["first_request_ms"] for r, _ in results]
+    summary, rows = results[-1]
+
+    print(f"{rounds} rodadas | import app: mediana {statistics.median(imports):.0f}ms (min {min(imports):.0f}ms) "
+          f"| primeira requisição GET /: {statistics.median(first):.0f}ms | {summary['modules']} módulos")
+    app_modules = {"app", "config", "routes.pix_routes"}
+    print("importações mais caras (cumulativo):")
+    for cumulative, own, name in sorted(rows, reverse=True)[:12]:
+        mark = " *" if name in app_modules else ""
+        print(f"  {cumulative / 1000:8.1f}ms  {own / 1000:7.1f}ms próprio  {name}{mark}")
+
+    failed = False
+    if summary["heavy"]:
+        print(f"FALHA: módulos pesados carregados na subida: {', '.join(summary['heavy'])}")
+        failed = True
+    if max_ms is not None and statistics.median(imports) > max_ms:
+        print(f"FALHA: import do app acima de {max_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    limit = None
+    if "--max-ms" in args:
+        i = args.index("--max-ms")
+        limit = float(args[i + 1])
+        del args[i:i + 2]
+    sys.exit(main(*(int(a) for a in args[:1]), max_ms=limit))
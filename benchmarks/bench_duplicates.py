@@ -0,0 +1,73 @@
+"""Conferência de duplicidade contra o histórico de remessas, conforme o histórico cresce.
+
+Gera remessas de `pagamentos` cada (benchmarks/synthetic.py) e, a cada degrau
+do histórico, mede a consulta de uma planilha nova sem repetidos (caso comum:
+o filtro de Bloom responde quase tudo) e a de uma planilha já gerada (todas as
+linhas vão ao SQLite). O custo por linha deve ficar estável.
+
+Uso: python benchmarks/bench_duplicates.py [remessas] [pagamentos]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import recipients as synthetic_recipients
+from recipient import Recipient, to_cents
+from cnab_generator import CNAB240Generator, Company
+from duplicates import DuplicateIndex
+
+logging.disable(logging.CRITICAL)
+
+COMPANY = Company(bank_code="077", agency="0001", agency_dv="", account="44810271", account_dv="4",
+                  name="EMPRESA BENCHMARK LTDA", cnpj="60413854000121")
+
+
+def sheet(count: int, seed: int):
+    return [Recipient(name, key, "".join(ch for ch in doc if ch.isdigit()), to_cents(amount))
+            for name, key, doc, amount in synthetic_recipients(count, seed=seed)]
+
+
+def timed_find(index: DuplicateIndex, rows):
+    t0 = time.perf_counter()
+    found = index.find(rows)
+    return time.perf_counter() - t0, len(found)
+
+
+def main(files: int = 50, payments: int = 20_000):
+    root = Path(tempfile.mkdtemp(prefix="cnab_duplicates_"))
+    try:
+        index = DuplicateIndex(str(root / "duplicates.db"))
+        fresh = sheet(payments, seed=10**6)
+        print(f"{'histórico':>12} {'registro':>10} {'nova (µs/linha)':>16} {'repetida (µs/linha)':>20}")
+        step = 1
+        for n in range(1, files + 1):
+            rows = sheet(payments, seed=n)
+            remessa = root / f"CI240_001_{n:06d}.rem"
+            with open(remessa, "w", encoding="ascii") as fh:
+                CNAB240Generator(COMPANY).write_pix_file(rows, fh, n)
+            t0 = time.perf_counter()
+            index.register(remessa, f"folha_{n}.xlsx")
+            t_register = time.perf_counter() - t0
+            remessa.unlink()
+            if n != step and n != files: continue
+            step *= 2
+            index.find(fresh[:10])  # linhas novas entram no filtro fora da medição
+            t_new, hits_new = timed_find(index, fresh)
+            t_dup, hits_dup = timed_find(index, rows)
+            assert hits_new == 0 and hits_dup == len(rows), (hits_new, hits_dup)
+            print(f"{n * payments:>12,} {t_register:>9.2f}s {t_new / payments * 1e6:>16.2f} {t_dup / payments * 1e6:>20.2f}")
+        index.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,102 @@
+"""Compara o ExcelProcessor vetorizado com o laço iterrows() original.
+
+Uso: python benchmarks/bench_excel_processor.py [linhas]
+"""
+import os
+import sys
+import time
+import random
+import logging
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import make_cpf
+from excel_processor import ExcelProcessor
+
+logging.disable(logging.CRITICAL)
+
+
+def legacy_validate_data(proc):
+    """Só o valor vazio: a conferência de chaves/documentos não existia no laço original."""
+    errors = []
+    for idx, row in proc.df.iterrows():
+        if pd.isna(row.get(proc.mapped_columns["amount"])):
+            errors.append(f"Linha {idx+2}: Valor vazio")
+    return not errors, errors
+
+
+def legacy_process_data(proc):
+    recipients = []
+    for idx, row in proc.df.iterrows():
+        recipient = {}
+        try:
+            recipient["name"] = str(row.get(proc.mapped_columns.get("name"), "")).strip()
+            recipient["pix_key"] = str(row.get(proc.mapped_columns.get("pix_key"), "")).strip()
+            recipient["amount"] = float(row.get(proc.mapped_columns.get("amount"), 0))
+            doc = ""
+            if "document" in proc.mapped_columns and pd.notna(row.get(proc.mapped_columns["document"])):
+                doc = "".join(filter(str.isdigit, str(row.get(proc.mapped_columns["document"]))))
+            if not doc:
+                pix_digits = "".join(filter(str.isdigit, recipient["pix_key"]))
+                if len(pix_digits) in [11, 14]:
+                    doc = pix_digits
+            recipient["document"] = doc
+            recipients.append(recipient)
+        except Exception:
+            pass
+    return recipients
+
+
+def normalized(recipient):
+    """Chave do laço original no formato do DICT, como o process_data atual entrega."""
+    key = recipient["pix_key"]
+    if "@" in key: key = key.lower()
+    else: key = ("+" if key.startswith("+") else "") + "".join(filter(str.isdigit, key))
+    return {**recipient, "pix_key": key}
+
+
+def synthetic_sheet(rows: int) -> pd.DataFrame:
+    rnd = random.Random(42)
+    names = ["João da Silva", "Maria Conceição", "José Antônio", "Ana Lúcia Araújo", "Sebastião Gonçalves"]
+    data = {"NOME": [], "CHAVE PIX": [], "CPF/CNPJ": [], "VALOR": []}
+    for i in range(rows):
+        data["NOME"].append(f"{rnd.choice(names)} {i}")
+        cpf = make_cpf(rnd)
+        kind = i % 3
+        data["CHAVE PIX"].append(cpf if kind == 0 else f"user{i}@exemplo.com.br" if kind == 1 else f"+55 (11) 9{rnd.randrange(10**7, 10**8)}")
+        data["CPF/CNPJ"].append(None if kind == 0 else f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}")
+        data["VALOR"].append(round(rnd.uniform(10, 5000), 2))
+    return pd.DataFrame(data)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(rows: int = 50_000):
+    proc = ExcelProcessor()
+    proc.df = synthetic_sheet(rows)
+    proc.detect_columns()
+
+    t_old_val, old_val = timed(legacy_validate_data, proc)
+    t_new_val, new_val = timed(proc.validate_data)
+    t_old_proc, old_proc = timed(legacy_process_data, proc)
+    t_new_proc, new_proc = timed(proc.process_data)
+
+    assert old_val == new_val, "validate_data divergiu do laço original"
+    assert [normalized(r) for r in old_proc] == [{k: v for k, v in r.to_dict().items() if k != "campaign"} for r in new_proc], \
+        "process_data divergiu do laço original"
+
+    print(f"{rows} linhas")
+    print(f"validate_data: iterrows {t_old_val:.3f}s | vetorizado {t_new_val:.3f}s | {t_old_val / t_new_val:.1f}x")
+    print(f"process_data:  iterrows {t_old_proc:.3f}s | vetorizado {t_new_proc:.3f}s | {t_old_proc / t_new_proc:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,55 @@
+"""Envio sequencial (uma conexão mTLS por chamada) x create_recorrencias_bulk contra o stub local.
+
+Uso: python benchmarks/bench_inter_bulk.py [favorecidos] [workers]
+"""
+import os
+import sys
+import time
+import logging
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inter_api import InterAPIClient
+from recipient import Recipient
+from inter_stub_server import start_stub
+
+logging.disable(logging.CRITICAL)
+
+
+def client(base_url, paths):
+    return InterAPIClient("id", "secret", paths["client"][0], paths["client"][1], base_url,
+                          "rec.write", "12345-6", ca_bundle=paths["ca"], pool_size=16)
+
+
+def main(n: int = 200, workers: int = 16):
+    server, base_url, paths = start_stub(latency=0.02)
+    recipients = [Recipient(f"Favorecido {i}", f"{i:011d}", f"{i:011d}", 1000 + i) for i in range(n)]
+
+    # Referência: como antes, cada chamada abre uma conexão nova (sem Session)
+    c = client(base_url, paths)
+    c.authenticate()
+    handshakes = server.handshakes
+    start = time.perf_counter()
+    for r in recipients:
+        requests.post(c.recorrencia_url, json={}, headers={"Authorization": f"Bearer {c.access_token}"},
+                      cert=(c.cert_path, c.key_path), verify=c.ca_bundle, timeout=30)
+    t_seq, h_seq = time.perf_counter() - start, server.handshakes - handshakes
+
+    c = client(base_url, paths)
+    handshakes = server.handshakes
+    start = time.perf_counter()
+    results = list(c.create_recorrencias_bulk(recipients, max_workers=workers))
+    t_bulk, h_bulk = time.perf_counter() - start, server.handshakes - handshakes
+    ok = sum(1 for _, res in results if res["success"])
+
+    print(f"{n} recorrências, latência do stub 20ms")
+    print(f"sequencial sem sessão: {t_seq:.2f}s | {h_seq} handshakes")
+    print(f"bulk ({workers} workers): {t_bulk:.2f}s | {h_bulk} handshakes | {ok}/{n} ok | {t_seq / t_bulk:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
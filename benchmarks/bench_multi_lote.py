@@ -0,0 +1,57 @@
+"""CNAB com vários lotes (uma campanha por lote): geração serial x pool de processos.
+
+O ganho depende de núcleos livres; com uma única CPU o pool só acrescenta o
+custo de enviar os favorecidos aos processos.
+
+Uso: python benchmarks/bench_multi_lote.py [campanhas] [favorecidos_por_campanha] [workers]
+"""
+import io
+import os
+import sys
+import time
+import random
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from cnab_generator import CNAB240Generator, Company
+from recipient import Recipient
+
+logging.disable(logging.CRITICAL)
+
+COMPANY = Company(bank_code="077", agency="0001", agency_dv="", account="44810271",
+                  account_dv="4", name="VANLINK LTDA", cnpj="60413854000121")
+PARALLEL_WARMUP = 20_000
+
+
+def payroll(campaigns: int, per_campaign: int):
+    rnd = random.Random(11)
+    rows = [Recipient(f"Favorecido {c}-{i}", f"user{c}.{i}@exemplo.com.br", f"{rnd.randrange(10**10, 10**11):011d}",
+                      rnd.randrange(100, 300_000), f"Campanha {c}")
+            for c in range(campaigns) for i in range(per_campaign)]
+    rnd.shuffle(rows)
+    return rows
+
+
+def run(rows, workers: int):
+    generator = CNAB240Generator(COMPANY)
+    buf = io.StringIO()
+    start = time.perf_counter()
+    generator.write_pix_file(rows, buf, workers=workers)
+    return time.perf_counter() - start, generator.lote_seq, buf.getvalue()
+
+
+def main(campaigns: int = 8, per_campaign: int = 40_000, workers: int = os.cpu_count() or 1):
+    rows = payroll(campaigns, per_campaign)
+    run(rows[:PARALLEL_WARMUP], workers)  # sobe o pool fora da medição
+    t_serial, lotes, serial = run(rows, 1)
+    t_pool, _, pooled = run(rows, workers)
+    assert serial[240:] == pooled[240:], "saídas diferentes"  # o header traz a hora da geração
+    n = len(rows)
+    print(f"{n:,} favorecidos em {lotes} lotes | CPUs: {os.cpu_count()}")
+    print(f"  serial:            {t_serial:6.2f}s ({n / t_serial:,.0f} favorecidos/s)")
+    print(f"  pool ({workers:2d} workers): {t_pool:6.2f}s ({n / t_pool:,.0f} favorecidos/s) | {t_serial / t_pool:.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:4]))
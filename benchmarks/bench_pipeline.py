@@ -0,0 +1,295 @@
+"""Suíte de desempenho do fluxo planilha -> CNAB, com resultados em JSON e comparação com baseline.
+
+Para cada tamanho gera uma planilha sintética (benchmarks/synthetic.py) e mede
+vazão (linhas/s) e pico de memória (tracemalloc) de cada etapa:
+
+  excel.read / excel.detect / excel.validate / excel.process   ExcelProcessor
+  cnab.write                                                   CNAB240Generator -> arquivo
+  http.upload / http.generate_cnab / http.generate_cnab_stream rotas Flask via test client
+
+http.generate_cnab roda logo após o upload (favorecidos já no cache de
+parsing); http.generate_cnab_stream roda com o cache limpo, lendo a planilha
+em streaming. Como a mesma planilha é gerada mais de uma vez, as gerações vão
+com allow_duplicates; a consulta ao índice de duplicidade fica medida no upload. Planilhas maiores que MAX_CONTENT_LENGTH pulam o upload e são
+copiadas direto para a pasta de uploads.
+
+O tempo vem de uma rodada sem tracemalloc (que deixa o código bem mais lento);
+a memória, de uma segunda rodada com ele ligado (--no-memory pula essa).
+Tudo roda em um diretório temporário próprio, sem tocar nas pastas do app.
+
+Uso: python benchmarks/bench_pipeline.py [--sizes 1k,100k,1m] [--format xlsx|csv|parquet]
+         [--out arquivo.json] [--baseline benchmarks/baseline.json] [--tolerance 0.15]
+         [--save-baseline] [--no-memory]
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import write_sheet
+
+logging.disable(logging.CRITICAL)
+
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+# Abaixo disso a diferença é ruído de medição, não regressão
+MIN_DELTA_SECONDS = 0.005
+
+_COMPANY_ENV = dict(COMPANY_NAME="EMPRESA BENCHMARK LTDA", COMPANY_CNPJ="60.413.854/0001-21", BANK_AGENCY="0001",
+                    BANK_AGENCY_DV="", BANK_ACCOUNT="44810271", BANK_ACCOUNT_DV="4")
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def size_label(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0: return f"{rows // 1_000_000}m"
+    if rows >= 1_000 and rows % 1_000 == 0: return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def measure(fn, memory: bool):
+    """Executa fn() e devolve (resultado, segundos, pico_mb); o pico só é medido com memory=True."""
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+class Pipeline:
+    """Etapas medidas, na ordem; cada uma recebe o estado deixado pelas anteriores."""
+
+    def __init__(self, sheet: str, workdir: str, client, app_config):
+        self.sheet = sheet
+        self.workdir = workdir
+        self.client = client
+        self.app_config = app_config
+        self.state = {}
+
+    def stages(self):
+        return [
+            ("excel.read", self.read), ("excel.detect", self.detect), ("excel.validate", self.validate),
+            ("excel.process", self.process), ("cnab.write", self.cnab_write),
+            ("http.upload", self.http_upload), ("http.generate_cnab", self.http_generate),
+            ("http.generate_cnab_stream", self.http_generate_stream),
+        ]
+
+    def read(self):
+        from excel_processor import ExcelProcessor
+        processor = ExcelProcessor()
+        ok, errors = processor.preflight(self.sheet)
+        if not ok or not processor.load_file(self.sheet):
+            raise RuntimeError(f"Falha ao ler {self.sheet}: {errors}")
+        self.state["processor"] = processor
+
+    def detect(self):
+        self.state["processor"].detect_columns()
+
+    def validate(self):
+        is_valid, errors = self.state["processor"].validate_data()
+        if not is_valid:
+            raise RuntimeError(f"Planilha sintética inválida: {errors[:3]}")
+
+    def process(self):
+        self.state["recipients"] = self.state["processor"].process_data()
+
+    def cnab_write(self):
+        from routes.pix_routes import _company
+        from cnab_generator import CNAB240Generator
+        with open(os.path.join(self.workdir, "bench.rem"), "w", encoding="ascii") as fh:
+            CNAB240Generator(_company()).write_pix_file(self.state["recipients"], fh)
+
+    def http_upload(self):
+        from routes import pix_routes
+        if os.path.getsize(self.sheet) > self.app_config["MAX_CONTENT_LENGTH"]:
+            # Grande demais para a rota: entra direto na pasta, como se já tivesse sido enviada
+            name = f"direct_{os.path.basename(self.sheet)}"
+            shutil.copy(self.sheet, pix_routes.UPLOAD_FOLDER / name)
+            self.state["uploaded"] = name
+            return "pulado: acima de MAX_CONTENT_LENGTH"
+        with open(self.sheet, "rb") as fh:
+            response = self.client.post("/api/pix/upload", data={"file": (fh, os.path.basename(self.sheet))},
+                                        content_type="multipart/form-data")
+        _expect(response, "upload")
+        self.state["uploaded"] = response.get_json()["filename"]
+
+    def http_generate(self):
+        _expect(self.client.post("/api/pix/generate-cnab", json={"filename": self.state["uploaded"], "allow_duplicates": True}),
+                "generate-cnab")
+
+    def http_generate_stream(self):
+        import config
+        for cached in os.scandir(config.PARSE_CACHE_DIR):
+            os.unlink(cached.path)
+        response = self.client.post("/api/pix/generate-cnab/stream",
+                                    json={"filename": self.state["uploaded"], "allow_duplicates": True})
+        _expect(response, "generate-cnab/stream")
+        response.get_data()  # consome o corpo: a geração acontece enquanto ele é lido
+
+
+def _expect(response, what):
+    if response.status_code != 200:
+        raise RuntimeError(f"{what} respondeu {response.status_code}: {response.get_data(as_text=True)[:300]}")
+
+
+def run_size(rows: int, fmt: str, workdir: str, client, app_config, memory: bool):
+    sheet = os.path.join(workdir, f"sintetico_{size_label(rows)}.{fmt}")
+    started = time.perf_counter()
+    write_sheet(sheet, rows)
+    print(f"\n{size_label(rows)} linhas ({fmt}, {os.path.getsize(sheet) / 1e6:.1f} MB, "
+          f"gerada em {time.perf_counter() - started:.1f}s)")
+
+    timings = {}
+    pipeline = Pipeline(sheet, workdir, client, app_config)
+    for stage, fn in pipeline.stages():
+        try:
+            note, seconds, _ = measure(fn, memory=False)
+        except Exception as e:
+            # Etapa que falha (ex.: limite do layout) fica registrada e as demais seguem
+            timings[stage] = {"error": str(e)[:300]}
+            continue
+        timings[stage] = {"seconds": round(seconds, 6), "rows_per_s": round(rows / seconds) if seconds else None}
+        if note: timings[stage]["note"] = note
+    if memory:
+        pipeline = Pipeline(sheet, workdir, client, app_config)
+        for stage, fn in pipeline.stages():
+            try:
+                _, _, peak = measure(fn, memory=True)
+            except Exception:
+                continue
+            if "error" not in timings[stage]: timings[stage]["peak_mb"] = round(peak, 2)
+
+    for stage, r in timings.items():
+        if "error" in r:
+            print(f"  {stage:27s} ERRO: {r['error'][:100]}")
+            continue
+        peak = f"{r['peak_mb']:9.1f} MB" if "peak_mb" in r else ""
+        note = f"  ({r['note']})" if "note" in r else ""
+        print(f"  {stage:27s} {r['seconds'] * 1000:10.1f} ms {r['rows_per_s'] or 0:12,} linhas/s {peak}{note}")
+    return {"rows": rows, "format": fmt, "file_bytes": os.path.getsize(sheet), "stages": timings}
+
+
+def _warmup_sheet(workdir: str, fmt: str) -> str:
+    path = os.path.join(workdir, f"aquecimento.{fmt}")
+    write_sheet(path, 50, seed=1)
+    return path
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(current, baseline, tolerance: float) -> int:
+    """Imprime a variação de cada etapa em relação ao baseline; devolve o número de regressões."""
+    regressions = 0
+    print(f"\ncomparação com o baseline ({baseline['environment'].get('commit')}, "
+          f"{baseline['environment'].get('timestamp')}), tolerância {tolerance:.0%}:")
+    for label, result in current["results"].items():
+        base = baseline["results"].get(label)
+        if not base or base.get("format") != result["format"]:
+            print(f"  {label}: sem baseline para este tamanho/formato")
+            continue
+        for stage, r in result["stages"].items():
+            b = base["stages"].get(stage)
+            if not b or "error" in b: continue
+            if "error" in r:
+                print(f"  {label:5s} {stage:27s} ERRO (no baseline não falhava)  REGRESSÃO")
+                regressions += 1
+                continue
+            if "note" in r or "note" in b: continue
+            ratio = r["seconds"] / b["seconds"] if b["seconds"] else 1.0
+            slower = ratio > 1 + tolerance and r["seconds"] - b["seconds"] > MIN_DELTA_SECONDS
+            grew = "peak_mb" in r and "peak_mb" in b and b["peak_mb"] and r["peak_mb"] > b["peak_mb"] * (1 + tolerance)
+            mark = "  REGRESSÃO" if slower or grew else ""
+            mem = f" | memória {r['peak_mb'] / b['peak_mb']:5.2f}x" if "peak_mb" in r and b.get("peak_mb") else ""
+            print(f"  {label:5s} {stage:27s} tempo {ratio:5.2f}x{mem}{mark}")
+            regressions += bool(mark)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do fluxo planilha -> CNAB")
+    parser.add_argument("--sizes", default="1k,100k,1m")
+    parser.add_argument("--format", default="xlsx", choices=("xlsx", "csv", "parquet"))
+    parser.add_argument("--out", help="arquivo JSON de saída (padrão: benchmarks/results/pipeline_<data>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", action="store_true", help="grava o resultado como novo baseline")
+    parser.add_argument("--no-memory", action="store_true", help="não mede o pico de memória")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="cnab_bench_")
+    # O app cria suas pastas (uploads, saídas, cache) em tempfile.gettempdir(): aponta para o diretório da rodada
+    tempfile.tempdir = workdir
+    for key, value in _COMPANY_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "false")
+    # Pool de renderização ligado (um processo por CPU), como no baseline; no app ele é opt-in
+    os.environ.setdefault("CNAB_RENDER_WORKERS", "0")
+    sys.path.insert(0, ROOT)
+    try:
+        from app import app
+        client = app.test_client()
+        report = {"environment": environment(), "results": {}}
+        # Aquecimento: importações (pandas, openpyxl) e caches do app ficam fora das medições
+        for _, fn in Pipeline(_warmup_sheet(workdir, args.format), workdir, client, app.config).stages():
+            fn()
+        for rows in map(parse_size, args.sizes.split(",")):
+            report["results"][size_label(rows)] = run_size(rows, args.format, workdir, client, app.config,
+                                                          memory=not args.no_memory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f"\nresultados em {out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+        print(f"baseline atualizado em {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            return 1 if compare(report, json.load(fh), args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Conferência de chaves PIX e CPF/CNPJ sobre a coluna inteira (pix_validation.validate).
+
+Usa os favorecidos sintéticos (chaves dos cinco tipos, documentos formatados)
+e estraga uma fração das linhas para o relatório ter erros a montar.
+
+Uso: python benchmarks/bench_pix_validation.py [linhas]
+"""
+import os
+import sys
+import time
+import random
+import logging
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import recipients
+from pix_validation import validate, digits_only, invalid_rows, row_errors
+
+logging.disable(logging.CRITICAL)
+
+BROKEN_FRACTION = 0.01
+
+
+def main(rows: int = 1_000_000):
+    rnd = random.Random(3)
+    keys, docs = [], []
+    for _, key, doc, _ in recipients(rows):
+        if rnd.random() < BROKEN_FRACTION:
+            key = key[:-1] + ("0" if key[-1] != "0" else "1")  # um dígito trocado
+        keys.append(key)
+        docs.append(doc)
+
+    t0 = time.perf_counter()
+    digits = digits_only(docs)
+    t_digits = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    report = validate(keys, digits)
+    t_validate = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    errors = row_errors(report, range(2, rows + 2))
+    t_errors = time.perf_counter() - t0
+
+    print(f"{rows:,} linhas, {int(invalid_rows(report).sum()):,} inválidas ({len(errors):,} mensagens)")
+    for kind, count in report["key_type"].replace("", "inválida").value_counts().items():
+        print(f"  {kind:9s}{count:10,}")
+    print(f"documentos só com dígitos: {t_digits:6.2f}s")
+    print(f"classificação + dígitos:   {t_validate:6.2f}s ({rows / t_validate:,.0f} linhas/s)")
+    print(f"mensagens de erro:         {t_errors:6.2f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,110 @@
+"""Conciliação de um mês de remessas com os retornos do banco.
+
+Gera `arquivos` remessas de `pagamentos` cada (benchmarks/synthetic.py) e um
+retorno por remessa: ~93% pagos (00), ~3% rejeitados, ~1% agendados (BD) e o
+resto fora do retorno (ausentes). Mede a primeira rodada (indexação + hash
+join) e a segunda, que não tem nada novo para processar, e confere as
+contagens com o que foi gerado.
+
+Uso: python benchmarks/bench_reconciliation.py [arquivos] [pagamentos]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import recipients as synthetic_recipients
+from recipient import Recipient
+from cnab_generator import CNAB240Generator, Company
+from cnab_layouts import compile_layouts
+from cnab_reader import CNABFile
+from reconciliation import Reconciler, PAID, REJECTED, PENDING, MISSING
+
+logging.disable(logging.CRITICAL)
+
+COMPANY = Company(bank_code="077", agency="0001", agency_dv="", account="44810271", account_dv="4",
+                  name="EMPRESA BENCHMARK LTDA", cnpj="60413854000121")
+REJECTION_CODES = ["AP", "AM", "AG", "PA"]
+
+
+def write_return(remessa: Path, target: Path, rnd: random.Random):
+    """Retorno no layout da remessa: código 2 no header e ocorrências no fim de cada segmento A."""
+    t = compile_layouts(COMPANY)
+    with CNABFile(remessa) as cnab:
+        header = cnab.header.raw()
+        cols = cnab.payments()
+    expected = {PAID: 0, REJECTED: 0, PENDING: 0, MISSING: 0}
+    lines = [header[:142] + "2" + header[143:], t["header_lote_pix"].render(1, "")]
+    day = header[143:151]
+    seq, total = 0, 0
+    for name, document, key, cents in zip(cols["name"], cols["document"], cols["pix_key"], cols["cents"].tolist()):
+        roll = rnd.random()
+        if roll < 0.03:
+            expected[MISSING] += 1
+            continue
+        code = "00" if roll < 0.96 else "BD" if roll < 0.97 else rnd.choice(REJECTION_CODES)
+        expected[PAID if code == "00" else PENDING if code == "BD" else REJECTED] += 1
+        a = t["segmento_a_pix"].render(1, seq + 1, name, day, cents, day, cents)
+        lines.append(a[:230] + code.ljust(10))
+        lines.append(t["segmento_b_pix"].render(1, seq + 2, "1" if len(document.lstrip("0")) <= 11 else "2", document, key))
+        seq += 2; total += cents
+    lines.append(t["trailer_lote"].render(1, seq + 2, total))
+    lines.append(t["trailer_arquivo"].render(1, len(lines) + 1))
+    target.write_text("\n".join(lines), encoding="ascii")
+    return expected
+
+
+def main(files: int = 22, payments: int = 20_000):
+    root = Path(tempfile.mkdtemp(prefix="cnab_reconcile_"))
+    remessas, returns = root / "remessas", root / "retornos"
+    remessas.mkdir(); returns.mkdir()
+    rnd = random.Random(7)
+    expected = {PAID: 0, REJECTED: 0, PENDING: 0, MISSING: 0}
+    try:
+        t0 = time.perf_counter()
+        for n in range(1, files + 1):
+            rows = [Recipient(name, key, "".join(ch for ch in doc if ch.isdigit()), amount)
+                    for name, key, doc, amount in synthetic_recipients(payments, seed=n)]
+            remessa = remessas / f"CI240_001_{n:06d}.rem"
+            with open(remessa, "w", encoding="ascii") as fh:
+                CNAB240Generator(COMPANY).write_pix_file(rows, fh, n)
+            for status, count in write_return(remessa, returns / f"RET_{n:06d}.ret", rnd).items():
+                expected[status] += count
+        print(f"{files} remessas x {payments:,} pagamentos e {files} retornos gerados em {time.perf_counter() - t0:.1f}s")
+
+        reconciler = Reconciler(str(root / "reconciliation.db"))
+        t0 = time.perf_counter()
+        first = reconciler.run(remessas, returns)
+        t_first = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        second = reconciler.run(remessas, returns)
+        t_second = time.perf_counter() - t0
+
+        got = {s: 0 for s in expected}
+        for entry in reconciler.totals().values():
+            for status, e in entry.items():
+                got[status] += e["count"]
+        reconciler.close()
+
+        print(f"primeira rodada: {t_first:6.2f}s ({first['payments_indexed']:,} pagamentos indexados, "
+              f"{len(first['returns'])} retornos, {files * payments / t_first:,.0f} pagamentos/s)")
+        print(f"segunda rodada:  {t_second:6.2f}s ({second['payments_indexed']} indexados, {len(second['returns'])} retornos)")
+        print("situação   esperado  conciliado")
+        for status in expected:
+            print(f"  {status:9s}{expected[status]:9,} {got[status]:10,}")
+        assert got == expected, "contagens diferentes do gerado"
+        assert sum(r["unmatched"] for r in first["returns"]) == 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,69 @@
+"""Pico de memória do leitor streaming (openpyxl read-only) contra o pd.read_excel.
+
+Uso: python benchmarks/bench_streaming_reader.py [linhas]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+import logging
+
+from openpyxl import Workbook
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from synthetic import make_cpf
+from excel_processor import ExcelProcessor
+
+logging.disable(logging.CRITICAL)
+
+
+def write_sheet(path: str, rows: int):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["NOME", "CHAVE PIX", "CPF/CNPJ", "VALOR"])
+    rnd = random.Random(42)
+    for i in range(rows):
+        ws.append([f"Favorecido Conceição {i}", f"user{i}@exemplo.com.br", make_cpf(rnd), 10 + i % 5000 / 100])
+    wb.save(path)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / 2**20
+
+
+def full_load(path):
+    proc = ExcelProcessor()
+    proc.load_excel(path)
+    proc.detect_columns()
+    return len(proc.process_data())
+
+
+def streaming(path):
+    proc = ExcelProcessor()
+    proc.load_excel_stream(path)
+    proc.detect_columns()
+    return sum(len(chunk) for chunk in proc.iter_recipient_chunks())
+
+
+def main(rows: int = 50_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "folha.xlsx")
+        write_sheet(path, rows)
+        for label, fn in (("pd.read_excel", full_load), ("streaming", streaming)):
+            count, elapsed, peak = measure(lambda: fn(path))
+            print(f"{label:14s} {count} linhas | {elapsed:.2f}s | pico {peak:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
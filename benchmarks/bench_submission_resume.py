@@ -0,0 +1,64 @@
+"""Retomada de um lote interrompido pelo diário de envios, contra o stub local.
+
+Registra o lote, envia só uma parte (simulando a queda do processo) e mede
+quanto custa descobrir o que falta e concluir o envio com 5% de respostas 429
+(recusas transitórias, reenviadas na mesma execução). Os itens que estavam em
+envio na queda ficam incertos e não são reenviados.
+
+Uso: python benchmarks/bench_submission_resume.py [favorecidos]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inter_api import InterAPIClient
+from recipient import Recipient
+from submission_journal import SubmissionJournal, resume
+from token_cache import MemoryTokenCache
+from inter_stub_server import start_stub
+
+logging.disable(logging.CRITICAL)
+
+
+def main(n: int = 10_000):
+    server, base_url, paths = start_stub(latency=0.005, failure_rate=0.05, failure_status=429)
+    client = InterAPIClient("id", "secret", paths["client"][0], paths["client"][1], base_url,
+                            "rec.write", "12345-6", ca_bundle=paths["ca"], pool_size=16,
+                            token_cache=MemoryTokenCache())
+    recipients = [Recipient(f"Favorecido {i}", f"{i:011d}", f"{i:011d}", 1000 + i) for i in range(n)]
+    journal = SubmissionJournal(os.path.join(tempfile.mkdtemp(prefix="journal_"), "submissions.db"))
+
+    start = time.perf_counter()
+    journal.enqueue("bench", recipients)
+    t_enqueue = time.perf_counter() - start
+
+    # Primeira execução "cai" depois de 40% do lote, com os 16 últimos ainda em envio
+    items = journal.pending("bench")[: int(n * 0.4)]
+    keys = [key for key, _ in items]
+    for index, result in client.create_recorrencias_bulk([r for _, r in items], max_workers=16, idempotency_keys=keys):
+        journal.record(keys[index], result)
+    in_flight = journal.pending("bench")[:16]
+    for key, _ in in_flight:
+        journal.mark_sending(key)
+
+    start = time.perf_counter()
+    left = journal.pending("bench")
+    t_pending = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = resume(client, journal, "bench", max_workers=16, backoff=0.2)
+    t_resume = time.perf_counter() - start
+
+    print(f"{n} favorecidos | enqueue {t_enqueue * 1000:.0f}ms | pendentes após a queda: {len(left)} em {t_pending * 1000:.0f}ms")
+    print(f"resume: {t_resume:.2f}s | {summary} | chamadas ao stub: {server.requests['rec']} | "
+          f"recorrências criadas: {len(server.created)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
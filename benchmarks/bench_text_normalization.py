@@ -0,0 +1,56 @@
+"""Custo por campo do pad_alfa: normalização original x tabela + LRU x lote.
+
+Uso: python benchmarks/bench_text_normalization.py [campos]
+"""
+import os
+import sys
+import time
+import random
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import cnab_layouts
+from cnab_layouts import pad_alfa, normalize_column
+
+FIRST = ["João", "José", "Maria", "Antônio", "Conceição", "Sebastião", "Lúcia", "Inês", "Luíza", "Márcio"]
+LAST = ["Araújo", "Gonçalves", "Simões", "Magalhães", "Brandão", "Conceição", "Assunção", "Gusmão", "Estêvão", "Pereira"]
+
+
+def legacy_pad_alfa(text, length):
+    t = (text or "")
+    t = "".join(c for c in unicodedata.normalize('NFD', t) if unicodedata.category(c) != 'Mn')
+    t = t.encode("ascii", "ignore").decode("ascii").upper()
+    return t[:length].ljust(length, " ")
+
+
+def names(n: int, distinct: int):
+    rnd = random.Random(3)
+    pool = [f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {rnd.choice(LAST)} {i}" for i in range(distinct)]
+    return [pool[rnd.randrange(distinct)] for _ in range(n)]
+
+
+def per_field(fn, values):
+    start = time.perf_counter()
+    for v in values: fn(v, 30)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def main(n: int = 200_000):
+    unique, repeated = names(n, n), names(n, 2_000)
+    fillers = [""] * n
+
+    print(f"{n} campos (us por campo)")
+    print(f"vazio:       original {per_field(legacy_pad_alfa, fillers):.2f} | novo {per_field(pad_alfa, fillers):.2f}")
+    cnab_layouts.normalize_text.cache_clear()
+    print(f"únicos:      original {per_field(legacy_pad_alfa, unique):.2f} | novo {per_field(pad_alfa, unique):.2f}")
+    cnab_layouts.normalize_text.cache_clear()
+    print(f"repetidos:   original {per_field(legacy_pad_alfa, repeated):.2f} | novo {per_field(pad_alfa, repeated):.2f}")
+
+    start = time.perf_counter()
+    normalize_column(unique)
+    print(f"lote (normalize_column): {(time.perf_counter() - start) / n * 1e6:.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,149 @@
+"""Stub local da API do Banco Inter com mTLS, para testar e medir o InterAPIClient.
+
+Gera uma CA temporária com certificados de servidor e de cliente e atende
+/oauth/v2/token e /pix/v2/rec exigindo certificado de cliente. Conta
+handshakes TLS e requisições para mostrar o reaproveitamento de conexões.
+Chamadas com a mesma chave de idempotência devolvem a mesma recorrência.
+
+Uso: python benchmarks/inter_stub_server.py [porta]
+"""
+import os
+import ssl
+import sys
+import json
+import time
+import uuid
+import random
+import tempfile
+import threading
+import ipaddress
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+def _write_pair(directory, name, cert, key):
+    cert_path, key_path = os.path.join(directory, f"{name}.crt"), os.path.join(directory, f"{name}.key")
+    with open(cert_path, "wb") as fh:
+        fh.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as fh:
+        fh.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                   serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def make_certificates(directory):
+    """Cria CA, certificado de servidor (127.0.0.1/localhost) e de cliente; devolve os caminhos."""
+    now = datetime.now(timezone.utc)
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "stub-ca")])
+    ca = (x509.CertificateBuilder().subject_name(ca_name).issuer_name(ca_name)
+          .public_key(ca_key.public_key()).serial_number(x509.random_serial_number())
+          .not_valid_before(now - timedelta(minutes=5)).not_valid_after(now + timedelta(days=1))
+          .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+          .sign(ca_key, hashes.SHA256()))
+    paths = {"ca": _write_pair(directory, "ca", ca, ca_key)[0]}
+
+    for name, san in (("server", [x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+                      ("client", [x509.DNSName("client")])):
+        key = ec.generate_private_key(ec.SECP256R1())
+        cert = (x509.CertificateBuilder()
+                .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)]))
+                .issuer_name(ca_name).public_key(key.public_key()).serial_number(x509.random_serial_number())
+                .not_valid_before(now - timedelta(minutes=5)).not_valid_after(now + timedelta(days=1))
+                .add_extension(x509.SubjectAlternativeName(san), critical=False)
+                .sign(ca_key, hashes.SHA256()))
+        paths[name] = _write_pair(directory, name, cert, key)
+    return paths
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, paths, latency=0.02, failure_rate=0.0, failure_status=503):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        # Fração das chamadas a /pix/v2/rec que respondem failure_status (simula instabilidade do banco)
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.handshakes = 0
+        self.requests = {"token": 0, "rec": 0}
+        # Recorrências criadas por chave de idempotência
+        self.created = {}
+        self._lock = threading.Lock()
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH, cafile=paths["ca"])
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_cert_chain(*paths["server"])
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def get_request(self):
+        request = super().get_request()
+        with self._lock:
+            self.handshakes += 1
+        return request
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def create(self, idempotency_key):
+        """idRec da recorrência; com chave repetida, o da primeira vez."""
+        with self._lock:
+            if idempotency_key and idempotency_key in self.created:
+                return self.created[idempotency_key], False
+            id_rec = f"RR{uuid.uuid4().hex[:24]}"
+            self.created[idempotency_key or id_rec] = id_rec
+            return id_rec, True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/oauth/v2/token":
+            self.server.count("token")
+            return self._reply(200, {"access_token": "stub-token", "expires_in": 3600})
+        if self.path == "/pix/v2/rec":
+            self.server.count("rec")
+            if self.headers.get("Authorization") != "Bearer stub-token":
+                return self._reply(401, {"error": "token inválido"})
+            time.sleep(self.server.latency)
+            if random.random() < self.server.failure_rate:
+                return self._reply(self.server.failure_status, {"error": "indisponível"})
+            id_rec, created = self.server.create(self.headers.get("x-id-idempotente"))
+            return self._reply(201 if created else 200, {"idRec": id_rec})
+        self._reply(404, {"error": "rota desconhecida"})
+
+
+def start_stub(latency=0.02, port=0, directory=None, failure_rate=0.0, failure_status=503):
+    """Sobe o stub em thread própria; devolve (server, base_url, paths)."""
+    directory = directory or tempfile.mkdtemp(prefix="inter_stub_")
+    paths = make_certificates(directory)
+    server = StubServer(("127.0.0.1", port), paths, latency, failure_rate, failure_status)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{server.server_address[1]}", paths
+
+
+if __name__ == "__main__":
+    server, base_url, paths = start_stub(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8443)
+    print(f"Stub em {base_url}\nCA: {paths['ca']}\ncliente: {paths['client'][0]} {paths['client'][1]}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
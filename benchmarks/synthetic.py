@@ -0,0 +1,96 @@
+"""Gerador determinístico de favorecidos e planilhas sintéticas para os benchmarks.
+
+Nomes com acentos, documentos CPF/CNPJ com dígitos verificadores válidos e
+chaves PIX dos cinco tipos (CPF, CNPJ, e-mail, telefone e aleatória/EVP).
+A mesma semente gera sempre os mesmos dados.
+
+Uso: python benchmarks/synthetic.py linhas arquivo.(xlsx|csv|parquet)
+"""
+import csv
+import sys
+import uuid
+import random
+import unicodedata
+from typing import Iterator, List, Tuple
+
+FIRST_NAMES = ["José", "João", "Maria", "Ana", "Conceição", "Antônio", "Luís", "Inês", "Sebastião", "Cecília",
+               "Joaquim", "Lúcia", "Mônica", "Fábio", "Márcio", "Vinícius", "Débora", "Áurea", "Ícaro", "Úrsula"]
+LAST_NAMES = ["da Silva", "Gonçalves", "Araújo", "Conceição", "Simões", "Magalhães", "Brandão", "Assunção",
+              "Lopes", "Ribeiro", "Fontão", "Sá", "Calderón", "Mendonça", "Guimarães", "Estêvão", "Nóbrega"]
+COMPANY_SUFFIXES = ["LTDA", "ME", "EIRELI", "S.A.", "Comércio e Serviços LTDA"]
+DOMAINS = ["gmail.com", "hotmail.com", "empresa.com.br", "uol.com.br", "exemplo.org"]
+HEADER = ["NOME", "CHAVE PIX", "CPF/CNPJ", "VALOR"]
+
+def _check_digit(digits: List[int], weights: List[int]) -> int:
+    rest = sum(d * w for d, w in zip(digits, weights)) % 11
+    return 0 if rest < 2 else 11 - rest
+
+def make_cpf(rng: random.Random) -> str:
+    base = [rng.randint(0, 9) for _ in range(9)]
+    base.append(_check_digit(base, list(range(10, 1, -1))))
+    base.append(_check_digit(base, list(range(11, 1, -1))))
+    return "".join(map(str, base))
+
+def make_cnpj(rng: random.Random) -> str:
+    base = [rng.randint(0, 9) for _ in range(8)] + [0, 0, 0, 1]
+    base.append(_check_digit(base, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    base.append(_check_digit(base, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    return "".join(map(str, base))
+
+def _ascii(text: str) -> str:
+    # Chave de e-mail no DICT só aceita ASCII
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+
+def recipients(count: int, seed: int = 42) -> Iterator[Tuple[str, str, str, float]]:
+    """Gera (nome, chave PIX, documento formatado, valor) de forma reprodutível."""
+    rng = random.Random(seed)
+    for i in range(count):
+        company = rng.random() < 0.15
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        if company:
+            document = make_cnpj(rng)
+            name = f"{last} {rng.choice(COMPANY_SUFFIXES)}"
+            formatted = f"{document[:2]}.{document[2:5]}.{document[5:8]}/{document[8:12]}-{document[12:]}"
+        else:
+            document = make_cpf(rng)
+            name = f"{first} {rng.choice(FIRST_NAMES)} {last}"
+            formatted = f"{document[:3]}.{document[3:6]}.{document[6:9]}-{document[9:]}"
+        kind = rng.random()
+        if kind < 0.30:
+            key = document
+        elif kind < 0.55:
+            key = f"{_ascii(first).lower()}.{i}@{rng.choice(DOMAINS)}"
+        elif kind < 0.80:
+            key = f"+55{rng.randint(1, 9)}{rng.randint(1, 9)}9{rng.randint(10000000, 99999999)}"
+        else:
+            key = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        amount = round(rng.lognormvariate(5.5, 1.0), 2)
+        yield name, key, formatted, amount
+
+def write_csv(path: str, count: int, seed: int = 42):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(HEADER)
+        writer.writerows(recipients(count, seed))
+
+def write_xlsx(path: str, count: int, seed: int = 42):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Pagamentos")
+    ws.append(HEADER)
+    for row in recipients(count, seed):
+        ws.append(row)
+    wb.save(path)
+
+def write_parquet(path: str, count: int, seed: int = 42):
+    import pandas as pd
+    pd.DataFrame(list(recipients(count, seed)), columns=HEADER).to_parquet(path, index=False)
+
+def write_sheet(path: str, count: int, seed: int = 42):
+    """Grava no formato indicado pela extensão."""
+    if path.endswith(".csv"): write_csv(path, count, seed)
+    elif path.endswith(".parquet"): write_parquet(path, count, seed)
+    else: write_xlsx(path, count, seed)
+
+if __name__ == "__main__":
+    write_sheet(sys.argv[2], int(sys.argv[1]))
@@ -2,6 +2,7 @@
 
 import os
 import sys
+import multiprocessing
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -51,6 +52,9 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
+    # No executável do PyInstaller, processos filhos de multiprocessing param aqui
+    # em vez de subir outro servidor
+    multiprocessing.freeze_support()
     # O modo debug NUNCA deve ser True em produção
     is_debug = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
     port = int(os.getenv('PORT', 3000))
@@ -1,22 +1,189 @@
 from datetime import datetime, date
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Iterable, Iterator, Optional, Sequence, TextIO, Tuple
+from collections import deque
 from dataclasses import dataclass
+from itertools import islice
+import multiprocessing
+import threading
 import logging
-import unicodedata
+import os
+
+import metrics
+from cnab_layouts import compile_layouts
+from recipient import Recipient
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
 
 logger = logging.getLogger(__name__)
 
-def only_digits(s: str) -> str:
-    return "".join(ch for ch in str(s or "") if ch.isdigit())
+# O sequencial do detalhe tem 5 dígitos e cada favorecido ocupa 2 registros (A e B)
+LOTE_MAX_RECIPIENTS = 49_999
+# Favorecidos por bloco enviado ao pool; blocos menores (fim de lote) são renderizados aqui
+PARALLEL_MIN_RECIPIENTS = 5_000
+
+def join_records(records: Iterable[str]) -> Iterator[str]:
+    """Intercala os registros com '\\n' sem montar o arquivo inteiro em memória."""
+    sep = ""
+    for line in records:
+        yield sep + line; sep = "\n"
+
+def _as_recipients(recipients: Iterable) -> Iterator[Recipient]:
+    return (r if isinstance(r, Recipient) else Recipient.from_dict(r) for r in recipients)
+
+def _campaigns_contiguous(recipients: Sequence) -> bool:
+    """Cada campanha aparece numa única sequência contínua (o que inclui uma campanha só)?"""
+    seen, current = set(), None
+    for r in recipients:
+        campaign = r.campaign if isinstance(r, Recipient) else (r.get("campaign") or "")
+        if campaign == current: continue
+        if campaign in seen: return False
+        seen.add(campaign); current = campaign
+    return True
+
+def _stream_runs(recipients: Iterable[Recipient]) -> Iterator[Tuple[str, Iterator[Recipient]]]:
+    """Cada sequência contínua de uma campanha vira lote(s) lido(s) sob demanda.
+
+    Como no itertools.groupby, os lotes saem do mesmo iterador da entrada: cada
+    um tem de ser consumido por inteiro antes do próximo. Pedir o próximo com
+    favorecidos ainda pendentes no anterior é RuntimeError, não perda silenciosa.
+    """
+    rows = _as_recipients(recipients)
+    head = [next(rows, None)]
+    while head[0] is not None:
+        first, head[0] = head[0], None
+
+        def run(first=first):
+            yield first
+            count = 1
+            for r in rows:
+                if r.campaign != first.campaign or count >= LOTE_MAX_RECIPIENTS:
+                    head[0] = r
+                    return
+                yield r
+                count += 1
+        lote = run()
+        yield first.campaign, lote
+        # Termina o lote se quem consome parou exatamente no último favorecido
+        leftover = sum(1 for _ in lote)
+        if leftover:
+            raise RuntimeError(f"Lote da campanha {first.campaign!r} abandonado com {leftover} favorecido(s) "
+                               "não lido(s)")
+
+def _stream_lotes(recipients: Iterable[Recipient]) -> Iterator[Tuple[str, Iterable[Recipient]]]:
+    """Sequências contínuas em streaming; só as campanhas que reaparecem depois de encerradas são acumuladas.
+
+    O que reaparece é guardado por campanha e sai em lotes próprios quando enche
+    um lote ou no fim da entrada.
+    """
+    seen, current, buffering = set(), None, False
+    reappeared: Dict[str, List[Recipient]] = {}
+    for campaign, run in _stream_runs(recipients):
+        # Duas sequências seguidas da mesma campanha são um lote que encheu, não um reaparecimento
+        if campaign != current:
+            buffering = campaign in seen
+            seen.add(campaign); current = campaign
+        if not buffering:
+            yield campaign, run
+            continue
+        group = reappeared.setdefault(campaign, [])
+        group.extend(run)
+        if len(group) >= LOTE_MAX_RECIPIENTS:
+            yield campaign, group[:LOTE_MAX_RECIPIENTS]
+            del group[:LOTE_MAX_RECIPIENTS]
+    for campaign, group in reappeared.items():
+        if group: yield campaign, group
+
+def _buffer_campaigns(recipients: Iterable[Recipient]) -> Iterator[Tuple[str, List[Recipient]]]:
+    """Acumula cada campanha em memória; um lote que enche sai na hora."""
+    groups: Dict[str, List[Recipient]] = {}
+    for r in _as_recipients(recipients):
+        group = groups.get(r.campaign)
+        if group is None:
+            group = groups[r.campaign] = []
+        group.append(r)
+        if len(group) >= LOTE_MAX_RECIPIENTS:
+            yield r.campaign, group
+            groups[r.campaign] = []
+    for campaign, group in groups.items():
+        if group: yield campaign, group
+
+def group_lotes(recipients: Iterable[Recipient], grouped: Optional[bool] = None) -> Iterator[Tuple[str, Iterable[Recipient]]]:
+    """Agrupa os favorecidos em lotes por campanha, na ordem em que as campanhas aparecem.
+
+    Campanhas com mais de LOTE_MAX_RECIPIENTS favorecidos ocupam vários lotes.
+    Com grouped=True (entrada já agrupada por campanha, ou com uma só) cada lote
+    é lido sob demanda e fechado quando a campanha muda, sem guardar nada; uma
+    campanha que reaparecer depois ganha outro lote. Com grouped=False as
+    campanhas intercaladas são acumuladas em memória até encher um lote ou
+    acabar a entrada: o custo é guardar todos os favorecidos. None confere
+    listas e tuplas de uma passada (já estão em memória: intercaladas são
+    acumuladas); nos demais iteráveis as sequências contínuas saem sob demanda
+    e só as campanhas que reaparecem depois de encerradas são acumuladas.
+    """
+    if grouped is None and isinstance(recipients, (list, tuple)):
+        grouped = _campaigns_contiguous(recipients)
+    if grouped is None:
+        return _stream_lotes(recipients)
+    return _stream_runs(recipients) if grouped else _buffer_campaigns(recipients)
+
+def _batches(rows: Iterable[Recipient], size: int) -> Iterator[List[Recipient]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch: return
+        yield batch
+
+def _segment_records(templates, lote: int, seq: int, recipients: Iterable[Recipient], date_s: str) -> Iterator[str]:
+    """Pares A/B dos favorecidos, numerados a partir do sequencial seq do lote."""
+    segmento_a, segmento_b = templates["segmento_a_pix"].render, templates["segmento_b_pix"].render
+    for r in recipients:
+        cents, doc = r.amount_cents, r.document
+        yield segmento_a(lote, seq + 1, r.name, date_s, cents, date_s, cents)
+        yield segmento_b(lote, seq + 2, "1" if len(doc) == 11 else "2", doc, r.pix_key)
+        seq += 2
+
+def _render_segments(company: "Company", lote: int, seq: int, rows: List[Tuple], date_s: str) -> str:
+    """Executado no pool: devolve os pares A/B do bloco como texto (registros separados por '\\n')."""
+    recipients = [Recipient(*row) for row in rows]
+    return "\n".join(_segment_records(compile_layouts(company), lote, seq, recipients, date_s))
+
+_pools: Dict[int, "ProcessPoolExecutor"] = {}
+_pools_lock = threading.Lock()
+
+def _render_pool(workers: int):
+    """Pool de processos compartilhado (criado no primeiro arquivo grande com vários lotes).
+
+    forkserver evita copiar locks de threads do servidor para os filhos.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["cnab_generator"])
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return pool
+
+def _drop_pool(workers: int, pool):
+    """Descarta um pool que falhou, para que o próximo arquivo não o reaproveite."""
+    with _pools_lock:
+        if _pools.get(workers) is pool: del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
 
-def pad_alfa(text: str, length: int) -> str:
-    t = (text or "")
-    t = "".join(c for c in unicodedata.normalize('NFD', t) if unicodedata.category(c) != 'Mn')
-    t = t.encode("ascii", "ignore").decode("ascii").upper()
-    return t[:length].ljust(length, " ")
+def _has_forkserver() -> bool:
+    return "forkserver" in multiprocessing.get_all_start_methods()
 
-def pad_num(num: Any, length: int) -> str:
-    return only_digits(str(num or "0")).zfill(length)
+def render_workers() -> int:
+    """Processos de renderização: CNAB_RENDER_WORKERS (padrão 1, sem pool); 1 onde não há forkserver.
+
+    Sem forkserver (Windows, inclusive o executável do PyInstaller) o pool
+    usaria spawn, que reexecuta o ponto de entrada em cada filho.
+    """
+    if not _has_forkserver():
+        return 1
+    import config
+    return config.CNAB_RENDER_WORKERS or os.cpu_count() or 1
 
 @dataclass
 class Company:
@@ -28,78 +195,185 @@ class CNAB240Generator:
     def __init__(self, company: Company):
         self.company = company; self.records: List[str] = []
         self.lote_seq = 0; self.reg_count = 0
+        self.total_cents = 0; self.recipient_count = 0
+        # Layouts validados uma única vez; os campos fixos já vêm renderizados
+        self.layouts = compile_layouts(company)
+        self._segmento_a = self.layouts["segmento_a_pix"].render
+        self._segmento_b = self.layouts["segmento_b_pix"].render
+        self._date, self._date_s = None, ""
+        # Pool usado na geração atual e se ele falhou (daí em diante, tudo é renderizado aqui)
+        self._pool, self._pool_failed = None, False
     
-    def _add_record(self, line: str, func_name: str):
-        if len(line) != 240:
-            raise ValueError(f"[{func_name}] Registro deve ter 240, mas tem {len(line)}")
+    def _add_record(self, line: str):
         self.records.append(line); self.reg_count += 1
     
+    def _date_str(self, dt: date) -> str:
+        if dt != self._date:
+            self._date, self._date_s = dt, dt.strftime("%d%m%Y")
+        return self._date_s
+    
     def header_arquivo(self, seq_num: int):
-        c = self.company
-        line = (pad_num(c.bank_code, 3) + pad_num(0, 4) + pad_num(0, 1) +
-                pad_alfa("", 9) + pad_num(2, 1) + pad_num(c.cnpj, 14) +
-                pad_alfa("", 20) + pad_num(c.agency, 5) + pad_alfa(c.agency_dv, 1) +
-                pad_num(c.account, 12) + pad_num(c.account_dv, 1) + pad_alfa("", 1) +
-                pad_alfa(c.name, 30) + pad_alfa("BANCO INTER", 30) +
-                pad_alfa("", 10) + pad_num(1, 1) + datetime.now().strftime("%d%m%Y") +
-                datetime.now().strftime("%H%M%S") + pad_num(seq_num, 6) +
-                pad_num(c.layout_file, 3) + pad_num(0, 5) + pad_alfa("", 20) +
-                pad_alfa("", 20) + pad_alfa("", 29))
-        self._add_record(line, "header_arquivo")
+        now = datetime.now()
+        self._add_record(self.layouts["header_arquivo"].render(
+            now.strftime("%d%m%Y"), now.strftime("%H%M%S"), seq_num))
     
     def trailer_arquivo(self):
-        line = (pad_num(self.company.bank_code, 3) + pad_num(9999, 4) +
-                pad_num(9, 1) + pad_alfa("", 9) + pad_num(1, 6) +
-                pad_num(self.reg_count + 1, 6) + pad_num(0, 6) + pad_alfa("", 205))
-        self._add_record(line, "trailer_arquivo")
-
-    def header_lote_pix(self):
-        self.lote_seq += 1; c = self.company
-        line = (pad_num(c.bank_code, 3) + pad_num(self.lote_seq, 4) + pad_num(1, 1) +
-                pad_alfa("C", 1) + pad_num(20, 2) + pad_num(45, 2) +
-                pad_num(c.layout_lote, 3) + pad_alfa("", 1) + pad_num(2, 1) +
-                pad_num(c.cnpj, 14) + pad_alfa("", 20) + pad_num(c.agency, 5) +
-                pad_alfa(c.agency_dv, 1) + pad_num(c.account, 12) +
-                pad_num(c.account_dv, 1) + pad_alfa("", 1) + pad_alfa(c.name, 30) +
-                pad_alfa("", 40) + pad_alfa("", 40) + pad_num(0, 8) +
-                pad_alfa("", 15) + pad_alfa("", 20) + pad_num(0, 8) +
-                pad_alfa("", 2) + pad_alfa("", 5))
-        self._add_record(line, "header_lote_pix")
+        self._add_record(self.layouts["trailer_arquivo"].render(self.lote_seq, self.reg_count + 1))
+
+    def header_lote_pix(self, campaign: str = ""):
+        self.lote_seq += 1
+        self._add_record(self.layouts["header_lote_pix"].render(self.lote_seq, campaign))
 
     def trailer_lote(self, soma_cents: int, qtd_regs: int):
-        line = (pad_num(self.company.bank_code, 3) + pad_num(self.lote_seq, 4) +
-                pad_num(5, 1) + pad_alfa("", 9) + pad_num(qtd_regs, 6) +
-                pad_num(soma_cents, 18) + pad_num(0, 18) + pad_alfa("", 171) +
-                pad_alfa("", 10))
-        self._add_record(line, "trailer_lote")
+        self._add_record(self.layouts["trailer_lote"].render(self.lote_seq, qtd_regs, soma_cents))
     
-    def segmento_a_pix(self, idx: int, r: Dict[str, Any], v_cents: int, dt: date):
-        line = (pad_num(self.company.bank_code, 3) + pad_num(self.lote_seq, 4) +
-                pad_num(3, 1) + pad_num(idx, 5) + pad_alfa("A", 1) + pad_num(3, 1) +
-                pad_num("00", 2) + pad_num(self.company.bank_code, 3) +
-                pad_num(0, 3) + pad_alfa("", 20) + pad_alfa(r.get("name", ""), 30) +
-                pad_alfa("PAG PIX", 20) + dt.strftime("%d%m%Y") + pad_alfa("BRL", 3) +
-                pad_num(0, 15) + pad_num(v_cents, 15) + pad_alfa("", 20) +
-                dt.strftime("%d%m%Y") + pad_num(v_cents, 15) + pad_alfa("", 40) +
-                pad_num(0, 2) + pad_num(0, 2) + pad_alfa("", 1) +
-                pad_num(0, 1) + pad_alfa("", 17))
-        self._add_record(line, "segmento_a_pix")
-
-    def segmento_b_pix(self, idx: int, r: Dict[str, Any]):
-        doc = only_digits(r.get("document", "")); t_doc = "1" if len(doc) == 11 else "2"
-        line = (pad_num(self.company.bank_code, 3) + pad_num(self.lote_seq, 4) +
-                pad_num(3, 1) + pad_num(idx, 5) + pad_alfa("B", 1) +
-                pad_alfa("", 3) + pad_num(t_doc, 1) + pad_num(doc, 14) +
-                pad_alfa(r.get("pix_key", ""), 77) + pad_alfa("", 131))
-        self._add_record(line, "segmento_b_pix")
-
-    def generate_pix_file(self, recipients: List[Dict[str, Any]], seq_num: int=1) -> str:
+    def segmento_a_pix(self, idx: int, r: Recipient, v_cents: int, dt: date):
+        d = self._date_str(dt)
+        self._add_record(self._segmento_a(self.lote_seq, idx, r.name, d, v_cents, d, v_cents))
+
+    def segmento_b_pix(self, idx: int, r: Recipient):
+        doc = r.document; t_doc = "1" if len(doc) == 11 else "2"
+        self._add_record(self._segmento_b(self.lote_seq, idx, t_doc, doc, r.pix_key))
+
+    def _flush(self) -> List[str]:
+        pending, self.records = self.records, []
+        return pending
+
+    def iter_pix_file(self, recipients: Iterable[Recipient], seq_num: int=1, workers: Optional[int]=None,
+                      grouped: Optional[bool]=None) -> Iterator[str]:
+        """Produz o arquivo em ordem, um lote por campanha; totais e contagens são acumulados no caminho.
+
+        Cada item é um registro ou, para blocos renderizados no pool de processos,
+        vários registros já separados por '\\n'. workers=1 desliga o paralelismo;
+        None usa CNAB_RENDER_WORKERS (sempre 1 sem forkserver). Se o pool não puder
+        ser criado ou quebrar, os blocos são renderizados aqui. grouped é repassado
+        ao group_lotes.
+        """
+        if workers is None or not _has_forkserver():
+            workers = render_workers()
+        return metrics.measure_iter("cnab.render", self._iter_records(recipients, seq_num, workers, grouped))
+
+    def _iter_records(self, recipients: Iterable[Recipient], seq_num: int, workers: int,
+                      grouped: Optional[bool]) -> Iterator[str]:
         self.records, self.lote_seq, self.reg_count = [], 0, 0
-        self.header_arquivo(seq_num); self.header_lote_pix()
-        total_valor, pay_date, seq_in_lote = 0, date.today(), 0
-        for r in recipients:
-            valor_cents = int(float(r["amount"]) * 100); total_valor += valor_cents
-            seq_in_lote += 1; self.segmento_a_pix(seq_in_lote, r, valor_cents, pay_date)
-            seq_in_lote += 1; self.segmento_b_pix(seq_in_lote, r)
-        self.trailer_lote(total_valor, seq_in_lote + 2); self.trailer_arquivo()
-        return "\n".join(self.records)
\ No newline at end of file
+        self.total_cents, self.recipient_count = 0, 0
+        self.header_arquivo(seq_num)
+        yield from self._flush()
+        date_s = self._date_str(date.today())
+
+        # Com pool, na ordem do arquivo: registros prontos (str) e blocos (lote, seq,
+        # favorecidos, future), com future None para os renderizados aqui
+        pending: Deque[Any] = deque()
+        self._pool, self._pool_failed = None, False
+        try:
+            for campaign, rows in group_lotes(recipients, grouped):
+                self.lote_seq += 1
+                if workers > 1:
+                    yield from self._queue_lote(pending, campaign, rows, date_s, workers)
+                else:
+                    yield from self._stream_lote(campaign, rows, date_s)
+            while pending:
+                yield from self._emit(pending.popleft(), date_s, workers)
+        finally:
+            for item in pending:
+                if isinstance(item, tuple) and item[3] is not None: item[3].cancel()
+
+        self.trailer_arquivo()
+        metrics.inc("cnab_rows_total", self.recipient_count, stage="cnab.render")
+        yield from self._flush()
+
+    def _count_lote(self, seq: int, total: int):
+        """seq é o último sequencial de detalhe do lote (2 registros por favorecido)."""
+        self.reg_count += seq + 2
+        self.recipient_count += seq // 2
+        self.total_cents += total
+
+    def _stream_lote(self, campaign: str, rows: Iterable[Recipient], date_s: str) -> Iterator[str]:
+        """Lote renderizado aqui, registro a registro, à medida que os favorecidos chegam."""
+        lote, seq, total = self.lote_seq, 0, 0
+        segmento_a, segmento_b = self._segmento_a, self._segmento_b
+        yield self.layouts["header_lote_pix"].render(lote, campaign)
+        for r in rows:
+            cents, doc = r.amount_cents, r.document
+            total += cents
+            yield segmento_a(lote, seq + 1, r.name, date_s, cents, date_s, cents)
+            yield segmento_b(lote, seq + 2, "1" if len(doc) == 11 else "2", doc, r.pix_key)
+            seq += 2
+        yield self.layouts["trailer_lote"].render(lote, seq + 2, total)
+        self._count_lote(seq, total)
+
+    def _queue_lote(self, pending: Deque[Any], campaign: str, rows: Iterable[Recipient], date_s: str,
+                    workers: int) -> Iterator[str]:
+        """Lote em blocos de PARALLEL_MIN_RECIPIENTS: os cheios vão para o pool, o último é renderizado aqui.
+
+        Só um bloco de favorecidos é lido por vez; no máximo 2 blocos por worker ficam em voo.
+        """
+        lote, seq, total = self.lote_seq, 0, 0
+        pending.append(self.layouts["header_lote_pix"].render(lote, campaign))
+        for batch in _batches(rows, PARALLEL_MIN_RECIPIENTS):
+            future = None
+            if len(batch) == PARALLEL_MIN_RECIPIENTS and not self._pool_failed:
+                future = self._submit(workers, lote, seq, batch, date_s)
+            pending.append((lote, seq, batch, future))
+            seq += 2 * len(batch)
+            total += sum(r.amount_cents for r in batch)
+            yield from self._drain(pending, date_s, workers)
+        pending.append(self.layouts["trailer_lote"].render(lote, seq + 2, total))
+        self._count_lote(seq, total)
+        yield from self._drain(pending, date_s, workers)
+
+    def _submit(self, workers: int, lote: int, seq: int, batch: List[Recipient], date_s: str):
+        """Envia o bloco ao pool; None (bloco renderizado aqui) se o pool não puder ser usado."""
+        from concurrent.futures.process import BrokenProcessPool
+        rows = [(r.name, r.pix_key, r.document, r.amount_cents) for r in batch]
+        try:
+            self._pool = _render_pool(workers)
+            return self._pool.submit(_render_segments, self.company, lote, seq, rows, date_s)
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"Pool de renderização indisponível ({e}); renderizando no próprio processo")
+            self._discard_pool(workers)
+            return None
+
+    def _discard_pool(self, workers: int):
+        self._pool_failed = True
+        if self._pool is not None:
+            _drop_pool(workers, self._pool)
+            self._pool = None
+
+    def _drain(self, pending: Deque[Any], date_s: str, workers: int) -> Iterator[str]:
+        # O que não está no pool sai já; um future só é esperado com mais de 2 itens por worker na fila
+        while pending and (isinstance(pending[0], str) or pending[0][3] is None or len(pending) > 2 * workers):
+            yield from self._emit(pending.popleft(), date_s, workers)
+
+    def _emit(self, item: Any, date_s: str, workers: int) -> Iterator[str]:
+        if isinstance(item, str):
+            yield item
+            return
+        from concurrent.futures.process import BrokenProcessPool
+        lote, seq, batch, future = item
+        if future is not None:
+            try:
+                text = future.result()
+            except BrokenProcessPool as e:
+                if not self._pool_failed:
+                    logger.warning(f"Pool de renderização quebrou ({e}); renderizando no próprio processo")
+                    self._discard_pool(workers)
+            else:
+                yield text
+                return
+        yield from _segment_records(self.layouts, lote, seq, batch, date_s)
+
+    @metrics.timed("cnab.write")
+    def write_pix_file(self, recipients: Iterable[Recipient], fh: TextIO, seq_num: int=1, workers: Optional[int]=None,
+                       grouped: Optional[bool]=None) -> int:
+        """Grava o arquivo direto em fh, registro a registro. Retorna os caracteres escritos."""
+        written = 0
+        for piece in join_records(self.iter_pix_file(recipients, seq_num, workers, grouped)):
+            fh.write(piece); written += len(piece)
+        return written
+
+    @metrics.timed("cnab.generate")
+    def generate_pix_file(self, recipients: Iterable[Recipient], seq_num: int=1, workers: Optional[int]=None) -> str:
+        records = list(self.iter_pix_file(recipients, seq_num, workers))
+        self.records = records
+        return "\n".join(records)
@@ -0,0 +1,243 @@
+from dataclasses import dataclass, astuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import unicodedata
+
+RECORD_LENGTH = 240
+NUM, ALFA = "num", "alfa"
+
+def only_digits(s: str) -> str:
+    return "".join(ch for ch in str(s or "") if ch.isdigit())
+
+def _normalize_slow(text: str) -> str:
+    t = "".join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+    return t.encode("ascii", "ignore").decode("ascii").upper()
+
+def _build_translation() -> Dict[int, str]:
+    """Tabela caractere -> texto final para ASCII, Latin-1, Latin Extended-A/B e acentos combinantes."""
+    chars = [chr(c) for c in range(0x80)] + [chr(c) for c in range(0x80, 0x250)] + \
+            [chr(c) for c in range(0x300, 0x370)]
+    return {ord(c): _normalize_slow(c) for c in chars}
+
+# Como NFD + remoção de Mn + ASCII + upper age caractere a caractere, a tabela
+# reproduz exatamente a normalização completa para os caracteres que cobre.
+_TRANSLATION = _build_translation()
+
+def _normalize(text: str) -> str:
+    t = text.translate(_TRANSLATION)
+    return t if t.isascii() else _normalize_slow(text)
+
+@lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    """Remove acentos, descarta o que não é ASCII e converte para maiúsculas (memoizado)."""
+    return _normalize(text)
+
+def normalize_column(values: Iterable[Any]) -> List[str]:
+    """Normaliza uma coluna inteira de uma vez, sem passar pelo cache LRU."""
+    return [_normalize(v) if v else "" for v in values]
+
+def pad_alfa(text: str, length: int) -> str:
+    if not text: return " " * length
+    return normalize_text(text)[:length].ljust(length, " ")
+
+def pad_num(num: Any, length: int) -> str:
+    return only_digits(str(num or "0")).zfill(length)
+
+@dataclass(frozen=True)
+class Field:
+    """Campo de posição fixa (início 1-based, como nos manuais FEBRABAN).
+
+    value: constante do layout; company: atributo de Company; sem nenhum dos
+    dois o campo é variável e preenchido a cada registro.
+    """
+    name: str; start: int; length: int; kind: str
+    value: Any = None; company: Optional[str] = None
+
+    @property
+    def is_slot(self) -> bool:
+        return self.value is None and self.company is None
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length - 1
+
+# --- LAYOUTS CNAB240 PIX (Banco Inter) ---
+LAYOUTS: Dict[str, Tuple[Field, ...]] = {
+    "header_arquivo": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM, value=0),
+        Field("tipo_registro", 8, 1, NUM, value=0),
+        Field("brancos_1", 9, 9, ALFA, value=""),
+        Field("tipo_inscricao", 18, 1, NUM, value=2),
+        Field("cnpj", 19, 14, NUM, company="cnpj"),
+        Field("convenio", 33, 20, ALFA, value=""),
+        Field("agencia", 53, 5, NUM, company="agency"),
+        Field("agencia_dv", 58, 1, ALFA, company="agency_dv"),
+        Field("conta", 59, 12, NUM, company="account"),
+        Field("conta_dv", 71, 1, NUM, company="account_dv"),
+        Field("dv_ag_conta", 72, 1, ALFA, value=""),
+        Field("nome_empresa", 73, 30, ALFA, company="name"),
+        Field("nome_banco", 103, 30, ALFA, value="BANCO INTER"),
+        Field("brancos_2", 133, 10, ALFA, value=""),
+        Field("codigo_remessa", 143, 1, NUM, value=1),
+        Field("data_geracao", 144, 8, NUM),
+        Field("hora_geracao", 152, 6, NUM),
+        Field("sequencial", 158, 6, NUM),
+        Field("layout_arquivo", 164, 3, NUM, company="layout_file"),
+        Field("densidade", 167, 5, NUM, value=0),
+        Field("reservado_banco", 172, 20, ALFA, value=""),
+        Field("reservado_empresa", 192, 20, ALFA, value=""),
+        Field("brancos_3", 212, 29, ALFA, value=""),
+    ),
+    "trailer_arquivo": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM, value=9999),
+        Field("tipo_registro", 8, 1, NUM, value=9),
+        Field("brancos_1", 9, 9, ALFA, value=""),
+        Field("qtd_lotes", 18, 6, NUM),
+        Field("qtd_registros", 24, 6, NUM),
+        Field("qtd_contas", 30, 6, NUM, value=0),
+        Field("brancos_2", 36, 205, ALFA, value=""),
+    ),
+    "header_lote_pix": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM),
+        Field("tipo_registro", 8, 1, NUM, value=1),
+        Field("operacao", 9, 1, ALFA, value="C"),
+        Field("servico", 10, 2, NUM, value=20),
+        Field("forma_lancamento", 12, 2, NUM, value=45),
+        Field("layout_lote", 14, 3, NUM, company="layout_lote"),
+        Field("brancos_1", 17, 1, ALFA, value=""),
+        Field("tipo_inscricao", 18, 1, NUM, value=2),
+        Field("cnpj", 19, 14, NUM, company="cnpj"),
+        Field("convenio", 33, 20, ALFA, value=""),
+        Field("agencia", 53, 5, NUM, company="agency"),
+        Field("agencia_dv", 58, 1, ALFA, company="agency_dv"),
+        Field("conta", 59, 12, NUM, company="account"),
+        Field("conta_dv", 71, 1, NUM, company="account_dv"),
+        Field("dv_ag_conta", 72, 1, ALFA, value=""),
+        Field("nome_empresa", 73, 30, ALFA, company="name"),
+        Field("mensagem", 103, 40, ALFA),
+        Field("logradouro", 143, 40, ALFA, value=""),
+        Field("numero", 183, 8, NUM, value=0),
+        Field("complemento", 191, 15, ALFA, value=""),
+        Field("cidade", 206, 20, ALFA, value=""),
+        Field("cep", 226, 8, NUM, value=0),
+        Field("estado", 234, 2, ALFA, value=""),
+        Field("brancos_2", 236, 5, ALFA, value=""),
+    ),
+    "trailer_lote": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM),
+        Field("tipo_registro", 8, 1, NUM, value=5),
+        Field("brancos_1", 9, 9, ALFA, value=""),
+        Field("qtd_registros", 18, 6, NUM),
+        Field("soma_valores", 24, 18, NUM),
+        Field("qtd_moedas", 42, 18, NUM, value=0),
+        Field("brancos_2", 60, 171, ALFA, value=""),
+        Field("ocorrencias", 231, 10, ALFA, value=""),
+    ),
+    "segmento_a_pix": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM),
+        Field("tipo_registro", 8, 1, NUM, value=3),
+        Field("sequencial", 9, 5, NUM),
+        Field("segmento", 14, 1, ALFA, value="A"),
+        Field("tipo_movimento", 15, 1, NUM, value=3),
+        Field("instrucao", 16, 2, NUM, value="00"),
+        Field("camara", 18, 3, NUM, company="bank_code"),
+        Field("banco_favorecido", 21, 3, NUM, value=0),
+        Field("conta_favorecido", 24, 20, ALFA, value=""),
+        Field("nome_favorecido", 44, 30, ALFA),
+        Field("seu_numero", 74, 20, ALFA, value="PAG PIX"),
+        Field("data_pagamento", 94, 8, NUM),
+        Field("moeda", 102, 3, ALFA, value="BRL"),
+        Field("qtd_moeda", 105, 15, NUM, value=0),
+        Field("valor_pagamento", 120, 15, NUM),
+        Field("nosso_numero", 135, 20, ALFA, value=""),
+        Field("data_real", 155, 8, NUM),
+        Field("valor_real", 163, 15, NUM),
+        Field("informacao_2", 178, 40, ALFA, value=""),
+        Field("finalidade_doc", 218, 2, NUM, value=0),
+        Field("finalidade_ted", 220, 2, NUM, value=0),
+        Field("brancos_1", 222, 1, ALFA, value=""),
+        Field("aviso", 223, 1, NUM, value=0),
+        Field("ocorrencias", 224, 17, ALFA, value=""),
+    ),
+    "segmento_b_pix": (
+        Field("banco", 1, 3, NUM, company="bank_code"),
+        Field("lote", 4, 4, NUM),
+        Field("tipo_registro", 8, 1, NUM, value=3),
+        Field("sequencial", 9, 5, NUM),
+        Field("segmento", 14, 1, ALFA, value="B"),
+        Field("brancos_1", 15, 3, ALFA, value=""),
+        Field("tipo_inscricao", 18, 1, NUM),
+        Field("documento", 19, 14, NUM),
+        Field("chave_pix", 33, 77, ALFA),
+        Field("brancos_2", 110, 131, ALFA, value=""),
+    ),
+}
+
+def _render(field: Field, value: Any) -> str:
+    return pad_num(value, field.length) if field.kind == NUM else pad_alfa(value, field.length)
+
+def _slot_formatter(record: str, field: Field) -> Callable[[Any], str]:
+    length, name = field.length, field.name
+    if field.kind == ALFA:
+        return lambda v: pad_alfa(v, length)
+
+    def fmt(v: Any) -> str:
+        s = str(v) if type(v) is int and v >= 0 else only_digits(str(v or "0"))
+        if len(s) > length:
+            raise ValueError(f"[{record}] Campo {name} deve ter {length} posições, mas tem {len(s)}")
+        return s.zfill(length)
+    return fmt
+
+class RecordTemplate:
+    """Registro com as partes fixas já renderizadas e os campos variáveis em slots."""
+
+    def __init__(self, record: str, fields: Tuple[Field, ...], company: Any):
+        self.record = record
+        self.fields = fields
+        pieces: List[Optional[str]] = []; slots = []
+        position = 1
+        for f in fields:
+            if f.start != position:
+                raise ValueError(f"[{record}] Campo {f.name} começa em {f.start}, esperado {position}")
+            position += f.length
+            if f.is_slot:
+                slots.append((len(pieces), _slot_formatter(record, f)))
+                pieces.append(None)
+                continue
+            text = _render(f, f.value if f.company is None else getattr(company, f.company))
+            if len(text) != f.length:
+                raise ValueError(f"[{record}] Campo {f.name} deve ter {f.length} posições, mas tem {len(text)}")
+            # Constantes vizinhas viram um único pedaço
+            if pieces and pieces[-1] is not None: pieces[-1] += text
+            else: pieces.append(text)
+        if position - 1 != RECORD_LENGTH:
+            raise ValueError(f"[{record}] Registro deve ter {RECORD_LENGTH}, mas tem {position - 1}")
+        self.slots = tuple(f.name for f in fields if f.is_slot)
+        self._pieces = pieces
+        self._formatters = tuple(slots)
+
+    def render(self, *values: Any) -> str:
+        """Preenche os slots na ordem de self.slots."""
+        if len(values) != len(self._formatters):
+            raise ValueError(f"[{self.record}] Esperados {len(self._formatters)} valores, recebidos {len(values)}")
+        pieces = self._pieces.copy()
+        for (i, fmt), v in zip(self._formatters, values):
+            pieces[i] = fmt(v)
+        return "".join(pieces)
+
+_compiled: Dict[Tuple, Dict[str, RecordTemplate]] = {}
+
+def compile_layouts(company: Any) -> Dict[str, RecordTemplate]:
+    """Compila (uma vez por dados de empresa) os templates de todos os registros."""
+    key = astuple(company)
+    templates = _compiled.get(key)
+    if templates is None:
+        if len(_compiled) >= 32: _compiled.clear()
+        templates = {record: RecordTemplate(record, fields, company) for record, fields in LAYOUTS.items()}
+        _compiled[key] = templates
+    return templates
@@ -0,0 +1,422 @@
+"""Leitura e conferência de arquivos CNAB240 (remessas geradas e retornos do banco) via mmap.
+
+O arquivo não é carregado nem copiado: os registros têm tamanho fixo, então o
+registro i começa em i * stride, e uma visão NumPy (n, 240) sobre o mmap
+indexa lotes e segmentos em uma passada vetorizada. Os campos só são
+decodificados quando acessados, pelos mesmos LAYOUTS usados pelo gerador.
+
+Uso: python src/cnab_reader.py arquivo.rem [arquivo.ret ...]
+"""
+import os
+import sys
+import mmap
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from cnab_layouts import LAYOUTS, NUM, RECORD_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# tipo_registro (posição 8) -> layout; detalhes (3) dependem também do segmento (posição 14)
+_KINDS = {"0": "header_arquivo", "1": "header_lote_pix", "5": "trailer_lote", "9": "trailer_arquivo"}
+_SEGMENTS = {"A": "segmento_a_pix", "B": "segmento_b_pix"}
+
+# Campo -> (início, fim, tipo) em offsets 0-based, por layout
+_FIELDS: Dict[str, Dict[str, Tuple[int, int, str]]] = {
+    record: {f.name: (f.start - 1, f.end, f.kind) for f in fields} for record, fields in LAYOUTS.items()
+}
+
+_ZERO, _NINE = ord("0"), ord("9")
+_T_HEADER_ARQ, _T_HEADER_LOTE, _T_DETALHE, _T_TRAILER_LOTE, _T_TRAILER_ARQ = (ord(c) for c in "01359")
+
+def _column(name: str, record: str) -> slice:
+    start, end, _ = _FIELDS[record][name]
+    return slice(start, end)
+
+# Colunas usadas na indexação/conferência (iguais nos layouts que as compartilham)
+_LOTE = _column("lote", "header_lote_pix")
+_TIPO = _FIELDS["header_arquivo"]["tipo_registro"][0]
+_SEGMENTO = _FIELDS["segmento_a_pix"]["segmento"][0]
+_SEQUENCIAL = _column("sequencial", "segmento_a_pix")
+_VALOR = _column("valor_pagamento", "segmento_a_pix")
+_QTD_REG_LOTE = _column("qtd_registros", "trailer_lote")
+_SOMA_LOTE = _column("soma_valores", "trailer_lote")
+_QTD_LOTES = _column("qtd_lotes", "trailer_arquivo")
+_QTD_REG_ARQ = _column("qtd_registros", "trailer_arquivo")
+
+def _to_int(block: np.ndarray) -> np.ndarray:
+    """Dígitos ASCII (m, k) -> inteiros (m,); até 18 dígitos cabem em int64."""
+    weights = 10 ** np.arange(block.shape[1] - 1, -1, -1, dtype=np.int64)
+    return (block.astype(np.int64) - _ZERO) @ weights
+
+def _to_text(block: np.ndarray) -> List[str]:
+    """Bytes (m, k) -> m textos sem os brancos à direita, com uma única decodificação."""
+    m, k = block.shape
+    text = np.ascontiguousarray(block).tobytes().decode("latin-1")
+    return [text[i:i + k].rstrip() for i in range(0, m * k, k)]
+
+class Record:
+    """Um registro do arquivo; os campos são lidos do mmap só quando pedidos.
+
+    Campos numéricos viram int, alfanuméricos str sem os brancos à direita.
+    """
+    __slots__ = ("_file", "index")
+
+    def __init__(self, cnab_file: "CNABFile", index: int):
+        self._file = cnab_file
+        self.index = index
+
+    @property
+    def kind(self) -> Optional[str]:
+        """Nome do layout (chave de LAYOUTS), ou None para tipo/segmento sem layout."""
+        return self._file.kind_of(self.index)
+
+    def raw(self, name: Optional[str] = None) -> str:
+        """Texto do registro inteiro ou, com name, do campo sem conversão."""
+        if name is None:
+            return self._file.raw(self.index).decode("latin-1")
+        start, end, _ = self._spec(name)
+        return self._file.field(self.index, start, end)
+
+    def _spec(self, name: str) -> Tuple[int, int, str]:
+        kind = self.kind
+        if kind is None or name not in _FIELDS[kind]:
+            raise KeyError(f"Registro {self.index + 1} ({kind or 'sem layout'}) não tem o campo {name}")
+        return _FIELDS[kind][name]
+
+    def __getitem__(self, name: str) -> Any:
+        start, end, field_kind = self._spec(name)
+        text = self._file.field(self.index, start, end)
+        if field_kind == NUM:
+            return int(text) if text.isdigit() else text
+        return text.rstrip()
+
+    def to_dict(self) -> Dict[str, Any]:
+        kind = self.kind
+        return {name: self[name] for name in _FIELDS[kind]} if kind else {"raw": self.raw()}
+
+    def __repr__(self) -> str:
+        return f"<Record {self.index + 1} {self.kind}>"
+
+class CNABFile:
+    """Arquivo CNAB240 mapeado em memória, com índice por lote e segmento.
+
+    Aceita registros separados por LF, CRLF ou sem separador, com ou sem
+    quebra de linha no fim. segment(lote, "A", m) e pair(lote, m) são O(1):
+    as posições de cada segmento ficam em um vetor global, e cada lote guarda
+    só o intervalo que lhe pertence.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._fh = open(self.path, "rb")
+        try:
+            size = os.fstat(self._fh.fileno()).st_size
+            if size < RECORD_LENGTH:
+                raise ValueError(f"{self.path}: arquivo vazio ou menor que um registro")
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self.separator = self._detect_separator()
+            self.stride = RECORD_LENGTH + len(self.separator)
+            self.count, rest = divmod(size + len(self.separator), self.stride)
+            if rest not in (0, len(self.separator)):
+                raise ValueError(f"{self.path}: tamanho {size} não corresponde a registros de {RECORD_LENGTH} posições")
+            # Visão (n, 240) sobre o mmap: nenhuma cópia dos dados
+            self.records = np.ndarray((self.count, RECORD_LENGTH), dtype=np.uint8, buffer=self._mm,
+                                      strides=(self.stride, 1))
+            self._build_index()
+        except Exception:
+            self.close()
+            raise
+
+    def _detect_separator(self) -> bytes:
+        tail = self._mm[RECORD_LENGTH:RECORD_LENGTH + 2]
+        if tail.startswith(b"\r\n"): return b"\r\n"
+        if tail.startswith(b"\n"): return b"\n"
+        return b""
+
+    def _build_index(self):
+        tipo = self.records[:, _TIPO]
+        self._headers = np.flatnonzero(tipo == _T_HEADER_LOTE)
+        self._trailers = np.flatnonzero(tipo == _T_TRAILER_LOTE)
+        self._lote_numbers = _to_int(self.records[self._headers, _LOTE]) if len(self._headers) else np.empty(0, np.int64)
+        self._lote_pos = {int(n): i for i, n in enumerate(self._lote_numbers)}
+
+        detail = tipo == _T_DETALHE
+        segments = self.records[:, _SEGMENTO]
+        self._segments: Dict[str, np.ndarray] = {}
+        self._bounds: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        ends = np.full(len(self._headers), self.count, dtype=np.int64)
+        paired = min(len(self._headers), len(self._trailers))
+        ends[:paired] = self._trailers[:paired]
+        for code in np.unique(segments[detail]):
+            positions = np.flatnonzero(detail & (segments == code))
+            letter = chr(code)
+            self._segments[letter] = positions
+            self._bounds[letter] = (np.searchsorted(positions, self._headers), np.searchsorted(positions, ends))
+
+    # --- acesso ---
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.records = None  # a visão NumPy precisa sumir antes do mmap fechar
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # ainda há visões vivas (ex.: em um traceback); o GC fecha o mmap
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close(); self._fh = None
+
+    def _offset(self, index: int) -> int:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Registro {index + 1} fora do arquivo ({self.count} registros)")
+        return index * self.stride
+
+    def raw(self, index: int) -> bytes:
+        offset = self._offset(index)
+        return self._mm[offset:offset + RECORD_LENGTH]
+
+    def field(self, index: int, start: int, end: int) -> str:
+        """Só os bytes do campo saem do mmap."""
+        offset = self._offset(index)
+        return self._mm[offset + start:offset + end].decode("latin-1")
+
+    def kind_of(self, index: int) -> Optional[str]:
+        offset = self._offset(index)
+        tipo = chr(self._mm[offset + _TIPO])
+        if tipo == "3":
+            return _SEGMENTS.get(chr(self._mm[offset + _SEGMENTO]))
+        return _KINDS.get(tipo)
+
+    def record(self, index: int) -> Record:
+        self._offset(index)  # confere o intervalo
+        return Record(self, index)
+
+    def __iter__(self) -> Iterator[Record]:
+        return (Record(self, i) for i in range(self.count))
+
+    @property
+    def header(self) -> Record:
+        return self.record(0)
+
+    @property
+    def trailer(self) -> Record:
+        return self.record(self.count - 1)
+
+    @property
+    def lotes(self) -> List[int]:
+        return [int(n) for n in self._lote_numbers]
+
+    def _lote_index(self, lote: int) -> int:
+        try:
+            return self._lote_pos[lote]
+        except KeyError:
+            raise KeyError(f"Lote {lote} não existe no arquivo") from None
+
+    def lote_header(self, lote: int) -> Record:
+        return Record(self, int(self._headers[self._lote_index(lote)]))
+
+    def lote_trailer(self, lote: int) -> Optional[Record]:
+        i = self._lote_index(lote)
+        return Record(self, int(self._trailers[i])) if i < len(self._trailers) else None
+
+    def segment_count(self, lote: int, letter: str = "A") -> int:
+        if letter not in self._bounds: return 0
+        i = self._lote_index(lote)
+        starts, ends = self._bounds[letter]
+        return int(ends[i] - starts[i])
+
+    def segment(self, lote: int, letter: str, m: int) -> Record:
+        """m-ésimo (1-based) segmento `letter` do lote."""
+        i = self._lote_index(lote)
+        if letter not in self._bounds:
+            raise KeyError(f"Segmento {letter} não existe no arquivo")
+        starts, ends = self._bounds[letter]
+        if not 1 <= m <= ends[i] - starts[i]:
+            raise IndexError(f"Lote {lote} tem {int(ends[i] - starts[i])} segmentos {letter}, pedido o {m}")
+        return Record(self, int(self._segments[letter][starts[i] + m - 1]))
+
+    def pair(self, lote: int, m: int) -> Tuple[Record, Optional[Record]]:
+        """m-ésimo pagamento do lote: (segmento A, segmento B que o segue, se houver)."""
+        a = self.segment(lote, "A", m)
+        nxt = a.index + 1
+        if nxt < self.count and self.kind_of(nxt) == "segmento_b_pix":
+            return a, Record(self, nxt)
+        return a, None
+
+    def payments(self) -> Dict[str, Any]:
+        """Colunas de todos os pagamentos (segmento A e o B que o segue), extraídas em bloco.
+
+        lote, sequencial e cents são vetores int64; name, occurrences, document
+        e pix_key são listas de str (document/pix_key vazios se o A não tem B).
+        occurrences traz o campo de ocorrências inteiro, como o banco devolveu.
+        """
+        recs = self.records
+        a = self._segments.get("A", np.empty(0, np.int64))
+        b = np.minimum(a + 1, self.count - 1)
+        has_b = (a + 1 < self.count) & (recs[b, _TIPO] == _T_DETALHE) & (recs[b, _SEGMENTO] == ord("B"))
+        document = _to_text(recs[b, _column("documento", "segmento_b_pix")])
+        pix_key = _to_text(recs[b, _column("chave_pix", "segmento_b_pix")])
+        if not has_b.all():
+            for i in np.flatnonzero(~has_b):
+                document[i] = pix_key[i] = ""
+        return {
+            "lote": _to_int(recs[a, _LOTE]), "sequencial": _to_int(recs[a, _SEQUENCIAL]),
+            "cents": _to_int(recs[a, _VALOR]),
+            "name": _to_text(recs[a, _column("nome_favorecido", "segmento_a_pix")]),
+            "occurrences": _to_text(recs[a, _column("ocorrencias", "segmento_a_pix")]),
+            "document": document, "pix_key": pix_key,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        a = self._segments.get("A", np.empty(0, np.int64))
+        total = int(_to_int(self.records[a, _VALOR]).sum()) if len(a) else 0
+        return {"records": self.count, "lotes": len(self._headers), "payments": len(a), "total_cents": total}
+
+    # --- conferência ---
+
+    def validate(self, max_errors: int = 100) -> Tuple[bool, List[str]]:
+        """Confere estrutura, contagens e somas dos trailers em uma passada vetorizada.
+
+        Retorna (ok, erros), no mesmo formato de ExcelProcessor.validate_data;
+        os erros apontam o registro (1-based, igual à linha do arquivo).
+        """
+        errors: List[str] = []
+        def add(rows, message):
+            for r in np.atleast_1d(rows)[:max_errors]:
+                errors.append(f"Registro {int(r) + 1}: {message}")
+
+        recs, n = self.records, self.count
+        tipo = recs[:, _TIPO]
+
+        if self.separator:
+            seps = np.ndarray((n - 1, len(self.separator)), dtype=np.uint8, buffer=self._mm,
+                              offset=RECORD_LENGTH, strides=(self.stride, 1))
+            bad = np.flatnonzero((seps != np.frombuffer(self.separator, np.uint8)).any(axis=1))
+            add(bad, "registro não termina na posição 240")
+
+        known = np.isin(tipo, [_T_HEADER_ARQ, _T_HEADER_LOTE, _T_DETALHE, _T_TRAILER_LOTE, _T_TRAILER_ARQ])
+        add(np.flatnonzero(~known), "tipo de registro desconhecido")
+        if tipo[0] != _T_HEADER_ARQ: add(0, "primeiro registro não é o header de arquivo")
+        if tipo[-1] != _T_TRAILER_ARQ: add(n - 1, "último registro não é o trailer de arquivo")
+        add(np.flatnonzero(tipo[1:] == _T_HEADER_ARQ) + 1, "header de arquivo fora do início")
+        add(np.flatnonzero(tipo[:-1] == _T_TRAILER_ARQ), "trailer de arquivo fora do fim")
+
+        errors += self._check_numeric(max_errors)
+
+        headers, trailers = self._headers, self._trailers
+        if len(headers) != len(trailers) or np.any(headers >= trailers) or np.any(trailers[:-1] >= headers[1:]):
+            errors.append(f"Arquivo: {len(headers)} headers de lote e {len(trailers)} trailers de lote fora de ordem")
+        else:
+            errors += self._check_lotes(max_errors)
+
+        if tipo[-1] == _T_TRAILER_ARQ:
+            last = recs[-1]
+            qtd_lotes, qtd_regs = (int(_to_int(last[None, c])[0]) for c in (_QTD_LOTES, _QTD_REG_ARQ))
+            if qtd_lotes != len(headers):
+                add(n - 1, f"trailer de arquivo informa {qtd_lotes} lotes, o arquivo tem {len(headers)}")
+            if qtd_regs != n:
+                add(n - 1, f"trailer de arquivo informa {qtd_regs} registros, o arquivo tem {n}")
+
+        if len(errors) > max_errors:
+            errors = errors[:max_errors] + [f"... e mais {len(errors) - max_errors} problemas"]
+        return not errors, errors
+
+    def _check_numeric(self, max_errors: int, chunk: int = 65536) -> List[str]:
+        """Campos numéricos só com dígitos, por layout e em blocos (memória limitada)."""
+        errors: List[str] = []
+        tipo, segments = self.records[:, _TIPO], self.records[:, _SEGMENTO]
+        masks = {kind: (tipo == ord(code)) for code, kind in _KINDS.items()}
+        for letter, kind in _SEGMENTS.items():
+            masks[kind] = (tipo == _T_DETALHE) & (segments == ord(letter))
+        for kind, mask in masks.items():
+            columns = np.concatenate([np.arange(s, e) for s, e, k in _FIELDS[kind].values() if k == NUM])
+            rows = np.flatnonzero(mask)
+            for begin in range(0, len(rows), chunk):
+                part = rows[begin:begin + chunk]
+                block = self.records[part][:, columns]
+                bad = ((block < _ZERO) | (block > _NINE)).any(axis=1)
+                for r in part[bad][:max_errors - len(errors)]:
+                    errors.append(f"Registro {int(r) + 1}: campo numérico com caracteres inválidos ({kind})")
+                if len(errors) >= max_errors: return errors
+        return errors
+
+    def _check_lotes(self, max_errors: int) -> List[str]:
+        errors: List[str] = []
+        def add(rows, message):
+            for r in np.atleast_1d(rows)[:max_errors]:
+                errors.append(f"Registro {int(r) + 1}: {message}")
+
+        recs, headers, trailers = self.records, self._headers, self._trailers
+        numbers = self._lote_numbers
+        expected = np.arange(1, len(headers) + 1)
+        add(headers[numbers != expected], "número de lote fora da sequência")
+        add(trailers[_to_int(recs[trailers, _LOTE]) != numbers], "trailer de lote com número diferente do header")
+
+        # Entre header e trailer de lote só pode haver detalhes
+        tipo = recs[:, _TIPO]
+        detail = np.flatnonzero(tipo == _T_DETALHE)
+        owner = np.searchsorted(headers, detail, side="right") - 1
+        inside = (owner >= 0) & (detail < trailers[np.maximum(owner, 0)])
+        add(detail[~inside], "detalhe fora de um lote")
+        detail, owner = detail[inside], owner[inside]
+        add(detail[_to_int(recs[detail, _LOTE]) != numbers[owner]], "detalhe com número de lote diferente do header")
+        # Um registro faltando desloca todos os seguintes: aponta só a primeira quebra de cada lote
+        expected_seq = detail - headers[owner]
+        bad = np.flatnonzero(_to_int(recs[detail, _SEQUENCIAL]) != expected_seq)
+        _, first = np.unique(owner[bad], return_index=True)
+        for i in bad[first][:max_errors]:
+            add(detail[i], f"sequencial do detalhe fora de ordem (esperado {int(expected_seq[i])})")
+        in_lote = np.bincount(owner, minlength=len(headers))
+        add(headers[in_lote != trailers - headers - 1], "lote com registros que não são detalhes")
+
+        qtd = _to_int(recs[trailers, _QTD_REG_LOTE])
+        wrong = np.flatnonzero(qtd != trailers - headers + 1)
+        for i in wrong[:max_errors]:
+            add(trailers[i], f"trailer de lote informa {int(qtd[i])} registros, o lote tem {int(trailers[i] - headers[i] + 1)}")
+
+        a = self._segments.get("A", np.empty(0, np.int64))
+        values = np.concatenate([[0], np.cumsum(_to_int(recs[a, _VALOR]))]) if len(a) else np.zeros(1, np.int64)
+        starts, ends = self._bounds.get("A", (np.zeros(len(headers), np.int64), np.zeros(len(headers), np.int64)))
+        sums = values[ends] - values[starts]
+        informed = _to_int(recs[trailers, _SOMA_LOTE])
+        for i in np.flatnonzero(informed != sums)[:max_errors]:
+            add(trailers[i], f"trailer de lote informa soma {int(informed[i])}, os segmentos A somam {int(sums[i])}")
+        return errors
+
+def main(argv=None) -> int:
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+    failed = False
+    for path in paths:
+        try:
+            with CNABFile(path) as cnab:
+                ok, errors = cnab.validate()
+                s = cnab.summary()
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+        print(f"{path}: {s['records']} registros, {s['lotes']} lote(s), {s['payments']} pagamentos, "
+              f"total R$ {s['total_cents'] / 100:,.2f} - {'OK' if ok else 'COM ERROS'}")
+        for e in errors:
+            print(f"  {e}")
+        failed |= not ok
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
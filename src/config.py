@@ -1,6 +1,9 @@
 # src/config.py
 
 import os
+import base64
+import tempfile
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,6 +19,38 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
 
+# --- CACHE DE PLANILHAS PROCESSADAS ---
+# Diretório, tamanho máximo (bytes) e idade máxima (segundos) das entradas
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cnab_parse_cache"))
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+PARSE_CACHE_MAX_AGE = int(os.getenv("PARSE_CACHE_MAX_AGE", 24 * 3600))
+
+
+# --- JOBS DE GERAÇÃO EM SEGUNDO PLANO ---
+# Workers simultâneos, jobs que podem aguardar na fila e tempo (s) que o status fica disponível
+CNAB_JOB_WORKERS = int(os.getenv("CNAB_JOB_WORKERS", 2))
+CNAB_JOB_QUEUE_LIMIT = int(os.getenv("CNAB_JOB_QUEUE_LIMIT", 20))
+CNAB_JOB_TTL = int(os.getenv("CNAB_JOB_TTL", 3600))
+# Processos que renderizam lotes (campanhas) grandes em paralelo: 1 = desliga (padrão), 0 = um por CPU.
+# Desligado por padrão: o pool sobe dentro do processo web e exige /dev/shm, que o runtime
+# da Vercel não tem. Sem forkserver (Windows) é sempre 1
+CNAB_RENDER_WORKERS = int(os.getenv("CNAB_RENDER_WORKERS", 1))
+
+
+# --- MÉTRICAS ---
+# Tempos por etapa e latência da API do Inter em /api/pix/metrics (formato Prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+# --- PERFIL DE REQUISIÇÕES (diagnóstico) ---
+# Com PROFILING_ENABLED=true, requisições com o cabeçalho X-Profile rodam sob cProfile.
+# Se PROFILING_TOKEN estiver definido, o cabeçalho precisa trazer esse valor.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 20))
+PROFILES_DIR = os.getenv("PROFILES_DIR")
+
+
 # --- CONFIGURAÇÕES DA API DO BANCO INTER ---
 BASE_URL = os.getenv("BASE_URL")
 CLIENT_ID = os.getenv("BANCO_INTER_CLIENT_ID")
@@ -25,6 +60,78 @@ CERT_PATH = os.getenv("BANCO_INTER_CERT_PATH", os.path.join(os.getenv('CERTS_DIR
 KEY_PATH = os.getenv("BANCO_INTER_KEY_PATH", os.path.join(os.getenv('CERTS_DIR', 'certs'), 'inter.key'))
 SCOPES = os.getenv("BANCO_INTER_SCOPES")
 
+_certificates_ready = False
+_certificates_lock = threading.Lock()
+
+def _write_if_changed(path: str, data: bytes, mode: int):
+    """Grava só se o conteúdo mudou: containers aquecidos reaproveitam o arquivo já em /tmp."""
+    try:
+        with open(path, "rb") as fh:
+            if fh.read() == data: return
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.part"
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(partial, path)
+
+def ensure_certificates():
+    """Materializa BANCO_INTER_CERT_CONTENT/KEY_CONTENT (base64) em CERT_PATH/KEY_PATH.
+
+    Chamado pelo InterAPIClient no primeiro uso do mTLS, e não na subida do app; roda uma vez por processo.
+    """
+    global _certificates_ready
+    if _certificates_ready: return
+    with _certificates_lock:
+        if _certificates_ready: return
+        for env, path, mode in (("BANCO_INTER_CERT_CONTENT", CERT_PATH, 0o644), ("BANCO_INTER_KEY_CONTENT", KEY_PATH, 0o600)):
+            content = os.getenv(env)
+            if not content: continue
+            try:
+                _write_if_changed(path, base64.b64decode(content), mode)
+            except Exception as e:
+                print(f"Erro ao configurar {os.path.basename(path)}: {e}")
+        _certificates_ready = True
+
+
+# --- TOKEN OAUTH E ENVIO DE RECORRÊNCIAS ---
+# Cache do token OAuth compartilhado entre processos ("file") ou só no processo ("memory")
+INTER_TOKEN_CACHE = os.getenv("INTER_TOKEN_CACHE", "file")
+INTER_TOKEN_CACHE_DIR = os.getenv("INTER_TOKEN_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cnab_token_cache"))
+# Segundos antes da expiração em que o token é renovado em segundo plano
+INTER_TOKEN_REFRESH_AHEAD = int(os.getenv("INTER_TOKEN_REFRESH_AHEAD", 300))
+# Diário (SQLite) dos envios de recorrências, usado para retomar lotes interrompidos
+SUBMISSION_JOURNAL_PATH = os.getenv("SUBMISSION_JOURNAL_PATH", os.path.join(os.getenv("OUTPUTS_DIR", tempfile.gettempdir()), "submissions.db"))
+SUBMISSION_MAX_RETRIES = int(os.getenv("SUBMISSION_MAX_RETRIES", 5))
+
+
+# --- CONCILIAÇÃO COM OS RETORNOS DO BANCO ---
+# Remessas geradas, arquivos de retorno recebidos e base (SQLite) com o resultado da conciliação
+REMESSAS_DIR = os.getenv("REMESSAS_DIR", os.getenv("OUTPUTS_DIR", os.path.join(tempfile.gettempdir(), "cnab_outputs")))
+RETURNS_DIR = os.getenv("RETURNS_DIR", os.path.join(REMESSAS_DIR, "retornos"))
+RECONCILIATION_DB = os.getenv("RECONCILIATION_DB", os.path.join(REMESSAS_DIR, "reconciliation.db"))
+
+
+# --- NUMERAÇÃO DAS REMESSAS ---
+# Contador (SQLite) do sequencial dos .rem, atômico entre workers; vazio, parte do maior .rem existente
+CNAB_SEQUENCE_DB = os.getenv("CNAB_SEQUENCE_DB", os.path.join(REMESSAS_DIR, "cnab_sequence.db"))
+
+
+# --- CATÁLOGO DE ARQUIVOS (/files) ---
+# Índice (SQLite) das planilhas enviadas e remessas geradas; itens por página (padrão e máximo)
+FILE_CATALOG_DB = os.getenv("FILE_CATALOG_DB", os.path.join(REMESSAS_DIR, "file_catalog.db"))
+FILES_PAGE_SIZE = int(os.getenv("FILES_PAGE_SIZE", 50))
+FILES_PAGE_MAX = int(os.getenv("FILES_PAGE_MAX", 500))
+
+
+# --- PAGAMENTOS EM DUPLICIDADE ---
+# Índice (SQLite) dos pagamentos de todas as remessas geradas, consultado antes de gerar uma nova
+DUPLICATES_DB = os.getenv("DUPLICATES_DB", os.path.join(REMESSAS_DIR, "duplicates.db"))
+# Dias em que o mesmo pagamento (documento, chave e valor) em outra remessa conta como duplicidade (0 = todo o histórico)
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", 10))
+
 
 # --- DADOS DA EMPRESA E CONTA ---
 COMPANY_NAME = os.getenv("COMPANY_NAME")
@@ -0,0 +1,288 @@
+"""Pagamentos em duplicidade: dentro de uma planilha e contra as remessas já geradas.
+
+Dentro do arquivo, um índice em memória (documento, chave PIX) -> primeira
+linha acusa o mesmo favorecido repetido. Entre arquivos, cada remessa gerada
+grava em SQLite o hash de 64 bits de (documento, chave, valor) de cada
+pagamento, com lote e sequencial; um filtro de Bloom em memória, mantido em
+dia com as linhas novas do banco, descarta os negativos sem consultar o
+SQLite, então o custo por linha não cresce com o histórico.
+
+Uso:
+    python src/duplicates.py index [--remessas DIR]
+    python src/duplicates.py check planilha.xlsx [--days 10]
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from cnab_layouts import normalize_text
+from parse_cache import content_hash
+from recipient import Recipient
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tamanho do campo chave_pix do segmento B: a chave é comparada como fica gravada na remessa
+_KEY_LENGTH = 77
+# Favorecidos conferidos por consulta ao índice na geração em streaming
+GUARD_BLOCK = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remessas (
+    filename TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    source TEXT,
+    payments INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    hash INTEGER NOT NULL,
+    remessa TEXT NOT NULL,
+    lote INTEGER NOT NULL,
+    sequencial INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_hash ON payments (hash);
+CREATE INDEX IF NOT EXISTS idx_payments_remessa ON payments (remessa);
+"""
+
+def payment_hash(document: str, pix_key: str, cents: int) -> int:
+    """Hash de 64 bits (com sinal, como o INTEGER do SQLite) de um pagamento.
+
+    Documento e chave são normalizados como o CNAB os grava (documento com 14
+    dígitos, chave sem acentos, em maiúsculas e cortada no tamanho do campo), para
+    que o favorecido da planilha e o lido de volta da remessa batam.
+    """
+    key = normalize_text(pix_key)[:_KEY_LENGTH].rstrip() if pix_key else ""
+    digest = hashlib.blake2b(f"{document.zfill(14)}\x00{key}\x00{cents}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+def recipient_hashes(recipients: Sequence[Recipient]) -> "np.ndarray":
+    import numpy as np  # só quem confere duplicidade paga a importação do NumPy
+    return np.fromiter((payment_hash(r.document, r.pix_key, r.amount_cents) for r in recipients),
+                       dtype=np.int64, count=len(recipients))
+
+class RowIndex:
+    """Índice em memória (documento, chave PIX) -> linha em que o favorecido apareceu primeiro.
+
+    Vale para um arquivo inteiro, mesmo lido em blocos: cada bloco é conferido
+    contra tudo o que já passou, inclusive em outra campanha.
+    """
+
+    def __init__(self):
+        self._first: Dict[Tuple[str, str], int] = {}
+
+    def check(self, documents: Iterable[str], pix_keys: Iterable[str], lines: Iterable[int]) -> List[Tuple[int, int]]:
+        """Registra as linhas; devolve (linha, linha anterior) de cada favorecido repetido."""
+        first, repeats = self._first, []
+        for doc, key, line in zip(documents, pix_keys, lines):
+            earlier = first.setdefault((doc, key), line)
+            if earlier != line:
+                repeats.append((line, earlier))
+        return repeats
+
+class BloomFilter:
+    """Filtro de Bloom sobre hashes de 64 bits; k posições por dupla hash, ~1% de falsos positivos."""
+
+    BITS_PER_ITEM = 10
+    HASHES = 7
+
+    def __init__(self, capacity: int):
+        import numpy as np
+        self.capacity = capacity
+        self.size = np.uint64(max(capacity * self.BITS_PER_ITEM, 64))
+        self.bits = np.zeros((int(self.size) + 7) // 8, dtype=np.uint8)
+        self.count = 0
+        self._rounds = np.arange(self.HASHES, dtype=np.uint64)
+
+    def _positions(self, hashes: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+        h = np.ascontiguousarray(hashes, dtype=np.int64).view(np.uint64)
+        h1, h2 = h & np.uint64(0xFFFFFFFF), (h >> np.uint64(32)) | np.uint64(1)
+        return (h1[:, None] + self._rounds * h2[:, None]) % self.size
+
+    def add(self, hashes: "np.ndarray"):
+        import numpy as np
+        pos = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+        self.count += len(hashes)
+
+    def might_contain(self, hashes: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+        if not len(hashes): return np.zeros(0, dtype=bool)
+        pos = self._positions(hashes)
+        return ((self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+class DuplicatePayments(Exception):
+    """A geração encontrou pagamentos que já constam em remessas anteriores."""
+
+    def __init__(self, collisions: List[Dict[str, Any]]):
+        self.collisions = collisions
+        super().__init__(f"{len(collisions)} pagamento(s) já incluído(s) em remessas anteriores")
+
+def describe(collision: Dict[str, Any]) -> str:
+    when = datetime.fromtimestamp(collision["created_at"]).strftime("%d/%m/%Y %H:%M")
+    source = f", planilha {collision['source']}" if collision.get("source") else ""
+    return (f"Favorecido {collision['position']} ({collision['name']}, {collision['pix_key']}, "
+            f"R$ {collision['amount_cents'] / 100:,.2f}): já pago na remessa {collision['remessa']} "
+            f"(lote {collision['lote']}, registro {collision['sequencial']}) de {when}{source}")
+
+class DuplicateIndex:
+    """Pagamentos de todas as remessas geradas; uma conexão por instância, protegida por lock.
+
+    O filtro de Bloom é carregado na primeira consulta e, a cada consulta,
+    recebe só as linhas gravadas depois (inclusive por outros processos).
+    """
+
+    INITIAL_CAPACITY = 1 << 20
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._bloom: Optional[BloomFilter] = None
+        self._loaded_id = 0
+
+    def close(self):
+        self._conn.close()
+
+    def register(self, path: Path, source: Optional[str] = None, created_at: Optional[float] = None) -> int:
+        """Indexa os pagamentos de uma remessa; 0 se ela já estava indexada com o mesmo conteúdo."""
+        from cnab_reader import CNABFile
+        path = Path(path)
+        digest = content_hash(path)
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM remessas WHERE filename = ?", (path.name,)).fetchone()
+        if row and row[0] == digest:
+            return 0
+        with CNABFile(path) as cnab:
+            cols = cnab.payments()
+        hashes = [payment_hash(d, k, c) for d, k, c in zip(cols["document"], cols["pix_key"], cols["cents"].tolist())]
+        rows = list(zip(hashes, [path.name] * len(hashes), cols["lote"].tolist(), cols["sequencial"].tolist()))
+        created_at = created_at if created_at is not None else path.stat().st_mtime
+        with self._lock, self._conn:
+            if row:
+                logger.warning(f"Remessa {path.name} mudou desde a indexação; reindexando")
+                self._conn.execute("DELETE FROM payments WHERE remessa = ?", (path.name,))
+            self._conn.executemany("INSERT INTO payments (hash, remessa, lote, sequencial) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO remessas VALUES (?, ?, ?, ?, ?)",
+                               (path.name, digest, source, len(rows), created_at))
+        return len(rows)
+
+    def register_folder(self, folder: Path, pattern: str = "*.rem") -> int:
+        """Indexa as remessas da pasta que ainda não estão no índice (as já conhecidas nem são lidas)."""
+        with self._lock:
+            known = {name for (name,) in self._conn.execute("SELECT filename FROM remessas")}
+        return sum(self.register(p) for p in sorted(Path(folder).glob(pattern)) if p.name not in known)
+
+    def _sync(self):
+        """Traz para o filtro as linhas gravadas desde a última consulta; chamado com o lock."""
+        import numpy as np
+        rows = self._conn.execute("SELECT id, hash FROM payments WHERE id > ? ORDER BY id", (self._loaded_id,)).fetchall()
+        if not rows and self._bloom is not None: return
+        if self._bloom is None or self._bloom.count + len(rows) > self._bloom.capacity:
+            # Cheio (ou primeira carga): recria com folga, relendo todo o histórico
+            total = self._conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+            self._bloom = BloomFilter(max(self.INITIAL_CAPACITY, 2 * total))
+            rows = self._conn.execute("SELECT id, hash FROM payments ORDER BY id").fetchall()
+        if rows:
+            ids, hashes = zip(*rows)
+            self._bloom.add(np.array(hashes, dtype=np.int64))
+            self._loaded_id = ids[-1]
+
+    def find(self, recipients: Sequence[Recipient], window_days: int = 0, offset: int = 0) -> List[Dict[str, Any]]:
+        """Favorecidos já pagos em remessas anteriores, com a remessa, o lote e o registro.
+
+        window_days > 0 limita a busca às remessas geradas nesse período; offset
+        é somado à posição (1-based) de cada favorecido no relatório.
+        """
+        import numpy as np
+        hashes = recipient_hashes(recipients)
+        since = time.time() - window_days * 86400 if window_days > 0 else 0
+        with self._lock:
+            self._sync()
+            candidates = np.flatnonzero(self._bloom.might_contain(hashes))
+            found: Dict[int, Tuple] = {}
+            for start in range(0, len(candidates), 500):
+                chunk = hashes[candidates[start:start + 500]].tolist()
+                for row in self._conn.execute(
+                        "SELECT p.hash, p.remessa, p.lote, p.sequencial, r.created_at, r.source "
+                        "FROM payments p JOIN remessas r ON r.filename = p.remessa "
+                        f"WHERE p.hash IN ({','.join('?' * len(chunk))}) AND r.created_at >= ? "
+                        "ORDER BY r.created_at", chunk + [since]):
+                    found.setdefault(row[0], row)
+        collisions = []
+        for i in candidates.tolist():
+            hit = found.get(int(hashes[i]))
+            if hit is None: continue
+            r = recipients[i]
+            collisions.append({"position": offset + i + 1, "name": r.name, "pix_key": r.pix_key,
+                               "document": r.document, "amount_cents": r.amount_cents, "remessa": hit[1],
+                               "lote": hit[2], "sequencial": hit[3], "created_at": hit[4], "source": hit[5]})
+        return collisions
+
+    def guard(self, recipients: Iterable[Recipient], window_days: int = 0) -> Iterator[Recipient]:
+        """Repassa os favorecidos conferindo-os em blocos; DuplicatePayments no primeiro bloco com repetidos."""
+        block, offset = [], 0
+        for r in recipients:
+            block.append(r)
+            if len(block) >= GUARD_BLOCK:
+                yield from self._checked(block, window_days, offset)
+                offset += len(block); block = []
+        if block: yield from self._checked(block, window_days, offset)
+
+    def _checked(self, block: List[Recipient], window_days: int, offset: int) -> List[Recipient]:
+        collisions = self.find(block, window_days, offset)
+        if collisions: raise DuplicatePayments(collisions)
+        return block
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import config
+    parser = argparse.ArgumentParser(description="Pagamentos em duplicidade entre planilhas e remessas geradas")
+    parser.add_argument("--db", default=config.DUPLICATES_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_cmd = commands.add_parser("index", help="indexa as remessas ainda não indexadas")
+    index_cmd.add_argument("--remessas", default=config.REMESSAS_DIR)
+    check_cmd = commands.add_parser("check", help="confere uma planilha contra ela mesma e contra as remessas")
+    check_cmd.add_argument("planilha")
+    check_cmd.add_argument("--days", type=int, default=config.DUPLICATE_WINDOW_DAYS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+    index = DuplicateIndex(args.db)
+    try:
+        if args.command == "index":
+            print(f"{index.register_folder(Path(args.remessas)):,} pagamentos indexados")
+            return 0
+        from excel_processor import ExcelProcessor
+        processor = ExcelProcessor()
+        ok, errors = processor.preflight(args.planilha)
+        if not ok or not processor.load_file(args.planilha):
+            print("\n".join(errors) or "Erro ao carregar a planilha.")
+            return 1
+        processor.detect_columns()
+        errors = processor.validate_data()[1]
+        collisions = index.find(processor.process_data(), args.days)
+        for message in errors + [describe(c) for c in collisions]:
+            print(message)
+        print(f"{len(errors)} erro(s) na planilha, {len(collisions)} pagamento(s) já em remessas anteriores")
+        return 0 if not errors and not collisions else 1
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,128 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Tuple
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Iterator, Optional
 import logging
 
+import metrics
+import pix_validation
+from duplicates import RowIndex
+from recipient import Recipient, to_cents, to_cents_array
+
 logger = logging.getLogger(__name__)
 
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+def _column_index(ref: str) -> int:
+    idx = 0
+    for ch in ref:
+        if not ch.isalpha(): break
+        idx = idx * 26 + (ord(ch.upper()) - 64)
+    return idx - 1
+
+def _xlsx_top_rows(file_path: str, max_rows: int) -> List[Tuple[str, List[List[Any]]]]:
+    """Lê só as primeiras linhas de cada aba direto do XML do .xlsx.
+
+    Diferente do openpyxl, não carrega a tabela de strings compartilhadas
+    inteira: ela é percorrida apenas até o maior índice usado nesses cabeçalhos.
+    """
+    import zipfile
+    import xml.etree.ElementTree as ET
+
+    with zipfile.ZipFile(file_path) as zf:
+        names = set(zf.namelist())
+        rels = {r.get("Id"): r.get("Target") for r in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")).iter(f"{_NS_PKG_REL}Relationship")}
+        sheets = []
+        for sheet in ET.fromstring(zf.read("xl/workbook.xml")).iter(f"{_NS_MAIN}sheet"):
+            target = rels[sheet.get(f"{_NS_REL}id")]
+            target = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            rows: List[List[Any]] = []
+            with zf.open(target) as fh:
+                for _, el in ET.iterparse(fh):
+                    if el.tag != f"{_NS_MAIN}row": continue
+                    if int(el.get("r", len(rows) + 1)) > max_rows: break
+                    row: List[Any] = []
+                    for pos, c in enumerate(el.iter(f"{_NS_MAIN}c")):
+                        i = _column_index(c.get("r")) if c.get("r") else pos
+                        row.extend([None] * (i + 1 - len(row)))
+                        kind, v = c.get("t"), c.find(f"{_NS_MAIN}v")
+                        if kind == "inlineStr":
+                            row[i] = "".join(t.text or "" for t in c.iter(f"{_NS_MAIN}t"))
+                        elif v is not None:
+                            row[i] = ("s", int(v.text)) if kind == "s" else v.text
+                    rows.extend([[]] * (int(el.get("r", len(rows) + 1)) - 1 - len(rows)))
+                    rows.append(row)
+                    el.clear()
+            sheets.append((sheet.get("name"), rows))
+
+        wanted = {cell[1] for _, rows in sheets for row in rows for cell in row if isinstance(cell, tuple)}
+        shared: Dict[int, str] = {}
+        if wanted and "xl/sharedStrings.xml" in names:
+            last = max(wanted)
+            with zf.open("xl/sharedStrings.xml") as fh:
+                idx = 0
+                for _, el in ET.iterparse(fh):
+                    if el.tag != f"{_NS_MAIN}si": continue
+                    if idx in wanted:
+                        shared[idx] = "".join(t.text or "" for t in el.iter(f"{_NS_MAIN}t"))
+                    el.clear()
+                    if idx >= last: break
+                    idx += 1
+    return [(name, [[shared.get(c[1]) if isinstance(c, tuple) else c for c in row] for row in rows])
+            for name, rows in sheets]
+
+def _csv_options(file_path: str) -> Dict[str, Any]:
+    """Descobre codificação e separador; ';' indica o formato brasileiro (1.234,56) e ',' o americano (1,234.56)."""
+    with open(file_path, "rb") as fh:
+        head = fh.read(64 * 1024)
+    head = head[:head.rfind(b"\n") + 1] or head
+    try:
+        text, encoding = head.decode("utf-8-sig"), "utf-8-sig"
+    except UnicodeDecodeError:
+        text, encoding = head.decode("latin-1"), "latin-1"
+    first_line = text.split("\n", 1)[0]
+    if first_line.count(";") > first_line.count(","):
+        return {"sep": ";", "decimal": ",", "thousands": ".", "encoding": encoding}
+    return {"sep": ",", "decimal": ".", "thousands": ",", "encoding": encoding}
+
+def sort_errors(errors: List[str]) -> List[str]:
+    """Ordena mensagens "Linha N: ..." pelo número da linha; as sem linha vêm antes."""
+    def line(error: str) -> int:
+        head = error.split(":", 1)[0]
+        return int(head[6:]) if head.startswith("Linha ") and head[6:].isdigit() else 0
+    return sorted(errors, key=line)
+
+def _parquet_module():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+    return pq
+
+def _normalize_header(col: Any) -> Optional[str]:
+    return None if col is None else str(col).strip().upper()
+
+@lru_cache(maxsize=1024)
+def _match_signature(signature: Tuple[Optional[str], ...]) -> Tuple[Tuple[str, int], ...]:
+    """Mapeia campo -> posição para um cabeçalho já normalizado (memoizado por assinatura)."""
+    available_columns = {name: i for i, name in enumerate(signature) if name is not None}
+    detected = []
+    for field, possible_names in ExcelProcessor.COLUMN_MAPPING.items():
+        for name in possible_names:
+            if name.upper() in available_columns:
+                detected.append((field, available_columns[name.upper()]))
+                break
+    return tuple(detected)
+
+def match_columns(columns) -> Dict[str, Any]:
+    """Aplica o COLUMN_MAPPING a uma lista de nomes de coluna."""
+    columns = list(columns)
+    signature = tuple(_normalize_header(col) for col in columns)
+    return {field: columns[i] for field, i in _match_signature(signature)}
+
 class ExcelProcessor:
     """Processador de arquivos Excel para dados de pagamento PIX"""
     
@@ -14,69 +133,353 @@ class ExcelProcessor:
         "amount": ["VALOR", "VALOR PAGAMENTO", "VLR", "QUANTIA", "MONTANTE", "Valor", "Valor "],
         "campaign": ["CAMPANHA", "NOME CAMPANHA", "LOTE", "GRUPO"]
     }
+    REQUIRED_FIELDS = ["name", "pix_key", "amount"]
+    TABULAR_EXTENSIONS = {".csv", ".parquet"}
+    # Linhas por bloco nas leituras em streaming de CSV/Parquet
+    CHUNK_ROWS = 50_000
+    # Quantas linhas do topo de cada aba o preflight testa como cabeçalho
+    PREFLIGHT_ROWS = 5
     
-    def __init__(self):
+    def __init__(self, check_duplicates: bool = True):
         self.df = None
         self.mapped_columns = {}
+        self.header: Optional[List[Any]] = None
+        # Aba e linha (0-based) do cabeçalho; definidos pelo preflight
+        self.sheet_name: Optional[str] = None
+        self.header_row = 0
+        self.stream_errors: List[str] = []
+        # Relatório linha a linha de chaves PIX e documentos (pix_validation.validate)
+        self.key_report: Optional[pd.DataFrame] = None
+        # Favorecidos (documento + chave) já vistos neste arquivo, entre blocos
+        # inclusive; sem check_duplicates (allow_duplicates nas rotas) as repetições passam
+        self.beneficiaries = RowIndex() if check_duplicates else None
+        self._workbook = None
+        self._rows = None
+        self._frames = None
+        # Separadores (decimal, milhar) do CSV carregado, para os valores que vierem como texto
+        self._number_format: Optional[Tuple[str, str]] = None
+    
+    @metrics.timed("excel.preflight")
+    def preflight(self, file_path: str) -> Tuple[bool, List[str]]:
+        """Lê só o topo de cada aba e escolhe a primeira que tem as colunas obrigatórias.
+
+        Rejeita arquivos errados sem carregar a planilha inteira. CSV e Parquet
+        têm só o cabeçalho/esquema lido; .xls passa direto para a leitura completa.
+        """
+        suffix = Path(file_path).suffix.lower()
+        try:
+            if suffix in self.TABULAR_EXTENSIONS:
+                sheets = [(None, [self._tabular_columns(file_path)])]
+            elif suffix == ".xlsx":
+                sheets = _xlsx_top_rows(file_path, self.PREFLIGHT_ROWS)
+            else:
+                return True, []
+        except Exception as e:
+            logger.error(f"Erro ao carregar arquivo: {str(e)}")
+            return False, ["Erro ao carregar o arquivo."]
+        
+        best: Dict[str, Any] = {}
+        for sheet_name, rows in sheets:
+            for row_idx, row in enumerate(rows):
+                mapped = match_columns(row)
+                if all(field in mapped for field in self.REQUIRED_FIELDS):
+                    self.sheet_name, self.header_row, self.mapped_columns = sheet_name, row_idx, mapped
+                    return True, []
+                if len(mapped) > len(best): best = mapped
+        return False, [f"Coluna obrigatória não encontrada: {field}"
+                       for field in self.REQUIRED_FIELDS if field not in best]
     
     def load_excel(self, file_path: str) -> bool:
         try:
-            self.df = pd.read_excel(file_path)
+            self.df = pd.read_excel(file_path, sheet_name=self.sheet_name or 0, header=self.header_row)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao carregar Excel: {str(e)}")
+            return False
+    
+    def _tabular_columns(self, file_path: str) -> List[Any]:
+        if Path(file_path).suffix.lower() == ".parquet":
+            return list(_parquet_module().read_schema(file_path).names)
+        return list(pd.read_csv(file_path, nrows=0, **_csv_options(file_path)).columns)
+    
+    def _read_tabular(self, file_path: str, chunked: bool = False):
+        """Lê CSV/Parquet trazendo só as colunas mapeadas; em blocos se chunked.
+
+        Texto (nome, chave, documento) é lido como string para não perder zeros
+        à esquerda de CPF/CNPJ e telefones; o valor segue a inferência numérica.
+        """
+        mapped = match_columns(self._tabular_columns(file_path))
+        usecols = list(dict.fromkeys(mapped.values()))
+        if Path(file_path).suffix.lower() == ".parquet":
+            pq = _parquet_module()
+            if not chunked:
+                return pd.read_parquet(file_path, columns=usecols)
+            batches = pq.ParquetFile(file_path).iter_batches(batch_size=self.CHUNK_ROWS, columns=usecols)
+            return (batch.to_pandas() for batch in batches)
+        dtype = {col: str for field, col in mapped.items() if field != "amount"}
+        options = _csv_options(file_path)
+        self._number_format = (options["decimal"], options["thousands"])
+        return pd.read_csv(file_path, usecols=usecols, dtype=dtype,
+                           chunksize=self.CHUNK_ROWS if chunked else None, **options)
+    
+    @metrics.timed("excel.load")
+    def load_file(self, file_path: str) -> bool:
+        """Carrega .xlsx/.xls, .csv ou .parquet num DataFrame."""
+        if Path(file_path).suffix.lower() not in self.TABULAR_EXTENSIONS:
+            return self.load_excel(file_path)
+        try:
+            self.df = self._read_tabular(file_path)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao carregar arquivo: {str(e)}")
+            return False
+    
+    @metrics.timed("excel.open_stream")
+    def load_file_stream(self, file_path: str) -> bool:
+        """Versão em streaming do load_file: CSV em blocos, Parquet por row groups."""
+        if Path(file_path).suffix.lower() not in self.TABULAR_EXTENSIONS:
+            return self.load_excel_stream(file_path)
+        try:
+            self.header = self._tabular_columns(file_path)
+            self._frames = iter(self._read_tabular(file_path, chunked=True))
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao carregar arquivo: {str(e)}")
+            return False
+    
+    def load_excel_stream(self, file_path: str) -> bool:
+        """Abre a planilha em modo somente leitura e lê apenas o cabeçalho.
+
+        As linhas são consumidas depois por iter_recipient_chunks, sem montar
+        DataFrame. Arquivos que o openpyxl não lê (.xls) caem no load_excel.
+        """
+        if Path(file_path).suffix.lower() != ".xlsx":
+            return self.load_excel(file_path)
+        try:
+            from openpyxl import load_workbook
+            self._workbook = load_workbook(file_path, read_only=True, data_only=True)
+            ws = self._workbook[self.sheet_name] if self.sheet_name else self._workbook.active
+            self._rows = ws.iter_rows(min_row=self.header_row + 1, values_only=True)
+            self.header = list(next(self._rows, None) or [])
             return True
         except Exception as e:
+            self.close()
             logger.error(f"Erro ao carregar Excel: {str(e)}")
             return False
     
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+        if hasattr(self._frames, "close"):
+            self._frames.close()
+        self._workbook, self._rows, self._frames = None, None, None
+    
+    @metrics.timed("excel.detect_columns")
     def detect_columns(self):
-        if self.df is None: return
-        
-        detected = {}
-        available_columns = {col.strip().upper(): col for col in self.df.columns}
-        
-        for field, possible_names in self.COLUMN_MAPPING.items():
-            for name in possible_names:
-                if name.upper() in available_columns:
-                    detected[field] = available_columns[name.upper()]
-                    break
-        self.mapped_columns = detected
+        if self.df is not None: columns = self.df.columns
+        elif self.header is not None: columns = self.header
+        else: return
+        self.mapped_columns = match_columns(columns)
 
+    @metrics.timed("excel.validate")
     def validate_data(self) -> Tuple[bool, List[str]]:
-        if self.df is None: return False, ["Nenhum arquivo carregado"]
+        if self.df is None and self.header is None: return False, ["Nenhum arquivo carregado"]
         
         errors = []
-        for field in ["name", "pix_key", "amount"]:
+        for field in self.REQUIRED_FIELDS:
             if field not in self.mapped_columns:
                 errors.append(f"Coluna obrigatória não encontrada: {field}")
         if errors: return False, errors
+        # No modo streaming as linhas são validadas em iter_recipient_chunks
+        if self.df is None: return True, []
         
-        for idx, row in self.df.iterrows():
-            if pd.isna(row.get(self.mapped_columns["amount"])):
-                errors.append(f"Linha {idx+2}: Valor vazio")
+        empty = self.df[self.mapped_columns["amount"]].isna().to_numpy()
+        errors = [f"Linha {idx + self.header_row + 2}: Valor vazio" for idx in self.df.index[empty]]
+        # Mesma conversão do process_data: valor que ele descartaria é erro aqui também
+        invalid = self._amount_column()[1].to_numpy() & ~empty
+        errors += [f"Linha {idx + self.header_row + 2}: Valor inválido" for idx in self.df.index[invalid]]
+        self.key_report = self._validate_keys()
+        errors += pix_validation.row_errors(self.key_report, self.df.index + self.header_row + 2)
+        errors += self._duplicate_errors(self.key_report, self.df.index + self.header_row + 2)
         
-        return not errors, errors
+        return not errors, sort_errors(errors)
+    
+    def _text_column(self, field: str) -> pd.Series:
+        """Coluna convertida para texto como str(valor).strip(); vazia se não mapeada."""
+        col = self.mapped_columns.get(field)
+        if col is None: return pd.Series("", index=self.df.index, dtype=object)
+        return self.df[col].astype(str).str.strip()
+
+    def _optional_text_column(self, field: str) -> pd.Series:
+        """Como _text_column, mas células vazias viram "" (e não "nan")."""
+        col = self.mapped_columns.get(field)
+        if col is None: return pd.Series("", index=self.df.index, dtype=object)
+        raw = self.df[col]
+        # Coluna numérica com vazios vira float: 1.0 volta a ser "1", como na leitura em streaming
+        if pd.api.types.is_float_dtype(raw) and (raw.dropna() % 1 == 0).all():
+            raw = raw.astype("Int64")
+        text = raw.astype(object).astype(str).str.strip()
+        text[raw.isna().to_numpy()] = ""
+        return text
     
-    def process_data(self) -> List[Dict[str, Any]]:
+    @metrics.timed("excel.validate_keys")
+    def _validate_keys(self) -> pd.DataFrame:
+        documents = pix_validation.digits_only(self._optional_text_column("document").tolist())
+        report = pix_validation.validate(self._optional_text_column("pix_key").tolist(), documents, index=self.df.index)
+        return self._mark_duplicates(report, self.df.index + self.header_row + 2)
+
+    def _mark_duplicates(self, report: pd.DataFrame, lines) -> pd.DataFrame:
+        """Coluna duplicate_of: linha em que o mesmo favorecido apareceu antes (0 = primeira vez)."""
+        duplicate_of = np.zeros(len(report), dtype=np.int64)
+        if self.beneficiaries is not None:
+            lines = np.asarray(lines)
+            valid = np.flatnonzero(~pix_validation.invalid_rows(report))
+            repeats = self.beneficiaries.check(report["document"].to_numpy()[valid], report["pix_key"].to_numpy()[valid],
+                                               lines[valid].tolist())
+            if repeats:
+                line, earlier = np.array(repeats).T
+                duplicate_of[np.searchsorted(lines, line)] = earlier
+        report["duplicate_of"] = duplicate_of
+        return report
+
+    @staticmethod
+    def _duplicate_errors(report: pd.DataFrame, lines) -> List[str]:
+        duplicate_of = report["duplicate_of"].to_numpy()
+        return [f"Linha {lines[i]}: Favorecido repetido (mesmo documento e chave PIX da linha {duplicate_of[i]})"
+                for i in np.flatnonzero(duplicate_of)]
+
+    def _amount_column(self) -> Tuple[pd.Series, pd.Series]:
+        """Converte a coluna de valor de uma vez; devolve (valores, máscara de linhas inválidas)."""
+        col = self.mapped_columns.get("amount")
+        if col is None:
+            return pd.Series(0.0, index=self.df.index), pd.Series(False, index=self.df.index)
+        raw = self.df[col]
+        if pd.api.types.is_numeric_dtype(raw) and not pd.api.types.is_bool_dtype(raw):
+            return raw.astype(float), pd.Series(False, index=self.df.index)
+        
+        if self._number_format is not None:
+            # Uma célula ruim deixa a coluna inteira como texto; aplica os separadores do arquivo
+            decimal, thousands = self._number_format
+            text = raw.where(raw.isna(), raw.astype(str).str.strip())
+            raw = text.str.replace(thousands, "", regex=False).str.replace(decimal, ".", regex=False)
+        amounts = pd.to_numeric(raw, errors="coerce").astype(float)
+        invalid = pd.Series(False, index=self.df.index)
+        # Só as células que o to_numeric recusou passam pelo float() original
+        for idx in raw.index[amounts.isna().to_numpy()]:
+            try:
+                amounts.at[idx] = float(raw.at[idx])
+            except Exception as e:
+                logger.error(f"Erro ao processar linha {idx + self.header_row + 2}: {e}")
+                invalid.at[idx] = True
+        return amounts, invalid
+    
+    @metrics.timed("excel.process")
+    def process_data(self) -> List[Recipient]:
         if self.df is None: return []
+        metrics.inc("cnab_rows_total", len(self.df), stage="excel.process")
+        
+        names = self._text_column("name")
+        campaigns = self._optional_text_column("campaign")
+        amounts, invalid = self._amount_column()
+        # Valores vazios não viram centavos; o validate_data já os aponta como erro
+        for idx in self.df.index[(~np.isfinite(amounts.to_numpy()) & ~invalid.to_numpy())]:
+            logger.error(f"Erro ao processar linha {idx + self.header_row + 2}: Valor vazio")
+            invalid.at[idx] = True
         
-        recipients = []
-        for idx, row in self.df.iterrows():
-            recipient = {}
+        # Chaves já normalizadas; sem documento, a chave CPF/CNPJ faz as vezes dele
+        report = self.key_report
+        if report is None or not report.index.equals(self.df.index):
+            report = self._validate_keys()
+        keep = ~invalid.to_numpy() & ~pix_validation.invalid_rows(report) & (report["duplicate_of"].to_numpy() == 0)
+        cents = to_cents_array(amounts.to_numpy()[keep])
+        return [
+            Recipient(n, k, d, c, g)
+            for n, k, d, c, g in zip(names[keep].tolist(), report["pix_key"][keep].tolist(),
+                                     report["document"][keep].tolist(), cents.tolist(), campaigns[keep].tolist())
+        ]
+
+    
+    def iter_recipient_chunks(self, chunk_size: int = 5000) -> Iterator[List[Recipient]]:
+        """Gera os favorecidos em blocos de até chunk_size, com memória limitada.
+
+        Linhas com valor vazio ou inválido, chave PIX ou documento inválido e
+        favorecidos repetidos são puladas e registradas em stream_errors com a
+        mesma numeração de linha do validate_data.
+        """
+        return metrics.measure_iter("excel.stream_read", self._iter_recipient_chunks(chunk_size), rows=len)
+
+    def _iter_recipient_chunks(self, chunk_size: int) -> Iterator[List[Recipient]]:
+        if self._frames is not None:
+            offset = 0
             try:
-                recipient["name"] = str(row.get(self.mapped_columns.get("name"), "")).strip()
-                recipient["pix_key"] = str(row.get(self.mapped_columns.get("pix_key"), "")).strip()
-                recipient["amount"] = float(row.get(self.mapped_columns.get("amount"), 0))
+                for frame in self._frames:
+                    # Índice contínuo entre blocos para manter a numeração das linhas
+                    self.df = frame.set_axis(pd.RangeIndex(offset, offset + len(frame)))
+                    offset += len(frame)
+                    self.stream_errors.extend(self.validate_data()[1])
+                    recipients = self.process_data()
+                    for start in range(0, len(recipients), chunk_size):
+                        yield recipients[start:start + chunk_size]
+            finally:
+                self.df = None
+                self.close()
+            return
+        if self.df is not None:
+            recipients = self.process_data()
+            for start in range(0, len(recipients), chunk_size):
+                yield recipients[start:start + chunk_size]
+            return
+        if self._rows is None: return
+        
+        positions = {col: i for i, col in enumerate(self.header)}
+        pos = {field: positions[col] for field, col in self.mapped_columns.items()}
+        i_name, i_key = pos.get("name"), pos.get("pix_key")
+        i_amount, i_doc = pos.get("amount"), pos.get("document")
+        i_campaign = pos.get("campaign")
+        
+        def cell(row, i):
+            return row[i] if i is not None and i < len(row) else None
+        
+        chunk = []
+        try:
+            for line, row in enumerate(self._rows, start=self.header_row + 2):
+                if not any(v is not None for v in row): continue
                 
-                doc = ""
-                if "document" in self.mapped_columns and pd.notna(row.get(self.mapped_columns["document"])):
-                    doc = "".join(filter(str.isdigit, str(row.get(self.mapped_columns["document"]))))
+                amount = cell(row, i_amount)
+                if amount is None or amount == "":
+                    self.stream_errors.append(f"Linha {line}: Valor vazio")
+                    continue
+                try:
+                    amount = to_cents(amount)
+                except Exception as e:
+                    logger.error(f"Erro ao processar linha {line}: {e}")
+                    self.stream_errors.append(f"Linha {line}: Valor inválido")
+                    continue
                 
-                if not doc:
-                    pix_digits = "".join(filter(str.isdigit, recipient["pix_key"]))
-                    if len(pix_digits) in [11, 14]:
-                        doc = pix_digits
+                name, pix_key = cell(row, i_name), cell(row, i_key)
+                name = "" if name is None else str(name).strip()
+                pix_key = "" if pix_key is None else str(pix_key).strip()
+                doc = cell(row, i_doc)
+                doc = "" if doc is None else str(doc)
                 
-                recipient["document"] = doc
-                recipients.append(recipient)
-            except Exception as e:
-                logger.error(f"Erro ao processar linha {idx+2}: {e}")
-        return recipients
\ No newline at end of file
+                campaign = cell(row, i_campaign)
+                campaign = "" if campaign is None else str(campaign).strip()
+
+                chunk.append((line, name, pix_key, doc, amount, campaign))
+                if len(chunk) >= chunk_size:
+                    yield self._validated_chunk(chunk)
+                    chunk = []
+            if chunk: yield self._validated_chunk(chunk)
+        finally:
+            self.close()
+
+    def _validated_chunk(self, rows: List[tuple]) -> List[Recipient]:
+        """Confere as chaves e documentos do bloco de uma vez; linhas inválidas vão para stream_errors."""
+        lines, names, keys, docs, amounts, campaigns = zip(*rows)
+        report = self._mark_duplicates(pix_validation.validate(keys, pix_validation.digits_only(docs)), lines)
+        self.stream_errors.extend(pix_validation.row_errors(report, lines))
+        self.stream_errors.extend(self._duplicate_errors(report, lines))
+        bad = pix_validation.invalid_rows(report) | (report["duplicate_of"].to_numpy() != 0)
+        return [Recipient(n, k, d, a, g)
+                for n, k, d, a, g, skip in zip(names, report["pix_key"].tolist(), report["document"].tolist(),
+                                               amounts, campaigns, bad.tolist()) if not skip]
@@ -0,0 +1,126 @@
+import os
+import json
+import base64
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPLOAD, OUTPUT = "upload", "output"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT,
+    recipients INTEGER,
+    total_cents INTEGER,
+    source TEXT,
+    UNIQUE (kind, filename)
+);
+CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (mtime DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_files_kind_mtime ON files (kind, mtime DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_files_source ON files (source);
+"""
+
+def encode_cursor(mtime: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([mtime, row_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        mtime, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(mtime), int(row_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+class FileCatalog:
+    """Índice (SQLite) dos arquivos enviados e gerados, para listar sem varrer o disco.
+
+    As rotas registram cada arquivo ao gravá-lo; a listagem pagina por cursor
+    sobre (mtime, id), do mais recente para o mais antigo.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, path: Path, content_hash: Optional[str] = None, recipients: Optional[int] = None,
+               total_cents: Optional[int] = None, source: Optional[str] = None):
+        """Insere ou atualiza a entrada do arquivo (um único stat, feito na gravação)."""
+        st = Path(path).stat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO files (kind, filename, size, mtime, content_hash, recipients, total_cents, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(kind, filename) DO UPDATE SET "
+                "size = excluded.size, mtime = excluded.mtime, "
+                "content_hash = COALESCE(excluded.content_hash, content_hash), "
+                "recipients = COALESCE(excluded.recipients, recipients), "
+                "total_cents = COALESCE(excluded.total_cents, total_cents), "
+                "source = COALESCE(excluded.source, source)",
+                (kind, Path(path).name, st.st_size, st.st_mtime, content_hash, recipients, total_cents, source))
+
+    def remove(self, kind: str, filename: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE kind = ? AND filename = ?", (kind, filename))
+
+    def backfill(self, kind: str, folder: Path, patterns: Iterable[str]) -> int:
+        """Cataloga (sem hash nem totais) arquivos já existentes; roda só com o catálogo vazio."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM files WHERE kind = ? LIMIT 1", (kind,)).fetchone():
+                return 0
+            rows = []
+            for pattern in patterns:
+                for f in Path(folder).glob(pattern):
+                    try:
+                        st = f.stat()
+                    except FileNotFoundError:
+                        continue
+                    rows.append((kind, f.name, st.st_size, st.st_mtime))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO files (kind, filename, size, mtime) VALUES (?, ?, ?, ?)", rows)
+        if rows: logger.info(f"Catálogo: {len(rows)} arquivos de {kind} existentes registrados")
+        return len(rows)
+
+    def page(self, kind: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+             cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Uma página de arquivos (mais recentes primeiro) e o cursor da próxima, se houver."""
+        where, params = [], []
+        if kind:
+            where.append("f.kind = ?"); params.append(kind)
+        if since is not None:
+            where.append("f.mtime >= ?"); params.append(since)
+        if until is not None:
+            where.append("f.mtime < ?"); params.append(until)
+        if cursor:
+            mtime, row_id = decode_cursor(cursor)
+            where.append("(f.mtime < ? OR (f.mtime = ? AND f.id < ?))"); params += [mtime, mtime, row_id]
+        sql = ("SELECT f.id, f.kind, f.filename, f.size, f.mtime, f.content_hash, f.recipients, f.total_cents, f.source, "
+               "(SELECT group_concat(o.filename) FROM files o WHERE o.kind = 'output' AND o.source = f.filename) "
+               "FROM files f")
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY f.mtime DESC, f.id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+
+        files = []
+        for row_id, kind_, filename, size, mtime, digest, recipients, total_cents, source, outputs in rows[:limit]:
+            entry = {'filename': filename, 'kind': kind_, 'size': size, 'modified': mtime, 'content_hash': digest,
+                     'total_recipients': recipients,
+                     'total_amount': None if total_cents is None else total_cents / 100}
+            if kind_ == OUTPUT: entry['source'] = source
+            else: entry['outputs'] = outputs.split(",") if outputs else []
+            files.append(entry)
+        next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+        return files, next_cursor
@@ -1,17 +1,64 @@
 import requests
 import base64
+import time
+import hashlib
+import weakref
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, date
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple, Union
 import logging
 import certifi
+from requests.adapters import HTTPAdapter
+
+import metrics
+from recipient import Recipient
+from token_cache import TokenCache, shared_token_cache
 
 logger = logging.getLogger(__name__)
 
+class RateLimiter:
+    """Token bucket compartilhado entre threads: no máximo `rate` chamadas por segundo."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Cabeçalho com a chave de idempotência: o banco devolve a mesma recorrência em vez de criar outra
+IDEMPOTENCY_HEADER = "x-id-idempotente"
+
+# Um agendamento de renovação por token (cache_key) no processo, mesmo com vários clientes
+_refresh_timers: Dict[str, threading.Timer] = {}
+_refresh_timers_lock = threading.Lock()
+
+def _refresh_client(ref: "weakref.ref[InterAPIClient]"):
+    # O timer guarda só uma referência fraca: cliente descartado não segue renovando o token
+    client = ref()
+    if client is not None:
+        client._background_refresh()
+
 class InterAPIClient:
     """Cliente para integração com a API PIX AUTOMÁTICO do Banco Inter"""
 
-    def __init__(self, client_id: str, client_secret: str, cert_path: str, key_path: str, base_url: str, scopes: str, conta_corrente: str):
+    def __init__(self, client_id: str, client_secret: str, cert_path: str, key_path: str, base_url: str, scopes: str, conta_corrente: str,
+                 ca_bundle: Optional[str] = None, pool_size: int = 10,
+                 token_cache: Optional[TokenCache] = None, refresh_ahead: Optional[int] = None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.cert_path = cert_path
@@ -26,6 +73,69 @@ class InterAPIClient:
         self.recorrencia_url = f"{base_url}/pix/v2/rec"
         self.access_token = None
         self.token_expires_at = None
+        # CA usada para validar o servidor; um stub local de testes pode passar a própria
+        self.ca_bundle = ca_bundle or certifi.where()
+        self.pool_size = pool_size
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+        self._closed = False
+        # Token compartilhado com os demais clientes/processos com as mesmas credenciais
+        self.token_cache = token_cache or shared_token_cache()
+        self.cache_key = hashlib.sha256(f"{base_url}|{client_id}|{scopes}".encode()).hexdigest()[:32]
+        if refresh_ahead is None:
+            import config
+            refresh_ahead = config.INTER_TOKEN_REFRESH_AHEAD
+        self.refresh_ahead = refresh_ahead
+
+    @property
+    def session(self) -> requests.Session:
+        """Sessão com pool de conexões: o handshake TCP + mTLS é reaproveitado entre chamadas.
+
+        O verify vai em cada chamada porque REQUESTS_CA_BUNDLE no ambiente sobrepõe session.verify.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._ensure_certificates()
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.cert = (self.cert_path, self.key_path)
+                    self._session = session
+        return self._session
+
+    @staticmethod
+    def _ensure_certificates():
+        """Certificados vindos do ambiente (base64) só são gravados no primeiro uso do mTLS."""
+        import config
+        config.ensure_certificates()
+
+    def close(self):
+        """Fecha a sessão e cancela a renovação em segundo plano agendada por este cliente."""
+        with _refresh_timers_lock:
+            self._closed = True
+            timer, self._refresh_timer = self._refresh_timer, None
+            if timer is not None and _refresh_timers.get(self.cache_key) is timer:
+                del _refresh_timers[self.cache_key]
+        if timer is not None:
+            timer.cancel()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _post(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        """POST pela sessão registrando latência e status (ou 'error' em exceção) por endpoint."""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.post(url, verify=self.ca_bundle, timeout=30, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            metrics.observe("inter_api_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+            metrics.inc("inter_api_responses_total", endpoint=endpoint, status=status)
 
     def _get_auth_header(self) -> str:
         credentials = f"{self.client_id}:{self.client_secret}"
@@ -43,6 +153,7 @@ class InterAPIClient:
             headers = { "Content-Type": "application/x-www-form-urlencoded" }
             data = { "grant_type": "client_credentials", "scope": self.scopes }
 
+            self._ensure_certificates()
             if not Path(self.cert_path).exists():
                 logger.error(f"Certificado não encontrado: {self.cert_path}")
                 return False
@@ -50,20 +161,15 @@ class InterAPIClient:
                 logger.error(f"Chave privada não encontrada: {self.key_path}")
                 return False
 
-            response = requests.post(
-                self.token_url,
-                headers=headers,
-                data=data,
-                cert=(self.cert_path, self.key_path),
-                verify=certifi.where(),
-                timeout=30
-            )
+            response = self._post("token", self.token_url, headers=headers, data=data)
 
             if response.status_code == 200:
                 token_data = response.json()
                 self.access_token = token_data.get("access_token")
                 expires_in = token_data.get("expires_in", 3600)
                 self.token_expires_at = datetime.now() + timedelta(seconds=expires_in - 60)
+                self.token_cache.set(self.cache_key, self.access_token, self.token_expires_at.timestamp())
+                self._schedule_refresh()
                 logger.info("Autenticação com a API do Inter realizada com sucesso.")
                 return True
             else:
@@ -73,17 +179,68 @@ class InterAPIClient:
             logger.error(f"Exceção durante autenticação: {str(e)}")
             return False
 
+    def _adopt_cached(self, reload: bool = False) -> bool:
+        entry = self.token_cache.reload(self.cache_key) if reload else self.token_cache.get(self.cache_key)
+        if not entry or entry[1] <= time.time():
+            return False
+        self.access_token = entry[0]
+        self.token_expires_at = datetime.fromtimestamp(entry[1])
+        return True
+
     def _ensure_authenticated(self) -> bool:
-        if not self._is_token_valid():
+        if self._is_token_valid() or self._adopt_cached():
+            return True
+        # Só uma thread (e um processo, no cache em arquivo) renova o token; as demais aproveitam o resultado
+        with self.token_cache.lock(self.cache_key):
+            if self._adopt_cached(reload=True):
+                return True
             return self.authenticate()
-        return True
 
-    def create_recorrencia(self, recipient_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Cria uma RECORRÊNCIA de pagamento, não um pagamento direto."""
+    def _schedule_refresh(self, delay: Optional[float] = None):
+        """Agenda a renovação em segundo plano refresh_ahead segundos antes da expiração."""
+        if delay is None:
+            # Tokens de vida curta são renovados na metade do tempo restante, sem entrar em laço
+            remaining = self.token_expires_at.timestamp() - time.time()
+            delay = max(remaining - self.refresh_ahead, remaining / 2, 1.0)
+        timer = threading.Timer(delay, _refresh_client, (weakref.ref(self),))
+        timer.daemon = True
+        with _refresh_timers_lock:
+            if self._closed: return
+            previous = _refresh_timers.get(self.cache_key)
+            if previous is not None and previous is not threading.current_thread():
+                previous.cancel()
+            _refresh_timers[self.cache_key] = self._refresh_timer = timer
+        timer.start()
+
+    def _background_refresh(self):
+        if self._closed: return
+        with self.token_cache.lock(self.cache_key):
+            # Outro processo pode ter renovado enquanto esperávamos o lock
+            entry = self.token_cache.reload(self.cache_key)
+            if entry and entry[1] - time.time() > self.refresh_ahead:
+                self._adopt_cached()
+                self._schedule_refresh()
+                return
+            if not self.authenticate():
+                retry = 30 if entry and entry[1] > time.time() + 30 else None
+                if retry is not None:
+                    logger.warning(f"Renovação antecipada do token falhou; nova tentativa em {retry}s")
+                    self._schedule_refresh(retry)
+
+    def create_recorrencia(self, recipient_data: Union[Recipient, Dict[str, Any]],
+                           idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Cria uma RECORRÊNCIA de pagamento, não um pagamento direto.
+
+        Com idempotency_key, a chave vai em IDEMPOTENCY_HEADER. "sent": False no
+        resultado indica que a requisição não chegou a ser feita.
+        """
         if not self._ensure_authenticated():
-            return {"success": False, "error": "Falha na autenticação"}
+            return {"success": False, "error": "Falha na autenticação", "sent": False}
         
+        sent = False
         try:
+            if not isinstance(recipient_data, Recipient):
+                recipient_data = Recipient.from_dict(recipient_data)
             headers = {
                 "Authorization": f"Bearer {self.access_token}",
                 "Content-Type": "application/json"
@@ -91,6 +248,8 @@ class InterAPIClient:
             # Adiciona o x-conta-corrente se necessário
             if self.conta_corrente:
                  headers["x-conta-corrente"] = self.conta_corrente
+            if idempotency_key:
+                headers[IDEMPOTENCY_HEADER] = idempotency_key
 
             # --- ESTRUTURA DO JSON CONFORME A NOVA DOCUMENTAÇÃO ---
             # Este é um exemplo para criar uma recorrência mensal simples.
@@ -104,31 +263,68 @@ class InterAPIClient:
                     "periodicidade": "MENSAL" 
                 },
                 "valor": {
-                    "valorRec": f"{recipient_data['amount']:.2f}"
+                    "valorRec": f"{recipient_data.amount_cents // 100}.{recipient_data.amount_cents % 100:02d}"
                 },
                 "vinculo": {
-                    "contrato": f"PAGAMENTO-{recipient_data.get('document', 'NA')}",
-                    "objeto": f"Pagamento para {recipient_data.get('name', 'N/A')}"
+                    "contrato": f"PAGAMENTO-{recipient_data.document or 'NA'}",
+                    "objeto": f"Pagamento para {recipient_data.name or 'N/A'}"
                 },
                  "politicaRetentativa": "NAO_PERMITE"
             }
             
-            response = requests.post(
-                self.recorrencia_url,
-                headers=headers,
-                json=payload,
-                cert=(self.cert_path, self.key_path),
-                verify=certifi.where(),
-                timeout=30
-            )
+            sent = True
+            response = self._post("rec", self.recorrencia_url, headers=headers, json=payload)
             
             if response.status_code in [200, 201]:
                 result = response.json()
                 logger.info(f"Recorrência criada com sucesso: {result.get('idRec', 'N/A')}")
-                return {"success": True, "data": result}
+                return {"success": True, "data": result, "status_code": response.status_code}
             else:
                 logger.error(f"Erro ao criar recorrência: {response.status_code} - {response.text}")
-                return {"success": False, "error": f"HTTP {response.status_code}: {response.text}"}
+                return {"success": False, "error": f"HTTP {response.status_code}: {response.text}", "status_code": response.status_code}
         except Exception as e:
             logger.error(f"Exceção durante criação da recorrência: {str(e)}")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e), "sent": sent}
+
+    def create_recorrencias_bulk(self, recipients: Iterable[Union[Recipient, Dict[str, Any]]],
+                                 max_workers: int = 8, rate_limit: Optional[float] = None,
+                                 idempotency_keys: Optional[Sequence[str]] = None,
+                                 before_send: Optional[Callable[[int], None]] = None
+                                 ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Envia as recorrências em paralelo pela mesma sessão, em ordem de término.
+
+        Gera (índice do favorecido, resultado de create_recorrencia). max_workers limita
+        as requisições simultâneas (até pool_size) e rate_limit, se informado, as
+        requisições por segundo. idempotency_keys[i] acompanha o favorecido i, e
+        before_send(i) roda logo antes da sua requisição (se falhar, ela não é feita).
+        Os favorecidos são lidos sob demanda; se o consumo for interrompido, as
+        recorrências que ainda não começaram a ser enviadas são canceladas.
+        """
+        if not self._ensure_authenticated():
+            for i, _ in enumerate(recipients):
+                yield i, {"success": False, "error": "Falha na autenticação", "sent": False}
+            return
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        # Mais threads que conexões no pool só gerariam conexões descartadas
+        max_workers = max(1, min(max_workers, self.pool_size))
+
+        def submit_one(i, recipient):
+            if limiter: limiter.acquire()
+            if before_send: before_send(i)
+            return self.create_recorrencia(recipient, idempotency_keys[i] if idempotency_keys else None)
+
+        # No máximo 2 envios por thread na fila, repostos à medida que os resultados saem
+        pending: Dict[Any, int] = {}
+        rows = enumerate(recipients)
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inter-bulk")
+        try:
+            while True:
+                for i, r in rows:
+                    pending[pool.submit(submit_one, i, r)] = i
+                    if len(pending) >= 2 * max_workers: break
+                if not pending: break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,97 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """Estado de um processamento em segundo plano, consultado pela rota de status."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> done | failed
+        self.phase = "na fila"
+        self.rows_processed = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id, "kind": self.kind, "status": self.status, "phase": self.phase,
+                "rows_processed": self.rows_processed, "result": self.result, "error": self.error,
+                "created_at": self.created_at, "updated_at": self.updated_at,
+            }
+
+class JobQueueFull(Exception):
+    pass
+
+class JobManager:
+    """Pool local de workers com concorrência e fila limitadas.
+
+    max_workers limita quantos jobs pesados rodam ao mesmo tempo e max_pending
+    quantos podem esperar; acima disso submit recusa com JobQueueFull para não
+    tomar os workers HTTP. Jobs terminados ficam consultáveis por ttl segundos.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20, ttl: int = 3600):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Criado sob demanda para não subir threads em processos que nunca usam jobs
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cnab-job")
+        return self._executor
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.updated_at > self.ttl:
+                del self._jobs[job_id]
+
+    def submit(self, kind: str, fn: Callable[[Job], Dict[str, Any]]) -> Job:
+        """Agenda fn(job); o retorno vira job.result e exceções marcam o job como falho."""
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_workers + self.max_pending:
+                raise JobQueueFull(f"Limite de {active} jobs em andamento atingido")
+            job = Job(kind)
+            self._jobs[job.id] = job
+
+        def run():
+            job.update(status="running", phase="iniciando")
+            try:
+                job.update(status="done", phase="concluído", result=fn(job))
+            except Exception as e:
+                logger.error(f"Erro no job {job.id} ({kind}): {e}")
+                job.update(status="failed", phase="erro", error=str(e))
+
+        self._pool().submit(run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
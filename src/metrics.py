@@ -0,0 +1,166 @@
+"""Métricas em memória (contadores e histogramas) expostas no formato texto do Prometheus.
+
+Os valores são por processo: com vários workers do gunicorn cada um expõe os
+seus, e o Prometheus agrega. Com METRICS_ENABLED=false span() devolve um
+contexto vazio compartilhado e os decoradores chamam a função direto, então o
+custo desligado é uma verificação de atributo.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+
+# Segundos: de 1ms (chamadas rápidas) a 2min (planilhas enormes)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_HELP = {
+    "cnab_stage_duration_seconds": "Duração de cada etapa do processamento (leitura, validação, geração, gravação)",
+    "cnab_rows_total": "Linhas processadas por etapa",
+    "cnab_bytes_written_total": "Bytes gravados em arquivos gerados",
+    "inter_api_request_duration_seconds": "Latência das chamadas à API do Banco Inter",
+    "inter_api_responses_total": "Respostas da API do Banco Inter por status HTTP",
+    "http_request_duration_seconds": "Duração das requisições às rotas /api/pix",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+_NULL = nullcontext()
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled: return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled: return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self.buckets)
+            hist.observe(value)
+
+    def span(self, stage: str, **labels):
+        """Contexto que mede a etapa em cnab_stage_duration_seconds{stage=...}."""
+        if not self.enabled: return _NULL
+        return self._span(stage, labels)
+
+    @contextmanager
+    def _span(self, stage: str, labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("cnab_stage_duration_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def timed(self, stage: str):
+        """Decorador equivalente a span(stage) em volta da chamada."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return fn(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe("cnab_stage_duration_seconds", time.perf_counter() - started, stage=stage)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Exposição no formato texto 0.0.4 do Prometheus."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                _header(lines, name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+            for name, series in sorted(self._histograms.items()):
+                _header(lines, name, "histogram")
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key, le=_number(bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {hist.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(hist.sum)}")
+                    lines.append(f"{name}_count{_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+def measure_iter(stage: str, iterable: Iterable, rows: Optional[Callable] = None) -> Iterator:
+    """Mede só o tempo gasto produzindo os itens (não o do consumidor) e, com rows, conta linhas.
+
+    Para geradores encadeados o tempo inclui o que eles puxam de quem está antes.
+    """
+    if not registry.enabled: return iter(iterable)
+    return _measure_iter(stage, iterable, rows)
+
+def _measure_iter(stage: str, iterable: Iterable, rows: Optional[Callable]) -> Iterator:
+    spent, count = 0.0, 0
+    started = time.perf_counter()
+    try:
+        for item in iterable:
+            spent += time.perf_counter() - started
+            if rows: count += rows(item)
+            yield item
+            started = time.perf_counter()
+        spent += time.perf_counter() - started
+    finally:
+        registry.observe("cnab_stage_duration_seconds", spent, stage=stage)
+        if rows: registry.inc("cnab_rows_total", count, stage=stage)
+
+def _header(lines: List[str], name: str, kind: str):
+    if name in _HELP: lines.append(f"# HELP {name} {_HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+registry = Registry(config.METRICS_ENABLED)
+
+# Atalhos usados pelos módulos instrumentados
+span = registry.span
+timed = registry.timed
+inc = registry.inc
+observe = registry.observe
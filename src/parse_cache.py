@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from recipient import Recipient
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Células de planilha não podem conter NUL (o XML do xlsx proíbe), então serve de separador
+_SEP = "\x00"
+# Versão do conteúdo das entradas; entradas de outra versão contam como ausentes.
+# 2: campanhas e chaves PIX conferidas e normalizadas (pix_validation)
+_FORMAT = 2
+
+def content_hash(file_path, block_size: int = 1 << 20) -> str:
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _pack_text(values: List[str]) -> "np.ndarray":
+    import numpy as np
+    return np.frombuffer(_SEP.join(values).encode("utf-8"), dtype=np.uint8)
+
+def _unpack_text(data: "np.ndarray", count: int) -> List[str]:
+    if count == 0: return []
+    values = data.tobytes().decode("utf-8").split(_SEP)
+    if len(values) != count:
+        raise ValueError(f"Cache corrompido: esperadas {count} linhas, encontradas {len(values)}")
+    return values
+
+class ParseCache:
+    """Cache dos favorecidos já processados, endereçado pelo hash do arquivo enviado.
+
+    Cada entrada é um .npz colunar (nomes, chaves, documentos e campanhas como UTF-8
+    contíguo, centavos como int64) mais as colunas detectadas. Entradas antigas
+    ou excedentes são removidas a cada gravação.
+    """
+
+    def __init__(self, directory, max_bytes: int = 256 * 1024 * 1024, max_age: int = 24 * 3600):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.npz"
+
+    def get(self, digest: str) -> Optional[Tuple[List[Recipient], Dict[str, Any]]]:
+        # NumPy só é importado no primeiro uso do cache, não na subida do app
+        import numpy as np
+        path = self._path(digest)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if "format" not in data.files or int(data["format"]) != _FORMAT:
+                    return None
+                count = int(data["count"])
+                names = _unpack_text(data["names"], count)
+                pix_keys = _unpack_text(data["pix_keys"], count)
+                documents = _unpack_text(data["documents"], count)
+                campaigns = _unpack_text(data["campaigns"], count)
+                cents = data["amount_cents"].tolist()
+                columns = json.loads(data["columns"].tobytes().decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de cache inválida {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)  # marca como usada recentemente para a política de descarte
+        except FileNotFoundError:
+            pass
+        recipients = [Recipient(n, k, d, c, g) for n, k, d, c, g in zip(names, pix_keys, documents, cents, campaigns)]
+        return recipients, columns
+
+    def put(self, digest: str, recipients: List[Recipient], columns: Dict[str, Any]):
+        import numpy as np
+        path = self._path(digest)
+        partial = path.with_name(f"{path.stem}.{os.getpid()}.part")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(partial, "wb") as fh:
+                np.savez(
+                    fh,
+                    format=np.array(_FORMAT, dtype=np.int64),
+                    count=np.array(len(recipients), dtype=np.int64),
+                    names=_pack_text([r.name for r in recipients]),
+                    pix_keys=_pack_text([r.pix_key for r in recipients]),
+                    documents=_pack_text([r.document for r in recipients]),
+                    campaigns=_pack_text([r.campaign for r in recipients]),
+                    amount_cents=np.fromiter((r.amount_cents for r in recipients), dtype=np.int64, count=len(recipients)),
+                    columns=np.frombuffer(json.dumps(columns).encode("utf-8"), dtype=np.uint8),
+                )
+            os.replace(partial, path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o cache {path.name}: {e}")
+            partial.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove entradas mais velhas que max_age e, depois, as menos usadas até caber em max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*.npz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,248 @@
+"""Conferência das chaves PIX e dos documentos de uma planilha inteira de uma vez.
+
+Cada chave é classificada como CPF, CNPJ, e-mail, telefone ou aleatória (EVP)
+com uma única expressão regular pré-compilada e normalizada para o formato do
+DICT: CPF/CNPJ só com dígitos, telefone em E.164 (+55DDD9XXXXXXXX), e-mail e
+EVP em minúsculas. Os dígitos verificadores de CPF/CNPJ (das chaves e da coluna
+de documento) são conferidos com NumPy sobre a coluna toda.
+
+Uso: python src/pix_validation.py planilha.xlsx [--out relatorio.csv]
+"""
+import re
+import sys
+import logging
+import argparse
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+CPF, CNPJ, EMAIL, PHONE, EVP = "cpf", "cnpj", "email", "phone", "evp"
+REPORT_COLUMNS = ["key_type", "pix_key", "doc_type", "document", "key_error", "doc_error"]
+# Limite do DICT para chaves do tipo e-mail
+EMAIL_MAX_LENGTH = 77
+
+_CPF = r"\d{3}\.?\d{3}\.?\d{3}-?\d{2}"
+_CNPJ = r"\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}"
+# Só celular: DDD sem zero e número de 9 dígitos começando por 9, com ou sem +55
+_PHONE = r"(?:\+\s*55|55)?\s*\(?(?P<ddd>[1-9]{2})\)?\s*(?P<prefix>9\d{4})[-\s]?(?P<suffix>\d{4})"
+_EMAIL = r"[a-z0-9.!#$%&'*+/=?^_`{|}~-]+@[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)+"
+_EVP = r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+
+# Um teste barato ("@", 36 caracteres) escolhe a expressão de cada chave; entre
+# as numéricas a ordem das alternativas resolve a ambiguidade: 11 dígitos soltos
+# são CPF (o telefone sem +55 só é aceito quando os dígitos verificadores não batem)
+_DIGIT_KEY = re.compile(rf"(?P<{CPF}>{_CPF})|(?P<{CNPJ}>{_CNPJ})|(?P<{PHONE}>{_PHONE})", re.ASCII)
+_EMAIL_KEY = re.compile(_EMAIL, re.IGNORECASE | re.ASCII)
+_EVP_KEY = re.compile(_EVP, re.IGNORECASE | re.ASCII)
+_PHONE_KEY = re.compile(_PHONE, re.ASCII)
+_NON_DIGIT = re.compile(r"\D", re.ASCII)
+
+_CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+_CNPJ_WEIGHTS = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+
+def _digit_matrix(values: Sequence[str], width: int) -> np.ndarray:
+    """Matriz (n, width) com os dígitos de strings que têm exatamente `width` dígitos."""
+    raw = np.frombuffer("".join(values).encode("ascii"), dtype=np.uint8)
+    return raw.reshape(-1, width).astype(np.int64) - 48
+
+
+def _repeated(d: np.ndarray) -> np.ndarray:
+    # 000.000.000-00, 111.111.111-11... passam na conta mas não existem
+    return (d == d[:, :1]).all(axis=1)
+
+
+def cpf_valid(values: Sequence[str]) -> np.ndarray:
+    """Confere os dígitos verificadores de CPFs de 11 dígitos; devolve uma máscara."""
+    if not len(values): return np.zeros(0, dtype=bool)
+    d = _digit_matrix(values, 11)
+    dv1 = (d[:, :9] @ _CPF_WEIGHTS[0]) * 10 % 11 % 10
+    dv2 = (d[:, :10] @ _CPF_WEIGHTS[1]) * 10 % 11 % 10
+    return (dv1 == d[:, 9]) & (dv2 == d[:, 10]) & ~_repeated(d)
+
+
+def cnpj_valid(values: Sequence[str]) -> np.ndarray:
+    """Confere os dígitos verificadores de CNPJs de 14 dígitos; devolve uma máscara."""
+    if not len(values): return np.zeros(0, dtype=bool)
+    d = _digit_matrix(values, 14)
+    r1 = (d[:, :12] @ _CNPJ_WEIGHTS[0]) % 11
+    r2 = (d[:, :13] @ _CNPJ_WEIGHTS[1]) % 11
+    dv1, dv2 = np.where(r1 < 2, 0, 11 - r1), np.where(r2 < 2, 0, 11 - r2)
+    return (dv1 == d[:, 12]) & (dv2 == d[:, 13]) & ~_repeated(d)
+
+
+def digits_only(values: Sequence[str]) -> List[str]:
+    """Só os dígitos de cada valor; a pontuação usual sai sem passar por regex."""
+    out = []
+    for value in values:
+        # str.replace encadeado sai bem mais barato que str.translate
+        value = value.replace(".", "").replace("-", "").replace("/", "")
+        out.append(value if value.isascii() and value.isdigit() else _NON_DIGIT.sub("", value))
+    return out
+
+
+def _check(kinds: np.ndarray, values: np.ndarray, kind: str, valid) -> np.ndarray:
+    """Índices das linhas do tipo `kind` cujos dígitos verificadores não batem."""
+    rows = np.flatnonzero(kinds == kind)
+    return rows[~valid(values[rows].tolist())]
+
+
+def _e164(m: "re.Match") -> str:
+    return f"+55{m['ddd']}{m['prefix']}{m['suffix']}"
+
+
+def _pad(documents: Sequence[str], rows: np.ndarray, width: int) -> List[str]:
+    return [documents[i].zfill(width) for i in rows.tolist()]
+
+
+def _pad_short_keys(keys: Sequence[str], kinds: np.ndarray, normalized: np.ndarray):
+    """Chaves numéricas que perderam zeros à esquerda (célula numérica) viram CPF/CNPJ.
+
+    Como nos documentos: 9-10 dígitos são completados para 11 e 12-13 para 14,
+    e a chave só muda de tipo se os dígitos verificadores baterem; o telefone
+    (13 dígitos com 55) fica para quando não batem.
+    """
+    for width, kind, valid in ((11, CPF, cpf_valid), (14, CNPJ, cnpj_valid)):
+        rows = np.array([i for i in np.flatnonzero((kinds == "") | (kinds == PHONE)).tolist()
+                         if width - 2 <= len(keys[i]) < width and keys[i].isascii() and keys[i].isdigit()],
+                        dtype=np.int64)
+        padded = _pad(keys, rows, width)
+        ok = valid(padded)
+        normalized[rows[ok]], kinds[rows[ok]] = np.array(padded, dtype=object)[ok], kind
+
+
+def classify_keys(keys: Sequence[str]):
+    """Classifica e normaliza as chaves; devolve (tipos, chaves normalizadas, erros)."""
+    kinds, normalized = [], []
+    add_kind, add_key = kinds.append, normalized.append
+    digit_key, email_key, evp_key = _DIGIT_KEY.fullmatch, _EMAIL_KEY.fullmatch, _EVP_KEY.fullmatch
+    for key in keys:
+        if "@" in key:
+            kind = EMAIL if email_key(key) else ""
+            add_key(key.lower() if kind else key)
+        elif len(key) == 36 and evp_key(key):
+            kind = EVP
+            add_key(key.lower())
+        else:
+            m = digit_key(key)
+            kind = m.lastgroup if m else ""
+            add_key(_e164(m) if kind == PHONE else key.replace(".", "").replace("-", "").replace("/", "") if kind else key)
+        add_kind(kind)
+    kinds, normalized = np.array(kinds, dtype=object), np.array(normalized, dtype=object)
+    _pad_short_keys(keys, kinds, normalized)
+    errors = np.full(len(kinds), "", dtype=object)
+
+    for i in np.flatnonzero(kinds == ""):
+        errors[i] = f"Chave PIX não reconhecida: {keys[i]}" if keys[i] else "Chave PIX vazia"
+    for i in _check(kinds, normalized, CPF, cpf_valid):
+        phone = _PHONE_KEY.fullmatch(keys[i])
+        if phone is not None:
+            kinds[i], normalized[i] = PHONE, _e164(phone)
+        else:
+            errors[i] = f"Chave PIX com CPF inválido: {keys[i]}"
+    for i in _check(kinds, normalized, CNPJ, cnpj_valid):
+        errors[i] = f"Chave PIX com CNPJ inválido: {keys[i]}"
+    for i in np.flatnonzero(kinds == EMAIL):
+        if len(normalized[i]) > EMAIL_MAX_LENGTH:
+            errors[i] = f"Chave PIX (e-mail) com mais de {EMAIL_MAX_LENGTH} caracteres: {keys[i]}"
+    return kinds, normalized, errors
+
+
+def classify_documents(documents: Sequence[str]):
+    """Confere documentos só com dígitos; devolve (tipos, documentos normalizados, erros).
+
+    Células numéricas perdem os zeros à esquerda, então o documento curto é
+    completado como CPF e, se os dígitos verificadores não baterem, como CNPJ.
+    Documento vazio não é erro: a coluna é opcional.
+    """
+    n = len(documents)
+    lengths = np.fromiter(map(len, documents), dtype=np.int64, count=n)
+    docs = np.array(documents, dtype=object)
+    kinds = np.full(n, "", dtype=object)
+    errors = np.full(n, "", dtype=object)
+
+    rows = np.flatnonzero((lengths > 0) & (lengths <= 11))
+    padded = _pad(documents, rows, 11)
+    ok = cpf_valid(padded)
+    docs[rows[ok]], kinds[rows[ok]] = np.array(padded, dtype=object)[ok], CPF
+    rows = np.flatnonzero((lengths > 0) & (lengths <= 14) & (kinds == ""))
+    padded = _pad(documents, rows, 14)
+    ok = cnpj_valid(padded)
+    docs[rows[ok]], kinds[rows[ok]] = np.array(padded, dtype=object)[ok], CNPJ
+
+    for i in np.flatnonzero((kinds == "") & (lengths > 0)).tolist():
+        doc = documents[i]
+        errors[i] = (f"CPF inválido: {doc}" if len(doc) == 11 else f"CNPJ inválido: {doc}" if len(doc) == 14
+                     else f"Documento com {len(doc)} dígitos: {doc}")
+    return kinds, docs, errors
+
+
+def validate(pix_keys: Sequence[str], documents: Sequence[str], index=None) -> pd.DataFrame:
+    """Relatório por linha: tipo e chave normalizada, tipo e documento, e os erros ("" = ok).
+
+    `pix_keys` são textos já sem espaços nas pontas e `documents` só dígitos
+    ("" quando a linha não tem documento). Sem documento, uma chave CPF/CNPJ
+    válida é usada como documento, como o processador já fazia.
+    """
+    key_types, keys, key_errors = classify_keys(list(pix_keys))
+    doc_types, docs, doc_errors = classify_documents(list(documents))
+    fallback = (docs == "") & ((key_types == CPF) | (key_types == CNPJ)) & (key_errors == "")
+    docs[fallback], doc_types[fallback] = keys[fallback], key_types[fallback]
+    return pd.DataFrame({"key_type": key_types, "pix_key": keys, "doc_type": doc_types, "document": docs,
+                         "key_error": key_errors, "doc_error": doc_errors}, index=index, columns=REPORT_COLUMNS)
+
+
+def invalid_rows(report: pd.DataFrame) -> np.ndarray:
+    """Máscara das linhas com chave ou documento inválido."""
+    return (report["key_error"].to_numpy() != "") | (report["doc_error"].to_numpy() != "")
+
+
+def row_errors(report: pd.DataFrame, lines: Sequence[int]) -> List[str]:
+    """Mensagens "Linha N: ..." das linhas inválidas; `lines` numera as linhas do relatório."""
+    messages = []
+    for i in np.flatnonzero(invalid_rows(report)):
+        for error in (report["key_error"].iat[i], report["doc_error"].iat[i]):
+            if error: messages.append(f"Linha {lines[i]}: {error}")
+    return messages
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import config
+    from excel_processor import ExcelProcessor
+
+    parser = argparse.ArgumentParser(description="Confere as chaves PIX e os documentos de uma planilha.")
+    parser.add_argument("planilha")
+    parser.add_argument("--out", help="grava o relatório completo, linha a linha, em CSV")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+
+    processor = ExcelProcessor()
+    ok, errors = processor.preflight(args.planilha)
+    if not ok or not processor.load_file(args.planilha):
+        print("\n".join(errors) or "Erro ao carregar a planilha.")
+        return 1
+    processor.detect_columns()
+    ok, errors = processor.validate_data()
+    report = processor.key_report
+    if report is None:
+        print("\n".join(errors))
+        return 1
+
+    print(f"{len(report):,} linhas, {int(invalid_rows(report).sum()):,} com chave ou documento inválido")
+    for kind, count in report["key_type"].replace("", "inválida").value_counts().items():
+        print(f"  {kind:9s}{count:10,}")
+    if args.out:
+        report.insert(0, "linha", report.index + processor.header_row + 2)
+        report.to_csv(args.out, index=False)
+        print(f"relatório gravado em {args.out}")
+    else:
+        for message in errors[:50]:
+            print(message)
+        if len(errors) > 50:
+            print(f"... e mais {len(errors) - 50} (use --out para o relatório completo)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
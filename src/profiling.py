@@ -0,0 +1,91 @@
+import io
+import os
+import re
+import time
+import uuid
+import pstats
+import logging
+import cProfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}_[0-9a-f]{8}$")
+
+class RequestProfiler:
+    """Perfis cProfile de requisições individuais, gravados como .prof (pstats).
+
+    Um perfil por vez no processo (o cProfile do Python 3.12+ não aceita dois
+    ativos); pedidos concorrentes seguem sem perfil. Só o thread da requisição
+    é medido: jobs em segundo plano ficam de fora. Mantém no máximo max_files
+    perfis, apagando os mais antigos.
+    """
+
+    def __init__(self, directory, max_files: int = 20):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._busy = threading.Lock()
+
+    def start(self) -> Optional[Dict[str, Any]]:
+        """Liga o profiler; devolve o estado a passar para finish, ou None se já houver outro ativo."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self._busy.release()
+            raise
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        return {"id": profile_id, "profile": profile, "started": time.perf_counter()}
+
+    def finish(self, state: Dict[str, Any], endpoint: str) -> Optional[Path]:
+        """Desliga o profiler, grava o .prof e aplica o limite de arquivos."""
+        profile: cProfile.Profile = state["profile"]
+        try:
+            profile.disable()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{state['id']}.prof"
+            profile.dump_stats(path)
+            elapsed = time.perf_counter() - state["started"]
+            logger.info(f"Perfil {state['id']} de {endpoint} gravado ({elapsed:.2f}s)")
+            self.prune()
+            return path
+        except Exception as e:
+            logger.error(f"Erro ao gravar perfil {state['id']}: {e}")
+            return None
+        finally:
+            self._busy.release()
+
+    def _profiles(self) -> List[Tuple[Path, os.stat_result]]:
+        """Perfis gravados, do mais recente para o mais antigo."""
+        entries = []
+        for path in self.directory.glob("*.prof"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return sorted(entries, key=lambda e: e[1].st_mtime_ns, reverse=True)
+
+    def prune(self):
+        for old, _ in self._profiles()[self.max_files:]:
+            old.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [{"profile_id": p.stem, "size": st.st_size, "created": st.st_mtime} for p, st in self._profiles()]
+
+    def path_for(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_ID.match(profile_id): return None
+        path = self.directory / f"{profile_id}.prof"
+        return path if path.exists() else None
+
+    def report(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """Resumo em texto (pstats) das funções mais caras do perfil."""
+        path = self.path_for(profile_id)
+        if path is None: return None
+        out = io.StringIO()
+        stats = pstats.Stats(str(path), stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,58 @@
+import math
+from typing import TYPE_CHECKING, Any, Dict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Folga para que valores como 0.29 (28.999999999999996 * 100) arredondem para o centavo certo
+_CENT_EPSILON = 1e-7
+
+def to_cents(value: Any) -> int:
+    """Converte um valor em reais para centavos inteiros (arredondamento meio para cima)."""
+    if type(value) is int: return value * 100
+    v = float(value)
+    if math.isnan(v) or math.isinf(v):
+        raise ValueError(f"Valor inválido: {value}")
+    cents = math.floor(abs(v) * 100 + 0.5 + _CENT_EPSILON)
+    return -cents if v < 0 else cents
+
+def to_cents_array(values: "np.ndarray") -> "np.ndarray":
+    """Versão vetorizada de to_cents para colunas float sem NaN."""
+    import numpy as np  # só quem processa planilhas paga a importação do NumPy
+    values = np.asarray(values, dtype=np.float64)
+    return (np.sign(values) * np.floor(np.abs(values) * 100 + 0.5 + _CENT_EPSILON)).astype(np.int64)
+
+class Recipient:
+    """Favorecido de um pagamento PIX, com o valor em centavos inteiros.
+
+    campaign agrupa os favorecidos em lotes no CNAB ("" = sem campanha).
+    """
+    __slots__ = ("name", "pix_key", "document", "amount_cents", "campaign")
+
+    def __init__(self, name: str, pix_key: str, document: str, amount_cents: int, campaign: str = ""):
+        self.name = name
+        self.pix_key = pix_key
+        self.document = document
+        self.amount_cents = amount_cents
+        self.campaign = campaign
+
+    @property
+    def amount(self) -> float:
+        return self.amount_cents / 100
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Recipient":
+        document = "".join(ch for ch in str(data.get("document") or "") if ch.isdigit())
+        cents = data["amount_cents"] if "amount_cents" in data else to_cents(data["amount"])
+        return cls(data.get("name") or "", data.get("pix_key") or "", document, cents, data.get("campaign") or "")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "pix_key": self.pix_key, "amount": self.amount, "document": self.document,
+                "campaign": self.campaign}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Recipient): return NotImplemented
+        return all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Recipient(name={self.name!r}, pix_key={self.pix_key!r}, document={self.document!r}, amount_cents={self.amount_cents}, campaign={self.campaign!r})"
@@ -0,0 +1,314 @@
+"""Conciliação das remessas geradas (CI240_001_xxxxxx.rem) com os arquivos de retorno do banco.
+
+Cada pagamento das remessas (segmentos A/B: lote, sequencial, documento,
+chave PIX e valor) é indexado uma única vez em SQLite. Os retornos novos são
+lidos com o CNABFile e cruzados com esse índice por hash join (documento,
+chave, valor), desempatando por lote/sequencial. O cruzamento fica restrito à
+remessa cujo NSA (sequencial do header de arquivo) o retorno informa; só quando
+esse NSA não identifica uma única remessa indexada vale o índice inteiro. O
+resultado fica gravado, e retornos já processados (mesmo conteúdo) são
+ignorados nas próximas rodadas.
+
+Uso:
+    python src/reconciliation.py run [--remessas DIR] [--retornos DIR]
+    python src/reconciliation.py report [--remessa CI240_001_000001.rem]
+    python src/reconciliation.py list rejected [--remessa CI240_001_000001.rem] [--limit 50]
+"""
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from parse_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+PAID, REJECTED, PENDING, MISSING = "paid", "rejected", "pending", "missing"
+STATUSES = (PAID, REJECTED, PENDING, MISSING)
+# Ocorrências FEBRABAN: 00 = crédito efetuado; BD = inclusão efetuada (agendado, ainda sem
+# resultado). Qualquer outro código é motivo de rejeição.
+PAID_CODES = {"00"}
+PENDING_CODES = {"BD"}
+RETURN_PATTERNS = ("*.ret", "*.RET")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remessas (
+    filename TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    payments INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    nsa INTEGER
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    remessa TEXT NOT NULL,
+    lote INTEGER NOT NULL,
+    sequencial INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    document TEXT NOT NULL,
+    pix_key TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'missing',
+    occurrences TEXT,
+    return_file TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_remessa_status ON payments (remessa, status);
+CREATE TABLE IF NOT EXISTS returns (
+    content_hash TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    payments INTEGER NOT NULL,
+    matched INTEGER NOT NULL,
+    unmatched INTEGER NOT NULL,
+    processed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unmatched (
+    id INTEGER PRIMARY KEY,
+    return_file TEXT NOT NULL,
+    lote INTEGER NOT NULL,
+    sequencial INTEGER NOT NULL,
+    document TEXT NOT NULL,
+    pix_key TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    occurrences TEXT
+);
+"""
+
+def occurrence_codes(text: str) -> List[str]:
+    """Campo de ocorrências -> códigos de 2 caracteres (o banco pode alinhá-los em qualquer posição)."""
+    text = text.strip()
+    return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+def classify(occurrences: str) -> str:
+    codes = occurrence_codes(occurrences)
+    if not codes: return PENDING
+    if codes[0] in PAID_CODES: return PAID
+    if all(c in PENDING_CODES for c in codes): return PENDING
+    return REJECTED
+
+class Reconciler:
+    """Estado persistente da conciliação; uma conexão por instância, protegida por lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Bancos criados antes do NSA: a coluna é preenchida na próxima indexação
+        if "nsa" not in {row[1] for row in self._conn.execute("PRAGMA table_info(remessas)")}:
+            self._conn.execute("ALTER TABLE remessas ADD COLUMN nsa INTEGER")
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def index_remessa(self, path: Path) -> int:
+        """Indexa os pagamentos de uma remessa; 0 se ela já estava indexada com o mesmo conteúdo."""
+        from cnab_reader import CNABFile
+        path = Path(path)
+        digest = content_hash(path)
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash, nsa FROM remessas WHERE filename = ?", (path.name,)).fetchone()
+        if row and row[0] == digest and row[1] is not None:
+            return 0
+        with CNABFile(path) as cnab:
+            nsa = cnab.header["sequencial"]
+            if row and row[0] == digest:
+                with self._lock, self._conn:
+                    self._conn.execute("UPDATE remessas SET nsa = ? WHERE filename = ?", (nsa, path.name))
+                return 0
+            cols = cnab.payments()
+        rows = list(zip([path.name] * len(cols["name"]), cols["lote"].tolist(), cols["sequencial"].tolist(),
+                        cols["name"], cols["document"], cols["pix_key"], cols["cents"].tolist()))
+        with self._lock, self._conn:
+            if row:  # conteúdo mudou: o índice antigo (e seus resultados) deixa de valer
+                logger.warning(f"Remessa {path.name} mudou desde a indexação; reindexando")
+                self._conn.execute("DELETE FROM payments WHERE remessa = ?", (path.name,))
+            self._conn.executemany(
+                "INSERT INTO payments (remessa, lote, sequencial, name, document, pix_key, cents) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO remessas VALUES (?, ?, ?, ?, ?, ?)",
+                               (path.name, digest, len(rows), int(cols["cents"].sum()), time.time(), nsa))
+        return len(rows)
+
+    def index_remessas(self, folder: Path, pattern: str = "*.rem") -> int:
+        return sum(self.index_remessa(p) for p in sorted(Path(folder).glob(pattern)))
+
+    def _join_index(self) -> Dict[Tuple[str, str, int], List[List]]:
+        """(documento, chave, valor) -> [[id, lote, sequencial, status, remessa], ...] de todos os pagamentos."""
+        index: Dict[Tuple[str, str, int], List[List]] = {}
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, lote, sequencial, document, pix_key, cents, status, remessa FROM payments ORDER BY id")
+            for row_id, lote, seq, document, pix_key, cents, status, remessa in cursor:
+                index.setdefault((document, pix_key, cents), []).append([row_id, lote, seq, status, remessa])
+        return index
+
+    def _remessa_for(self, nsa: Any) -> Optional[str]:
+        """Remessa indexada com o NSA informado no header do retorno; None se nenhuma ou mais de uma."""
+        if not isinstance(nsa, int) or nsa <= 0: return None
+        with self._lock:
+            rows = self._conn.execute("SELECT filename FROM remessas WHERE nsa = ? LIMIT 2", (nsa,)).fetchall()
+        return rows[0][0] if len(rows) == 1 else None
+
+    @staticmethod
+    def _match(candidates: List[List], lote: int, seq: int) -> Optional[List]:
+        """Prefere pagamento ainda em aberto na mesma posição, depois qualquer um em aberto,
+        depois um já concluído na mesma posição (retorno repetido)."""
+        fallback = None
+        for c in candidates:
+            open_ = c[3] in (MISSING, PENDING)
+            same = c[1] == lote and c[2] == seq
+            if open_ and same: return c
+            if open_ and (fallback is None or fallback[3] not in (MISSING, PENDING)): fallback = c
+            elif same and fallback is None: fallback = c
+        return fallback
+
+    def process_returns(self, paths: Iterable[Path]) -> List[Dict[str, Any]]:
+        """Cruza os retornos ainda não processados com as remessas indexadas, do mais antigo ao mais novo.
+
+        Um retorno em que nenhum pagamento concilia não é marcado como processado e
+        volta a ser cruzado na próxima chamada.
+        """
+        from cnab_reader import CNABFile
+        pending = []
+        for path in sorted((Path(p) for p in paths), key=lambda p: p.stat().st_mtime):
+            digest = content_hash(path)
+            with self._lock:
+                seen = self._conn.execute("SELECT 1 FROM returns WHERE content_hash = ?", (digest,)).fetchone()
+            if not seen: pending.append((path, digest))
+        if not pending: return []
+
+        index = self._join_index()
+        results = []
+        for path, digest in pending:
+            with CNABFile(path) as cnab:
+                if cnab.header["codigo_remessa"] == 1:
+                    logger.warning(f"{path.name} é uma remessa, não um retorno; ignorado")
+                    continue
+                ok, errors = cnab.validate()
+                if not ok:
+                    logger.warning(f"Retorno {path.name} com {len(errors)} problemas de estrutura: {errors[:3]}")
+                nsa = cnab.header["sequencial"]
+                cols = cnab.payments()
+            # O NSA do retorno pode não ser o da remessa: ele só dá preferência a ela,
+            # e o pagamento que não estiver nela é procurado nas demais
+            remessa = self._remessa_for(nsa)
+            if remessa is None:
+                logger.warning(f"Retorno {path.name}: NSA {nsa} não identifica uma remessa indexada; "
+                               "cruzando com todas as remessas")
+
+            now, updates, orphans = time.time(), [], []
+            for lote, seq, cents, document, pix_key, occurrences in zip(
+                    cols["lote"].tolist(), cols["sequencial"].tolist(), cols["cents"].tolist(),
+                    cols["document"], cols["pix_key"], cols["occurrences"]):
+                candidates = index.get((document, pix_key, cents), ())
+                if remessa is not None:
+                    candidates = [c for c in candidates if c[4] == remessa] or candidates
+                match = self._match(candidates, lote, seq)
+                if match is None:
+                    orphans.append((path.name, lote, seq, document, pix_key, cents, occurrences))
+                    continue
+                match[3] = classify(occurrences)
+                updates.append((match[3], occurrences, path.name, now, match[0]))
+
+            results.append({"return_file": path.name, "remessa": remessa, "payments": len(cols["name"]),
+                            "matched": len(updates), "unmatched": len(orphans)})
+            if orphans and not updates:
+                # Nada conciliado: provavelmente a remessa ainda não foi indexada; fica para a próxima rodada
+                logger.warning(f"Retorno {path.name}: nenhum pagamento corresponde às remessas indexadas; "
+                               "não marcado como processado")
+                continue
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE payments SET status = ?, occurrences = ?, return_file = ?, updated_at = ? WHERE id = ?", updates)
+                self._conn.executemany(
+                    "INSERT INTO unmatched (return_file, lote, sequencial, document, pix_key, cents, occurrences) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", orphans)
+                self._conn.execute("INSERT INTO returns VALUES (?, ?, ?, ?, ?, ?)",
+                                   (digest, path.name, len(cols["name"]), len(updates), len(orphans), now))
+            if orphans:
+                logger.warning(f"Retorno {path.name}: {len(orphans)} pagamentos sem remessa correspondente")
+        return results
+
+    def run(self, remessas_dir: Path, returns_dir: Path, patterns: Iterable[str] = RETURN_PATTERNS) -> Dict[str, Any]:
+        indexed = self.index_remessas(remessas_dir)
+        returns = [p for pattern in patterns for p in Path(returns_dir).glob(pattern)] if Path(returns_dir).is_dir() else []
+        return {"payments_indexed": indexed, "returns": self.process_returns(set(returns))}
+
+    def totals(self, remessa: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Por remessa: quantidade e valor (R$) de cada situação."""
+        sql = "SELECT remessa, status, COUNT(*), SUM(cents) FROM payments"
+        params: Tuple = ()
+        if remessa:
+            sql += " WHERE remessa = ?"; params = (remessa,)
+        with self._lock:
+            rows = self._conn.execute(sql + " GROUP BY remessa, status ORDER BY remessa", params).fetchall()
+        report: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for name, status, count, cents in rows:
+            entry = report.setdefault(name, {s: {"count": 0, "amount": 0.0} for s in STATUSES})
+            entry[status] = {"count": count, "amount": cents / 100}
+        return report
+
+    def items(self, status: str, remessa: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = ("SELECT remessa, lote, sequencial, name, document, pix_key, cents, occurrences, return_file "
+               "FROM payments WHERE status = ?")
+        params: List[Any] = [status]
+        if remessa:
+            sql += " AND remessa = ?"; params.append(remessa)
+        sql += " ORDER BY remessa, lote, sequencial"
+        if limit:
+            sql += " LIMIT ?"; params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ("remessa", "lote", "sequencial", "name", "document", "pix_key", "amount", "occurrences", "return_file")
+        return [dict(zip(keys, row[:6] + (row[6] / 100,) + row[7:])) for row in rows]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import config
+    parser = argparse.ArgumentParser(description="Conciliação das remessas CNAB com os retornos do banco")
+    parser.add_argument("--db", default=config.RECONCILIATION_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_cmd = commands.add_parser("run", help="indexa remessas novas e processa retornos novos")
+    run_cmd.add_argument("--remessas", default=config.REMESSAS_DIR)
+    run_cmd.add_argument("--retornos", default=config.RETURNS_DIR)
+    report_cmd = commands.add_parser("report", help="totais por remessa e situação")
+    report_cmd.add_argument("--remessa")
+    list_cmd = commands.add_parser("list", help="pagamentos em uma situação")
+    list_cmd.add_argument("status", choices=STATUSES)
+    list_cmd.add_argument("--remessa")
+    list_cmd.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+    reconciler = Reconciler(args.db)
+    try:
+        if args.command == "list":
+            for item in reconciler.items(args.status, args.remessa, args.limit):
+                print(f"{item['remessa']} lote {item['lote']} seq {item['sequencial']:5d}  R$ {item['amount']:>12,.2f}  "
+                      f"{item['name']:30s} {item['pix_key']}  {item['occurrences'] or ''}")
+            return 0
+        if args.command == "run":
+            started = time.perf_counter()
+            result = reconciler.run(Path(args.remessas), Path(args.retornos))
+            print(f"{result['payments_indexed']} pagamentos indexados, {len(result['returns'])} retornos novos "
+                  f"({time.perf_counter() - started:.1f}s)")
+            for r in result["returns"]:
+                print(f"  {r['return_file']} ({r['remessa'] or 'remessa não identificada'}): "
+                      f"{r['matched']} conciliados, {r['unmatched']} sem remessa")
+        for name, entry in reconciler.totals(getattr(args, "remessa", None)).items():
+            print(f"{name}: " + " | ".join(f"{s} {e['count']} (R$ {e['amount']:,.2f})" for s, e in entry.items()))
+        return 0
+    finally:
+        reconciler.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,29 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, g, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 import os
 import sys
+import json
+import time
+import hashlib
+import threading
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain
 import logging
 
 # Adiciona o diretório 'src' ao path para importações corretas
 sys.path.append(str(Path(__file__).parent.parent))
 
 import config
-from excel_processor import ExcelProcessor
-from cnab_generator import CNAB240Generator, Company
+import metrics
+from profiling import RequestProfiler
+from cnab_generator import CNAB240Generator, Company, join_records
+from parse_cache import ParseCache, content_hash
+from jobs import JobManager, JobQueueFull
+from sequence import SequenceAllocator, highest_file_sequence
+from file_catalog import FileCatalog, UPLOAD, OUTPUT
+from duplicates import DuplicateIndex, DuplicatePayments, describe
 
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
@@ -32,11 +44,134 @@ OUTPUT_FOLDER = Path(os.getenv('OUTPUTS_DIR', resource_path("output")))
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 OUTPUT_FOLDER.mkdir(exist_ok=True)
 
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
+
+# Favorecidos já processados, indexados pelo hash do conteúdo da planilha
+parse_cache = ParseCache(config.PARSE_CACHE_DIR, config.PARSE_CACHE_MAX_BYTES, config.PARSE_CACHE_MAX_AGE)
+
+# Sequencial das remessas: atômico entre workers; na primeira vez parte do maior .rem existente
+sequence = SequenceAllocator(config.CNAB_SEQUENCE_DB)
+
+# Metadados dos arquivos enviados/gerados
+UPLOAD_PATTERNS = ("*.xls*", "*.csv", "*.parquet")
+catalog = FileCatalog(config.FILE_CATALOG_DB)
+
+def backfill_catalog() -> int:
+    """Cataloga os arquivos anteriores ao catálogo; chamado na subida do app (app.py).
+
+    As pastas só são varridas enquanto o catálogo não tem nenhum arquivo do tipo.
+    """
+    return catalog.backfill(UPLOAD, UPLOAD_FOLDER, UPLOAD_PATTERNS) + catalog.backfill(OUTPUT, OUTPUT_FOLDER, ("*.rem",))
+
+# Perfis sob demanda (PROFILING_ENABLED + cabeçalho X-Profile), guardados na área de saída
+profiler = RequestProfiler(config.PROFILES_DIR or OUTPUT_FOLDER / "profiles", config.PROFILING_MAX_FILES)
+
+# Geração de CNAB em segundo plano, com concorrência limitada
+job_manager = JobManager(config.CNAB_JOB_WORKERS, config.CNAB_JOB_QUEUE_LIMIT, config.CNAB_JOB_TTL)
+
+# Pagamentos das remessas já geradas, para barrar a mesma planilha gerada duas vezes
+_duplicates = None
+_duplicates_lock = threading.Lock()
+
+def _duplicate_index():
+    """Criado no primeiro uso (o NumPy fica fora da subida); remessas ainda não indexadas entram nessa hora."""
+    global _duplicates
+    with _duplicates_lock:
+        if _duplicates is None:
+            index = DuplicateIndex(config.DUPLICATES_DB)
+            index.register_folder(OUTPUT_FOLDER)
+            _duplicates = index
+        return _duplicates
+
+# Duplicidades listadas por resposta; o total vem sempre
+DUPLICATE_REPORT_LIMIT = 1000
+
+def _duplicate_report(collisions):
+    return {'duplicates': [describe(c) for c in collisions[:DUPLICATE_REPORT_LIMIT]], 'duplicates_total': len(collisions)}
+
+def _duplicates_response(collisions):
+    return jsonify({'success': False, 'error': 'Pagamentos já incluídos em remessas anteriores; '
+                    'envie allow_duplicates=true para gerar mesmo assim.', **_duplicate_report(collisions)}), 409
+
+def _profiling_allowed(header_value) -> bool:
+    if not config.PROFILING_ENABLED or not header_value: return False
+    return not config.PROFILING_TOKEN or header_value == config.PROFILING_TOKEN
+
+@pix_bp.before_request
+def _start_timer():
+    if metrics.registry.enabled: g.request_started = time.perf_counter()
+    if _profiling_allowed(request.headers.get('X-Profile')) and not (request.endpoint or '').startswith('pix.profile'):
+        g.profile = profiler.start()
+
+@pix_bp.after_request
+def _record_request(response):
+    # Em respostas em streaming mede até o início do envio; o corpo é medido nas etapas
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                        endpoint=request.endpoint or "", method=request.method, status=str(response.status_code))
+    if 'profile' in g:
+        state, endpoint = g.pop('profile'), request.endpoint
+        if state is None:
+            response.headers['X-Profile-Skipped'] = 'outro perfil em andamento'
+        else:
+            # O perfil só fecha depois do corpo enviado, cobrindo também respostas em streaming
+            response.headers['X-Profile-Id'] = state['id']
+            response.call_on_close(lambda: profiler.finish(state, endpoint))
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _parse_upload(filepath, allow_duplicates=False):
+    """Processa a planilha enviada, reaproveitando o cache quando o conteúdo já foi visto.
+
+    Retorna (recipients, columns, errors, digest); recipients é None se o arquivo não
+    pôde ser lido. Com allow_duplicates, favorecidos repetidos na planilha não
+    são erro. Só planilhas válidas sem essa exceção entram no cache.
+    """
+    digest = content_hash(filepath)
+    cached = parse_cache.get(digest)
+    if cached is not None:
+        return cached[0], cached[1], [], digest
+
+    # pandas só é carregado na primeira planilha processada, não na subida do app
+    from excel_processor import ExcelProcessor
+    # Cabeçalho conferido antes da leitura completa: arquivo errado é recusado na hora
+    processor = ExcelProcessor(check_duplicates=not allow_duplicates)
+    ok, errors = processor.preflight(filepath)
+    if not ok:
+        return [], {}, errors, digest
+    if not processor.load_file(filepath):
+        return None, {}, [], digest
+    processor.detect_columns()
+    is_valid, errors = processor.validate_data()
+    recipients = processor.process_data()
+    if is_valid and not allow_duplicates:
+        parse_cache.put(digest, recipients, processor.mapped_columns)
+    return recipients, processor.mapped_columns, errors, digest
+
+@lru_cache(maxsize=4)
+def _parsed_upload(path: str, mtime_ns: int, size: int, allow_duplicates: bool):
+    return _parse_upload(Path(path), allow_duplicates)
+
+def _load_upload(filepath: Path, allow_duplicates=False):
+    """_parse_upload memoizado pelo estado do arquivo: a paginação não reprocessa a planilha a cada página."""
+    st = filepath.stat()
+    return _parsed_upload(str(filepath), st.st_mtime_ns, st.st_size, allow_duplicates)
+
+def _flag(value) -> bool:
+    """Booleano vindo de JSON ou de formulário ("true", "1", "on")."""
+    if isinstance(value, str): return value.strip().lower() in ('1', 'true', 'on', 'yes')
+    return bool(value)
+
+def _summary(recipients, columns):
+    return {
+        "total_recipients": len(recipients),
+        "total_amount": sum(r.amount_cents for r in recipients) / 100,
+        "columns_detected": columns
+    }
+
 @pix_bp.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -51,31 +186,26 @@ def upload_file():
         filepath = UPLOAD_FOLDER / new_filename
         file.save(filepath)
 
-        processor = ExcelProcessor()
-        if not processor.load_excel(filepath):
+        recipients, columns, errors, digest = _load_upload(filepath, _flag(request.form.get('allow_duplicates')))
+        # Planilha recusada não fica em UPLOAD_FOLDER: não pode ser usada depois pelo nome
+        if recipients is None:
+            filepath.unlink(missing_ok=True)
             return jsonify({'success': False, 'error': 'Erro ao carregar o arquivo Excel.'}), 500
-        
-        processor.detect_columns()
-        is_valid, errors = processor.validate_data()
-        if not is_valid:
+        if errors:
+            filepath.unlink(missing_ok=True)
             return jsonify({'success': False, 'error': 'Dados inválidos na planilha.', 'details': errors}), 400
+        catalog.record(UPLOAD, filepath, digest, len(recipients), sum(r.amount_cents for r in recipients))
 
-        recipients = processor.process_data()
-        total_amount = sum(r.get("amount", 0) for r in recipients)
-        
-        summary = {
-            "total_recipients": len(recipients),
-            "total_amount": total_amount,
-            "columns_detected": processor.mapped_columns
-        }
-
-        # MODIFICAÇÃO: Retornar TODOS os 'recipients', não apenas uma amostra.
+        # Só o resumo: as linhas vêm paginadas de /recipients ou em NDJSON de /recipients/stream.
+        # Pagamentos que já constam em remessas anteriores são avisados aqui e barrados na geração
+        collisions = _duplicate_index().find(recipients, config.DUPLICATE_WINDOW_DAYS)
         return jsonify({
             'success': True,
             'filename': new_filename,
-            'summary': summary,
-            'recipients': recipients, # Retorna a lista completa
-            'total_recipients': len(recipients)
+            'summary': _summary(recipients, columns),
+            'total_recipients': len(recipients),
+            'recipients_url': f'/api/pix/recipients/{new_filename}',
+            **_duplicate_report(collisions)
         })
 
     except Exception as e:
@@ -90,74 +220,388 @@ def get_file_details(filename):
         if not filepath.exists():
             return jsonify({'success': False, 'error': 'Arquivo não encontrado.'}), 404
 
-        processor = ExcelProcessor()
-        if not processor.load_excel(filepath):
+        recipients, columns, _, _ = _load_upload(filepath)
+        if recipients is None:
             return jsonify({'success': False, 'error': 'Erro ao ler o arquivo Excel.'}), 500
-        
-        processor.detect_columns()
-        recipients = processor.process_data()
 
-        return jsonify({'success': True, 'filename': filename, 'recipients': recipients})
+        return jsonify({'success': True, 'filename': filepath.name, 'summary': _summary(recipients, columns),
+                        'recipients_url': f'/api/pix/recipients/{filepath.name}'})
 
     except Exception as e:
         logger.error(f"Erro ao obter detalhes do arquivo: {e}")
         return jsonify({'success': False, 'error': "Ocorreu um erro interno no servidor."}), 500
 
-@pix_bp.route('/generate-cnab', methods=['POST'])
-def generate_cnab():
-    data = request.get_json()
-    filename = data.get('filename')
+def _recipients_or_error(filename):
+    filepath = UPLOAD_FOLDER / secure_filename(filename)
+    if not filepath.exists():
+        return None, (jsonify({'success': False, 'error': 'Arquivo não encontrado.'}), 404)
+    recipients = _load_upload(filepath)[0]
+    if recipients is None:
+        return None, (jsonify({'success': False, 'error': 'Erro ao ler o arquivo Excel.'}), 500)
+    return recipients, None
+
+@pix_bp.route('/recipients/<filename>', methods=['GET'])
+def list_recipients(filename):
+    """Favorecidos da planilha em páginas: ?offset=0&limit=100 (limit até 1000)."""
+    try:
+        recipients, error = _recipients_or_error(filename)
+        if error: return error
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        next_offset = offset + limit if offset + limit < len(recipients) else None
+        return jsonify({
+            'success': True, 'offset': offset, 'limit': limit, 'total': len(recipients),
+            'next_offset': next_offset, 'recipients': [r.to_dict() for r in recipients[offset:offset + limit]]
+        })
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset e limit devem ser inteiros.'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao listar favorecidos: {e}")
+        return jsonify({'success': False, 'error': "Ocorreu um erro interno no servidor."}), 500
+
+@pix_bp.route('/recipients/<filename>/stream', methods=['GET'])
+def stream_recipients(filename):
+    """Todos os favorecidos (ou ?offset=&limit=) em NDJSON, serializados sob demanda."""
+    try:
+        recipients, error = _recipients_or_error(filename)
+        if error: return error
+        offset = max(int(request.args.get('offset', 0)), 0)
+        end = offset + int(request.args['limit']) if 'limit' in request.args else len(recipients)
+
+        def rows():
+            for start in range(offset, min(end, len(recipients)), 1000):
+                chunk = recipients[start:min(start + 1000, end)]
+                yield "".join(json.dumps(r.to_dict(), ensure_ascii=False) + "\n" for r in chunk)
+
+        return Response(stream_with_context(rows()), mimetype='application/x-ndjson',
+                        headers={'X-Total-Count': str(len(recipients))})
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset e limit devem ser inteiros.'}), 400
+    except Exception as e:
+        logger.error(f"Erro ao transmitir favorecidos: {e}")
+        return jsonify({'success': False, 'error': "Ocorreu um erro interno no servidor."}), 500
+
+def _company() -> Company:
+    return Company(
+        bank_code=config.BANK_CODE, agency=config.AGENCY, agency_dv=config.AGENCY_DV,
+        account=config.ACCOUNT, account_dv=config.ACCOUNT_DV,
+        name=config.COMPANY_NAME, cnpj=config.COMPANY_CNPJ
+    )
+
+class InvalidRows(Exception):
+    """Linhas inválidas encontradas durante a leitura em streaming, sem skip_invalid."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} linha(s) inválida(s) na planilha")
+        self.errors = errors
+
+def _invalid_rows_response(errors):
+    return jsonify({'success': False, 'error': 'Dados inválidos na planilha; envie skip_invalid=true '
+                    'para gerar só com as linhas válidas.', 'details': errors}), 400
+
+def _prepare_cnab(data):
+    """Valida a requisição e abre a planilha em modo streaming.
+
+    Retorna (skipped, recipients, totals, None) ou (None, None, None, resposta de erro),
+    onde skipped lista as linhas ignoradas durante a leitura. Linhas inválidas
+    interrompem a geração com InvalidRows antes de qualquer favorecido do bloco
+    entrar no arquivo; com skip_invalid elas são puladas e voltam em skipped.
+    Sem allow_duplicates, favorecidos repetidos na planilha são linhas
+    inválidas e pagamentos que já constam em remessas anteriores barram a geração:
+    de uma vez quando a planilha está no cache, ou com DuplicatePayments durante
+    a leitura.
+    """
+    filename = (data or {}).get('filename')
     if not filename:
-        return jsonify({'success': False, 'error': 'Nome do arquivo não fornecido'}), 400
+        return None, None, None, (jsonify({'success': False, 'error': 'Nome do arquivo não fornecido'}), 400)
+
+    filepath = UPLOAD_FOLDER / secure_filename(filename)
+    if not filepath.exists():
+        return None, None, None, (jsonify({'success': False, 'error': 'Arquivo de origem não encontrado.'}), 404)
+
+    check_duplicates = not _flag(data.get('allow_duplicates'))
+    cached = parse_cache.get(content_hash(filepath))
+    if cached is not None:
+        recipients = cached[0]
+        if check_duplicates:
+            collisions = _duplicate_index().find(recipients, config.DUPLICATE_WINDOW_DAYS)
+            if collisions:
+                return None, None, None, _duplicates_response(collisions)
+        totals = {'recipients': len(recipients), 'amount_cents': sum(r.amount_cents for r in recipients)}
+        return [], recipients, totals, None
+
+    from excel_processor import ExcelProcessor, sort_errors
+    processor = ExcelProcessor(check_duplicates=check_duplicates)
+    ok, errors = processor.preflight(filepath)
+    if not ok:
+        return None, None, None, (jsonify({'success': False, 'error': 'Dados inválidos na planilha.', 'details': errors}), 400)
+    if not processor.load_file_stream(filepath):
+        return None, None, None, (jsonify({'success': False, 'error': 'Erro ao ler o arquivo Excel.'}), 500)
+    processor.detect_columns()
+    is_valid, errors = processor.validate_data()
+    if not is_valid:
+        processor.close()
+        return None, None, None, (jsonify({'success': False, 'error': 'Dados inválidos na planilha.', 'details': errors}), 400)
+
+    # Os favorecidos chegam em blocos e são consumidos pelo gerador à medida que são lidos
+    skip_invalid = _flag(data.get('skip_invalid'))
+    totals = {'recipients': 0, 'amount_cents': 0}
+    def recipients():
+        for chunk in processor.iter_recipient_chunks():
+            if processor.stream_errors and not skip_invalid:
+                raise InvalidRows(sort_errors(processor.stream_errors))
+            totals['recipients'] += len(chunk)
+            totals['amount_cents'] += sum(r.amount_cents for r in chunk)
+            yield from chunk
+        # Linhas inválidas depois do último bloco com favorecidos não passam por cima
+        if processor.stream_errors and not skip_invalid:
+            raise InvalidRows(sort_errors(processor.stream_errors))
+    if check_duplicates:
+        return processor.stream_errors, _duplicate_index().guard(recipients(), config.DUPLICATE_WINDOW_DAYS), totals, None
+    return processor.stream_errors, recipients(), totals, None
+
+def _write_cnab(generator, recipients, seq_num, target: Path, source=None):
+    """Grava o CNAB registro a registro em target, repassando cada trecho a quem consome.
 
+    O arquivo é escrito como .part e só ganha o nome final (e entra no catálogo,
+    ligado à planilha de origem) quando o trailer é gravado; se a geração não
+    chegar ao fim, seq_num é devolvido ao contador.
+    """
+    partial = target.with_name(target.name + '.part')
+    completed = False
+    digest = hashlib.sha256()
+    written, write_time = 0, 0.0
+    timing = metrics.registry.enabled
     try:
-        filepath = UPLOAD_FOLDER / secure_filename(filename)
-        if not filepath.exists():
-            return jsonify({'success': False, 'error': 'Arquivo de origem não encontrado.'}), 404
-
-        processor = ExcelProcessor()
-        processor.load_excel(filepath)
-        processor.detect_columns()
-        recipients = processor.process_data()
-
-        company = Company(
-            bank_code=config.BANK_CODE, agency=config.AGENCY, agency_dv=config.AGENCY_DV,
-            account=config.ACCOUNT, account_dv=config.ACCOUNT_DV,
-            name=config.COMPANY_NAME, cnpj=config.COMPANY_CNPJ
-        )
-        
-        seq_num = len(list(OUTPUT_FOLDER.glob("*.rem"))) + 1
-        generator = CNAB240Generator(company)
-        cnab_content = generator.generate_pix_file(recipients, seq_num)
-        
-        cnab_filename = f"CI240_001_{str(seq_num).zfill(6)}.rem"
-        (OUTPUT_FOLDER / cnab_filename).write_text(cnab_content, encoding='ascii')
-
-        total_amount = sum(r.get('amount', 0) for r in recipients)
+        with open(partial, 'w', encoding='ascii') as fh:
+            for piece in join_records(generator.iter_pix_file(recipients, seq_num)):
+                if timing:
+                    started = time.perf_counter()
+                    fh.write(piece)
+                    write_time += time.perf_counter() - started
+                else:
+                    fh.write(piece)
+                written += len(piece)
+                digest.update(piece.encode('ascii'))
+                yield piece
+        partial.replace(target)
+        completed = True
+        metrics.observe("cnab_stage_duration_seconds", write_time, stage="cnab.file_write")
+        metrics.inc("cnab_bytes_written_total", written, kind="rem")
+        catalog.record(OUTPUT, target, digest.hexdigest(), generator.recipient_count, generator.total_cents, source)
+        try:
+            _duplicate_index().register(target, source, time.time())
+        except Exception as e:
+            logger.error(f"Erro ao indexar {target.name} para a conferência de duplicidade: {e}")
+    finally:
+        partial.unlink(missing_ok=True)
+        if not completed: _release_cnab_number(seq_num)
+
+def _sorted_errors(errors):
+    if not errors: return []
+    from excel_processor import sort_errors
+    return sort_errors(errors)
+
+def _first_block(recipients):
+    """Lê o primeiro favorecido (e com ele valida o primeiro bloco da planilha) antes de reservar o NSA.
+
+    Linhas inválidas e duplicidades desse bloco saem aqui, sem consumir número.
+    """
+    if isinstance(recipients, list): return recipients
+    rows = iter(recipients)
+    first = next(rows, None)
+    return rows if first is None else chain([first], rows)
+
+def _next_cnab_name():
+    seq_num = sequence.next('cnab_remessa', seed=lambda: highest_file_sequence(OUTPUT_FOLDER))
+    return seq_num, f"CI240_001_{str(seq_num).zfill(6)}.rem"
+
+def _release_cnab_number(seq_num):
+    """Devolve o NSA de uma geração que falhou; só não volta se outra geração já reservou o seguinte."""
+    try:
+        if not sequence.release('cnab_remessa', seq_num):
+            logger.warning(f"NSA {seq_num} de uma geração interrompida fica sem uso (já há um posterior reservado)")
+    except Exception as e:
+        logger.error(f"Erro ao devolver o NSA {seq_num}: {e}")
+
+def _generate_cnab_file(skipped, recipients, totals, source=None, job=None):
+    """Gera e grava o .rem; com job, publica o progresso a cada bloco de registros."""
+    recipients = _first_block(recipients)
+    seq_num, cnab_filename = _next_cnab_name()
+    generator = CNAB240Generator(_company())
+    if job: job.update(phase='gerando CNAB')
+    with metrics.span("cnab.generate_file"):
+        for i, _ in enumerate(_write_cnab(generator, recipients, seq_num, OUTPUT_FOLDER / cnab_filename, source)):
+            if job and i % 2000 == 0:
+                job.update(rows_processed=generator.recipient_count)
+    if job: job.update(rows_processed=generator.recipient_count)
+    if skipped:
+        logger.warning(f"{len(skipped)} linha(s) ignorada(s) na geração de {cnab_filename} (skip_invalid)")
+
+    return {
+        'success': True, 'cnab_filename': cnab_filename,
+        'total_recipients': totals['recipients'], 'total_amount': totals['amount_cents'] / 100,
+        'lotes': generator.lote_seq, 'skipped': _sorted_errors(skipped),
+        'download_url': f'/api/pix/download/{cnab_filename}'
+    }
+
+def _generate_cnab_job(job, skipped, recipients, totals, source):
+    """_generate_cnab_file no job; linhas inválidas e duplicidades ficam detalhadas no result do job falho."""
+    try:
+        return _generate_cnab_file(skipped, recipients, totals, source, job)
+    except InvalidRows as e:
+        job.update(result={'success': False, 'details': e.errors})
+        raise
+    except DuplicatePayments as e:
+        job.update(result={'success': False, **_duplicate_report(e.collisions)})
+        raise
+
+def _wants_async(data) -> bool:
+    return bool((data or {}).get('async')) or 'respond-async' in request.headers.get('Prefer', '')
+
+@pix_bp.route('/generate-cnab', methods=['POST'])
+def generate_cnab():
+    """Gera o CNAB na própria requisição ou, com {"async": true}, em um job de segundo plano."""
+    try:
+        data = request.get_json()
+        skipped, recipients, totals, error = _prepare_cnab(data)
+        if error: return error
+        source = secure_filename(data['filename'])
+
+        if not _wants_async(data):
+            try:
+                return jsonify(_generate_cnab_file(skipped, recipients, totals, source))
+            except DuplicatePayments as e:
+                return _duplicates_response(e.collisions)
+            except InvalidRows as e:
+                return _invalid_rows_response(e.errors)
+
+        try:
+            job = job_manager.submit('generate-cnab', lambda job: _generate_cnab_job(job, skipped, recipients, totals, source))
+        except JobQueueFull as e:
+            if hasattr(recipients, 'close'): recipients.close()
+            return jsonify({'success': False, 'error': f"Servidor ocupado, tente novamente: {e}"}), 503
         return jsonify({
-            'success': True, 'cnab_filename': cnab_filename,
-            'total_recipients': len(recipients), 'total_amount': total_amount,
-            'download_url': f'/api/pix/download/{cnab_filename}'
+            'success': True, 'job_id': job.id, 'status': job.status,
+            'status_url': f'/api/pix/jobs/{job.id}'
+        }), 202
+    except Exception as e:
+        logger.error(f"Erro ao gerar CNAB: {e}")
+        return jsonify({'success': False, 'error': f"Ocorreu um erro interno: {e}"}), 500
+
+@pix_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job não encontrado.'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@pix_bp.route('/generate-cnab/stream', methods=['POST'])
+def generate_cnab_stream():
+    """Gera o CNAB e já o envia como download enquanto ele é produzido."""
+    try:
+        data = request.get_json()
+        skipped, recipients, totals, error = _prepare_cnab(data)
+        if error: return error
+
+        # O primeiro bloco da planilha é lido antes da resposta (e do NSA): linhas inválidas e
+        # duplicidades nele viram 400/409; as dos blocos seguintes só interrompem o envio
+        # (o .rem parcial é descartado e o NSA devolvido)
+        try:
+            recipients = _first_block(recipients)
+            seq_num, cnab_filename = _next_cnab_name()
+            generator = CNAB240Generator(_company())
+            pieces = _write_cnab(generator, recipients, seq_num, OUTPUT_FOLDER / cnab_filename,
+                                 secure_filename(data['filename']))
+            head = [next(pieces, ''), next(pieces, '')]
+        except InvalidRows as e:
+            return _invalid_rows_response(e.errors)
+        except DuplicatePayments as e:
+            return _duplicates_response(e.collisions)
+
+        def stream():
+            try:
+                yield from head
+                yield from pieces
+            except Exception as e:
+                logger.error(f"Erro ao gerar CNAB em streaming: {e}")
+                raise
+            finally:
+                # Cliente desconectado: fecha a geração já, descartando o .part e devolvendo o NSA
+                pieces.close()
+
+        return Response(stream_with_context(stream()), mimetype='text/plain', headers={
+            'Content-Disposition': f'attachment; filename={cnab_filename}',
+            'X-Cnab-Filename': cnab_filename
         })
     except Exception as e:
         logger.error(f"Erro ao gerar CNAB: {e}")
         return jsonify({'success': False, 'error': f"Ocorreu um erro interno: {e}"}), 500
 
+@pix_bp.route('/metrics', methods=['GET'])
+def metrics_route():
+    """Métricas do processo no formato texto do Prometheus."""
+    if not metrics.registry.enabled:
+        return jsonify({'success': False, 'error': 'Métricas desativadas (METRICS_ENABLED=false).'}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def _profiles_forbidden():
+    if not _profiling_allowed(request.headers.get('X-Profile')):
+        return jsonify({'success': False, 'error': 'Perfis indisponíveis.'}), 404
+    return None
+
+@pix_bp.route('/profiles', methods=['GET'])
+def profile_list():
+    forbidden = _profiles_forbidden()
+    if forbidden: return forbidden
+    return jsonify({'success': True, 'profiles': profiler.list()})
+
+@pix_bp.route('/profiles/<profile_id>', methods=['GET'])
+def profile_get(profile_id):
+    """O .prof (para snakeviz/pstats) ou, com ?format=text, o resumo das funções mais caras."""
+    forbidden = _profiles_forbidden()
+    if forbidden: return forbidden
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({'success': False, 'error': 'sort deve ser cumulative, tottime ou calls.'}), 400
+        report = profiler.report(profile_id, sort)
+        if report is None: return jsonify({'success': False, 'error': 'Perfil não encontrado.'}), 404
+        return Response(report, mimetype='text/plain')
+    path = profiler.path_for(profile_id)
+    if path is None: return jsonify({'success': False, 'error': 'Perfil não encontrado.'}), 404
+    return send_file(path, as_attachment=True, download_name=path.name)
+
 @pix_bp.route('/download/<filename>')
 def download_file_route(filename):
     try:
         return send_file(OUTPUT_FOLDER / secure_filename(filename), as_attachment=True)
     except FileNotFoundError:
+        # Removido do disco (ex.: limpeza do diretório temporário): sai do catálogo também
+        catalog.remove(OUTPUT, secure_filename(filename))
         return jsonify({'error': 'Arquivo não encontrado'}), 404
 
+def _parse_date(value, end=False):
+    """Aceita epoch ou data ISO (YYYY-MM-DD[THH:MM:SS]); 'until' só com data inclui o dia inteiro."""
+    if value is None or value == '': return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if end and len(value) == 10: parsed += timedelta(days=1)
+        return parsed.timestamp()
+
 @pix_bp.route('/files', methods=['GET'])
 def list_files():
-    def get_file_info(folder, pattern):
-        return sorted(
-            ({'filename': f.name, 'size': f.stat().st_size, 'modified': f.stat().st_mtime} for f in folder.glob(pattern)),
-            key=lambda x: x['modified'], reverse=True
-        )
-    return jsonify({
-        'uploads': get_file_info(UPLOAD_FOLDER, "*.xls*"),
-        'outputs': get_file_info(OUTPUT_FOLDER, "*.rem")
-    })
\ No newline at end of file
+    """Lista o catálogo paginado por cursor: ?kind=upload|output&since=&until=&limit=&cursor="""
+    kind = request.args.get('kind') or None
+    if kind not in (None, UPLOAD, OUTPUT):
+        return jsonify({'success': False, 'error': f"kind deve ser '{UPLOAD}' ou '{OUTPUT}'"}), 400
+    try:
+        since = _parse_date(request.args.get('since'))
+        until = _parse_date(request.args.get('until'), end=True)
+        limit = min(max(int(request.args.get('limit', config.FILES_PAGE_SIZE)), 1), config.FILES_PAGE_MAX)
+        files, next_cursor = catalog.page(kind, since, until, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f"Parâmetro inválido: {e}"}), 400
+    return jsonify({'success': True, 'files': files, 'next_cursor': next_cursor})
\ No newline at end of file
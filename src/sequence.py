@@ -0,0 +1,78 @@
+import os
+import re
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+
+class SequenceAllocator:
+    """Contadores persistentes e atômicos em SQLite, seguros entre threads e processos.
+
+    Cada next() é uma única transação IMMEDIATE (custo O(1)), então workers
+    diferentes nunca recebem o mesmo número e o valor sobrevive a reinícios.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: a transação é aberta explicitamente com BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def next(self, name: str, seed: Optional[Callable[[], int]] = None) -> int:
+        """Reserva o próximo valor do contador.
+
+        seed é chamado só na criação do contador e informa o último valor já
+        usado (ex.: maior sequencial dos arquivos existentes).
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+            value = (row[0] if row else (seed() if seed else 0)) + 1
+            conn.execute("INSERT INTO sequences (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, value))
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def release(self, name: str, value: int) -> bool:
+        """Devolve value se ele ainda for o último reservado (nenhum next() depois dele).
+
+        Retorna False quando outro next() já passou dele: o número fica sem uso.
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute("UPDATE sequences SET value = value - 1 WHERE name = ? AND value = ?", (name, value))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def current(self, name: str) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+def highest_file_sequence(folder: Path, pattern: str = "*.rem") -> int:
+    """Maior sequencial (último grupo de dígitos do nome) entre os arquivos de folder."""
+    highest = 0
+    for path in Path(folder).glob(pattern):
+        match = re.search(r"(\d+)\D*$", path.stem)
+        if match: highest = max(highest, int(match.group(1)))
+    return highest
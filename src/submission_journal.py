@@ -0,0 +1,283 @@
+"""Diário de envio de recorrências ao Banco Inter.
+
+Cada favorecido de um lote é gravado (em SQLite, modo WAL) com uma chave de
+idempotência, que vai no cabeçalho da chamada ao banco. Cada item fica
+'sending' antes da requisição e o resultado atualiza seu estado. Se o processo
+cair no meio do lote, `resume` envia apenas o que ficou pendente ou foi recusado.
+
+Timeout, erro de conexão ou 5xx não dizem se o banco criou a recorrência: o item
+fica 'unknown' (assim como os que estavam 'sending' na queda) e só volta a ser
+enviado depois de conferido no banco e liberado com `reconcile --resend`.
+
+Uso:
+    python src/submission_journal.py enqueue planilha.xlsx --batch 2024-06
+    python src/submission_journal.py resume 2024-06
+    python src/submission_journal.py status 2024-06
+    python src/submission_journal.py reconcile 2024-06 [--resend CHAVE ...] [--done CHAVE ...]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from recipient import Recipient
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENDING, DONE, FAILED, UNKNOWN = "pending", "sending", "done", "failed", "unknown"
+# Recusas em que o banco não processou a chamada: reenviadas na mesma execução
+RETRYABLE_STATUS = {408, 425, 429}
+
+def outcome_state(result: Dict) -> str:
+    """Estado do item após a chamada; sem status (timeout/conexão) ou 5xx é incerto."""
+    if result.get("success"):
+        return DONE
+    status = result.get("status_code")
+    if result.get("sent") is False or (status is not None and status < 500):
+        return FAILED
+    return UNKNOWN
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    idem_key TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    pix_key TEXT NOT NULL,
+    document TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    id_rec TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status_code INTEGER,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_batch_state ON submissions (batch_id, state, position);
+"""
+
+def idempotency_key(batch_id: str, recipient: Recipient) -> str:
+    """Chave estável do favorecido no lote (documento, chave PIX e valor)."""
+    raw = f"{batch_id}|{recipient.document}|{recipient.pix_key.strip().lower()}|{recipient.amount_cents}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SubmissionJournal:
+    """Estado persistente dos envios; uma conexão por instância, protegida por lock."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def enqueue(self, batch_id: str, recipients: Iterable[Recipient], chunk_size: int = 1000) -> int:
+        """Registra os favorecidos do lote como pendentes; os já registrados são ignorados.
+
+        Favorecidos repetidos (mesma chave) no mesmo lote viram um único envio.
+        Retorna quantos foram inseridos.
+        """
+        now = time.time()
+        inserted = 0
+        rows = []
+        with self._lock, self._conn:
+            for position, r in enumerate(recipients):
+                rows.append((idempotency_key(batch_id, r), batch_id, position, r.name, r.pix_key, r.document, r.amount_cents, now))
+                if len(rows) >= chunk_size:
+                    inserted += self._insert(rows)
+                    rows = []
+            if rows:
+                inserted += self._insert(rows)
+        return inserted
+
+    def _insert(self, rows: List[Tuple]) -> int:
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO submissions (idem_key, batch_id, position, name, pix_key, document, amount_cents, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return self._conn.total_changes - before
+
+    def pending(self, batch_id: str) -> List[Tuple[str, Recipient]]:
+        """Itens pendentes ou recusados, na ordem original do lote (os incertos ficam de fora)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idem_key, name, pix_key, document, amount_cents FROM submissions "
+                "WHERE batch_id = ? AND state IN (?, ?) ORDER BY position", (batch_id, PENDING, FAILED)).fetchall()
+        return [(key, Recipient(name, pix_key, document, cents)) for key, name, pix_key, document, cents in rows]
+
+    def mark_sending(self, key: str):
+        """Marca o item antes da requisição (commit imediato): se o processo cair, ele fica incerto."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE submissions SET state = ?, attempts = attempts + 1, updated_at = ? WHERE idem_key = ?",
+                (SENDING, time.time(), key))
+
+    def record(self, key: str, result: Dict) -> str:
+        """Grava o resultado de uma chamada (commit imediato: um sucesso nunca é reenviado); devolve o estado."""
+        state = outcome_state(result)
+        id_rec = (result.get("data") or {}).get("idRec") if state == DONE else None
+        error = None if state == DONE else result.get("error")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE submissions SET state = ?, id_rec = COALESCE(?, id_rec), "
+                "status_code = ?, last_error = ?, updated_at = ? WHERE idem_key = ?",
+                (state, id_rec, result.get("status_code"), error, time.time(), key))
+        return state
+
+    def mark_interrupted(self, batch_id: str) -> int:
+        """Itens que ficaram 'sending' numa execução que caiu passam a incertos; devolve quantos."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE submissions SET state = ?, last_error = ?, updated_at = ? WHERE batch_id = ? AND state = ?",
+                (UNKNOWN, "envio interrompido sem resposta", time.time(), batch_id, SENDING))
+        return cursor.rowcount
+
+    def uncertain(self, batch_id: str) -> List[Dict]:
+        """Itens incertos do lote, para conferência no banco."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT idem_key, position, name, pix_key, document, amount_cents, attempts, status_code, last_error "
+                "FROM submissions WHERE batch_id = ? AND state = ? ORDER BY position", (batch_id, UNKNOWN))
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def resolve(self, batch_id: str, keys: Iterable[str], state: str, id_rec: Optional[str] = None) -> int:
+        """Tira itens incertos do limbo: PENDING volta a enviar, DONE confirma que o banco criou."""
+        if state not in (PENDING, DONE):
+            raise ValueError(f"Estado inválido para conferência: {state}")
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE submissions SET state = ?, id_rec = COALESCE(?, id_rec), updated_at = ? "
+                "WHERE batch_id = ? AND idem_key = ? AND state = ?",
+                [(state, id_rec, time.time(), batch_id, key, UNKNOWN) for key in keys])
+            return self._conn.total_changes - before
+
+    def summary(self, batch_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM submissions WHERE batch_id = ? GROUP BY state", (batch_id,)).fetchall()
+        counts = {PENDING: 0, SENDING: 0, DONE: 0, FAILED: 0, UNKNOWN: 0}
+        counts.update(dict(rows))
+        return counts
+
+def resume(client, journal: SubmissionJournal, batch_id: str, max_workers: int = 8,
+           rate_limit: Optional[float] = None, max_retries: int = 5, backoff: float = 1.0) -> Dict[str, int]:
+    """Envia os itens pendentes/recusados do lote, repetindo as recusas transitórias.
+
+    Entre as rodadas espera backoff * 2^n segundos (com jitter); erros não
+    transitórios (ex.: 400/422) ficam como falha para correção manual. Resultados
+    incertos (timeout, conexão, 5xx) nunca são reenviados aqui: ficam 'unknown'
+    até a conferência com reconcile.
+    """
+    interrupted = journal.mark_interrupted(batch_id)
+    if interrupted:
+        logger.warning(f"Lote {batch_id}: {interrupted} itens estavam em envio na queda e ficaram incertos")
+    items = journal.pending(batch_id)
+    logger.info(f"Lote {batch_id}: {len(items)} itens a enviar")
+    for attempt in range(max_retries + 1):
+        if not items: break
+        if attempt:
+            delay = backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+            logger.warning(f"Lote {batch_id}: {len(items)} falhas transitórias, nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+        retry = []
+        keys = [key for key, _ in items]
+        results = client.create_recorrencias_bulk([r for _, r in items], max_workers=max_workers, rate_limit=rate_limit,
+                                                  idempotency_keys=keys,
+                                                  before_send=lambda i, keys=keys: journal.mark_sending(keys[i]))
+        for index, result in results:
+            state = journal.record(keys[index], result)
+            if state == FAILED and (result.get("sent") is False or result.get("status_code") in RETRYABLE_STATUS):
+                retry.append(items[index])
+        items = retry
+    summary = journal.summary(batch_id)
+    if summary[UNKNOWN]:
+        logger.warning(f"Lote {batch_id}: {summary[UNKNOWN]} itens com resultado incerto; "
+                       f"confira no banco e libere com reconcile antes de reenviar")
+    return summary
+
+def _client_from_config():
+    import config
+    from inter_api import InterAPIClient
+    return InterAPIClient(config.CLIENT_ID, config.CLIENT_SECRET, config.CERT_PATH, config.KEY_PATH,
+                          config.BASE_URL, config.SCOPES, config.ACCOUNT or "")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import config
+    parser = argparse.ArgumentParser(description="Diário de envio de recorrências ao Banco Inter")
+    parser.add_argument("--journal", default=config.SUBMISSION_JOURNAL_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue_cmd = commands.add_parser("enqueue", help="registra os favorecidos de uma planilha em um lote")
+    enqueue_cmd.add_argument("file")
+    enqueue_cmd.add_argument("--batch", required=True)
+    resume_cmd = commands.add_parser("resume", help="envia os itens pendentes ou com falha do lote")
+    resume_cmd.add_argument("batch")
+    resume_cmd.add_argument("--workers", type=int, default=8)
+    resume_cmd.add_argument("--rate", type=float, default=None)
+    resume_cmd.add_argument("--retries", type=int, default=config.SUBMISSION_MAX_RETRIES)
+    status_cmd = commands.add_parser("status", help="mostra a contagem por estado do lote")
+    status_cmd.add_argument("batch")
+    reconcile_cmd = commands.add_parser("reconcile", help="lista os itens incertos e registra a conferência no banco")
+    reconcile_cmd.add_argument("batch")
+    reconcile_cmd.add_argument("--resend", nargs="+", default=[], metavar="CHAVE",
+                               help="itens que o banco não criou: voltam a ser enviados no próximo resume")
+    reconcile_cmd.add_argument("--done", nargs="+", default=[], metavar="CHAVE",
+                               help="itens que o banco criou: ficam como concluídos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+    journal = SubmissionJournal(args.journal)
+    try:
+        if args.command == "enqueue":
+            from excel_processor import ExcelProcessor
+            processor = ExcelProcessor()
+            ok, errors = processor.preflight(args.file)
+            if ok and not processor.load_file(args.file):
+                print(f"Não foi possível ler {args.file}", file=sys.stderr)
+                return 1
+            if ok:
+                processor.detect_columns()
+                ok, errors = processor.validate_data()
+            if not ok:
+                print("\n".join(errors), file=sys.stderr)
+                return 1
+            inserted = journal.enqueue(args.batch, processor.process_data())
+            print(f"{inserted} favorecidos registrados no lote {args.batch}")
+            summary = journal.summary(args.batch)
+        elif args.command == "resume":
+            client = _client_from_config()
+            try:
+                summary = resume(client, journal, args.batch, args.workers, args.rate, args.retries)
+            finally:
+                client.close()
+        elif args.command == "reconcile":
+            released = journal.resolve(args.batch, args.resend, PENDING)
+            confirmed = journal.resolve(args.batch, args.done, DONE)
+            if args.resend or args.done:
+                print(f"{released} liberados para reenvio, {confirmed} confirmados como criados")
+            for item in journal.uncertain(args.batch):
+                print(f"{item['idem_key']}  #{item['position']}  {item['name']}  {item['pix_key']}  "
+                      f"R$ {item['amount_cents'] / 100:.2f}  ({item['status_code'] or 'sem resposta'}: {item['last_error']})")
+            summary = journal.summary(args.batch)
+        else:
+            summary = journal.summary(args.batch)
+        print(", ".join(f"{state}: {count}" for state, count in summary.items()))
+        return 0 if summary[FAILED] == 0 and summary[UNKNOWN] == 0 else 2
+    finally:
+        journal.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import os
+import json
+import logging
+import time
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (build PyInstaller)
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# (access_token, expira_em como epoch em segundos)
+TokenEntry = Tuple[str, float]
+
+class TokenCache(ABC):
+    """Armazena tokens OAuth por chave e serializa quem vai renová-los (single-flight)."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[TokenEntry]: ...
+
+    @abstractmethod
+    def set(self, key: str, token: str, expires_at: float): ...
+
+    def reload(self, key: str) -> Optional[TokenEntry]:
+        """Como get, mas ignorando cópias locais (usado antes de renovar)."""
+        return self.get(key)
+
+    @abstractmethod
+    def lock(self, key: str) -> ContextManager[None]:
+        """Context manager exclusivo por chave, em volta da renovação do token."""
+
+class MemoryTokenCache(TokenCache):
+    """Cache em memória, compartilhado pelas instâncias do mesmo processo."""
+
+    def __init__(self):
+        self._entries: Dict[str, TokenEntry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str) -> Optional[TokenEntry]:
+        with self._guard:
+            return self._entries.get(key)
+
+    def set(self, key: str, token: str, expires_at: float):
+        with self._guard:
+            self._entries[key] = (token, expires_at)
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        with self._guard:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            yield
+
+class FileTokenCache(MemoryTokenCache):
+    """Cache em arquivo (0600), compartilhado por todos os processos do host.
+
+    A renovação é protegida por lock de arquivo, então só um processo por vez
+    chama o endpoint de token; os demais esperam e leem o resultado.
+    """
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[TokenEntry]:
+        # A cópia em memória só vale enquanto não expira; depois disso outro processo pode ter renovado
+        entry = super().get(key)
+        if entry is not None and entry[1] > time.time(): return entry
+        return self.reload(key)
+
+    def reload(self, key: str) -> Optional[TokenEntry]:
+        try:
+            data = json.loads(self._path(key).read_text())
+            entry = (data["access_token"], float(data["expires_at"]))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Cache de token ilegível ({key}): {e}")
+            return None
+        super().set(key, *entry)
+        return entry
+
+    def set(self, key: str, token: str, expires_at: float):
+        super().set(key, token, expires_at)
+        path = self._path(key)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"access_token": token, "expires_at": expires_at}, fh)
+        os.replace(partial, path)
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        with super().lock(key):
+            with open(self.directory / f"{key}.lock", "a+") as fh:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(fh, fcntl.LOCK_UN)
+                    else:
+                        fh.seek(0)
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+_shared: Dict[Tuple[str, str], TokenCache] = {}
+_shared_lock = threading.Lock()
+
+def shared_token_cache(backend: Optional[str] = None, directory: Optional[str] = None) -> TokenCache:
+    """Instância única por (backend, diretório), usada por padrão por todos os clientes."""
+    import config
+    backend = (backend or config.INTER_TOKEN_CACHE).lower()
+    directory = directory or config.INTER_TOKEN_CACHE_DIR or os.path.join(tempfile.gettempdir(), "cnab_token_cache")
+    with _shared_lock:
+        key = (backend, directory if backend == "file" else "")
+        if key not in _shared:
+            _shared[key] = FileTokenCache(directory) if backend == "file" else MemoryTokenCache()
+        return _shared[key]